@@ -0,0 +1,150 @@
+"""
+Фоновая запись результатов
+Сохранение в Excel/JSON выполняется отдельным потоком через ограниченную очередь,
+цикл работы с браузером не ждет диска
+"""
+import atexit
+import queue
+import threading
+import time
+from collections import deque
+from config import *
+
+# Признак остановки потока записи
+_STOP = object()
+
+
+class BackgroundWriter:
+    """
+    Поток записи с ограниченной очередью
+
+    - submit() ставит задачу в очередь; если очередь заполнена,
+      вызывающий поток ждет (backpressure) - память не растет без предела
+    - flush() дожидается выполнения всех поставленных задач
+    - close() (и выход из программы) дописывает очередь до конца
+    """
+
+    def __init__(self, max_queue=BACKGROUND_WRITER_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.max_queue = max_queue
+
+        # Метрики
+        self.completed = 0
+        self.failed = 0
+        self.max_depth = 0
+        self.blocked_time = 0.0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self._latencies = deque(maxlen=1000)
+
+        self._thread = threading.Thread(target=self._run, name="BackgroundWriter", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, func, *args, **kwargs):
+        """Ставит вызов func(*args, **kwargs) в очередь записи"""
+        if not self._thread.is_alive():
+            # Поток уже остановлен - выполняем сразу
+            func(*args, **kwargs)
+            return
+
+        task = (func, args, kwargs, time.time())
+        try:
+            self.queue.put_nowait(task)
+        except queue.Full:
+            wait_start = time.time()
+            self.queue.put(task)
+            self.blocked_time += time.time() - wait_start
+
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+
+    def _run(self):
+        """Цикл потока записи"""
+        while True:
+            task = self.queue.get()
+            try:
+                if task is _STOP:
+                    return
+
+                func, args, kwargs, submitted = task
+                try:
+                    func(*args, **kwargs)
+                    self.completed += 1
+                except Exception as e:
+                    self.failed += 1
+                    print(f"  ❌ Ошибка фоновой записи ({getattr(func, '__name__', func)}): {e}")
+
+                latency = time.time() - submitted
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+                self._latencies.append(latency)
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        """Дожидается выполнения всех задач в очереди"""
+        if self._thread.is_alive():
+            self.queue.join()
+
+    def close(self):
+        """Дописывает очередь и останавливает поток"""
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join()
+
+    def get_depth(self):
+        """Текущая длина очереди"""
+        return self.queue.qsize()
+
+    def get_metrics(self):
+        """Метрики записи: задержка от постановки до записи и заполненность очереди"""
+        latencies = sorted(self._latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        processed = self.completed + self.failed
+
+        return {
+            'completed': self.completed,
+            'failed': self.failed,
+            'avg_latency': self.total_latency / processed if processed else 0,
+            'p95_latency': p95,
+            'max_latency': self.max_latency,
+            'depth': self.get_depth(),
+            'max_depth': self.max_depth,
+            'queue_size': self.max_queue,
+            'blocked_time': self.blocked_time
+        }
+
+
+class AsyncSink:
+    """
+    Обертка над обработчиком результатов (ExcelHandler, JSONHandlerV2 и т.д.)
+
+    Методы из async_methods выполняются в потоке записи, остальные
+    атрибуты берутся у исходного объекта. flush() и close() сначала
+    дожидаются очереди, поэтому все изменения попадают на диск.
+    """
+
+    def __init__(self, target, writer, async_methods=('update_status', 'save_request')):
+        self._target = target
+        self._writer = writer
+        self._async_methods = set(async_methods)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name in self._async_methods:
+            def submit(*args, **kwargs):
+                self._writer.submit(attr, *args, **kwargs)
+            return submit
+        return attr
+
+    def flush(self):
+        """Дожидается очереди и сбрасывает обработчик"""
+        self._writer.flush()
+        if hasattr(self._target, 'flush'):
+            return self._target.flush()
+        return True
+
+    def close(self):
+        """Дожидается очереди и закрывает обработчик"""
+        self._writer.flush()
+        return self._target.close()
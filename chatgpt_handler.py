@@ -12,14 +12,17 @@ import re
 from config import *
 from error_handler import ChatGPTErrorHandler
 from project_manager import ProjectManager
+from response_tracking import ResponseTrackingMixin
 
-class ChatGPTHandler:
+class ChatGPTHandler(ResponseTrackingMixin):
     """Класс для работы с ChatGPT"""
     
     def __init__(self, driver):
         self.driver = driver
         self.error_handler = ChatGPTErrorHandler(driver)
         self.project_manager = ProjectManager(driver)
+        self.page_probe = self.error_handler.probe
+        self.init_response_tracking(driver)
         self.in_project = False
     
     def verify_in_project(self, project_name):
@@ -114,15 +117,24 @@ class ChatGPTHandler:
         
         return None
     
-    def is_input_field_enabled(self, input_field=None):
+    def is_input_field_enabled(self, input_field=None, state=None):
         """
         ✨ НОВАЯ ФУНКЦИЯ: Проверяет доступно ли поле ввода
         
         Это КЛЮЧЕВАЯ функция для определения готовности ChatGPT.
         Поле ввода блокируется во время генерации и разблокируется после.
         
+        state: состояние страницы (PageProbe.state) - все проверки за одно
+        обращение к браузеру; без него - запрашивается, а если скрипт
+        недоступен - проверки через WebDriver по одной
+        
         Возвращает: (is_enabled, reason)
         """
+        if state is None:
+            state = self.page_probe.state()
+        if state is not None:
+            return self.page_probe.readiness(state)
+        
         try:
             if input_field is None:
                 input_field = self.find_input_field()
@@ -170,13 +182,16 @@ class ChatGPTHandler:
         except Exception as e:
             return False, f"Ошибка проверки: {str(e)}"
     
-    def wait_for_input_field_ready(self, max_wait=GENERATION_MAX_WAIT, check_interval=2):
+    def wait_for_input_field_ready(self, max_wait=GENERATION_MAX_WAIT, check_interval=None):
         """
         ✨ НОВАЯ ФУНКЦИЯ: Ждет пока поле ввода станет готовым
         
         Это ПРАВИЛЬНЫЙ способ ожидания завершения генерации.
         Вместо фиксированных таймеров мы проверяем реальное состояние интерфейса.
         
+        check_interval: фиксированная пауза между проверками; по умолчанию -
+        адаптивная по плану опроса отправленного запроса (PollScheduler), 2с без плана
+        
         Возвращает: (success, message)
         """
         print(f"  ⏳ Жду готовности поля ввода (макс {max_wait}с)...")
@@ -188,8 +203,9 @@ class ChatGPTHandler:
         while time.time() - start_time < max_wait:
             checks_count += 1
             
-            # Проверяем состояние поля
-            is_ready, reason = self.is_input_field_enabled()
+            # Проверяем состояние поля (одним скриптом вместе с ошибками)
+            state = self.page_probe.state()
+            is_ready, reason = self.is_input_field_enabled(state=state)
             
             if is_ready:
                 elapsed = time.time() - start_time
@@ -202,12 +218,15 @@ class ChatGPTHandler:
                 last_reason = reason
             
             # Проверяем ошибки ChatGPT
-            error_type, error_msg = self.error_handler.check_for_errors()
+            error_type, error_msg = self.error_handler.check_for_errors(state)
             if error_type:
                 return False, f"Ошибка ChatGPT: {error_msg}"
             
+            # Куски ответа, написанные с прошлого раза
+            self.poll_response_stream()
+            
             # Пауза перед следующей проверкой
-            time.sleep(check_interval)
+            time.sleep(self.next_poll_interval(check_interval))
         
         # Таймаут
         elapsed = time.time() - start_time
@@ -245,6 +264,7 @@ class ChatGPTHandler:
         
         Возвращает: (success, response_text, error_type, error_message)
         """
+        self.reset_response_tracking()
         try:
             # Настройка контекста (проект/модель)
             if project:
@@ -312,8 +332,10 @@ class ChatGPTHandler:
             input_box.send_keys(prompt)
             time.sleep(1)
             
-            # Отправляем
+            # Отправляем (наблюдатели ставятся до Enter)
+            self.before_send(model)
             input_box.send_keys(Keys.RETURN)
+            self.after_send(model, prompt)
             
             # ✨ НОВАЯ ЛОГИКА: Ждем ответа правильно
             return self.wait_for_response_smart()
@@ -327,8 +349,10 @@ class ChatGPTHandler:
         
         АЛГОРИТМ:
         1. Ждем появления первых слов ответа (макс 90с)
-        2. Ждем когда поле ввода разблокируется (макс 120с)
-        3. Читаем финальный ответ
+        2. Ждем завершения генерации (макс 120с): наблюдатель в странице,
+           если он недоступен - опрос готовности поля ввода.
+           Все это время куски ответа забираются потоковым захватом
+        3. Читаем финальный ответ (при таймауте - частичный из захвата)
         
         Это НАМНОГО надежнее чем фиксированные time.sleep()!
         """
@@ -336,32 +360,17 @@ class ChatGPTHandler:
             # ШАГ 1: Ждем появления ответа
             success, msg = self.wait_for_response_to_appear(timeout=RESPONSE_WAIT_TIMEOUT)
             if not success:
+                self.finish_response_stream()
                 error_type, error_msg = self.error_handler.check_for_errors()
                 if error_type:
                     return False, None, error_type, error_msg
                 return False, None, 'timeout', msg
             
-            # ШАГ 2: Ждем завершения генерации (поле ввода разблокируется)
-            print(f"  ⏳ Жду завершения генерации...")
-            success, msg = self.wait_for_input_field_ready(
-                max_wait=GENERATION_MAX_WAIT,
-                check_interval=2
-            )
-            
-            if not success:
-                # Даже если таймаут - попробуем прочитать что есть
-                print(f"  ⚠️ {msg}")
-                print(f"  💡 Пробую прочитать частичный ответ...")
-            else:
-                print(f"  ✅ Генерация завершена")
-            
-            # Небольшая пауза для стабилизации DOM
-            time.sleep(2)
-            
-            # ШАГ 3: Читаем ответ
-            return self.read_final_response()
+            # ШАГ 2-3: Ждем завершения генерации и читаем ответ
+            return self.wait_for_generation()
                 
         except Exception as e:
+            self.finish_response_stream()
             return False, None, 'exception', str(e)
     
     def read_final_response(self, max_attempts=3):
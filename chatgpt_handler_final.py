@@ -7,14 +7,16 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
+import random
 import time
 import re
 from config import *
 from error_handler import ChatGPTErrorHandler
 from project_manager import ProjectManager
+from response_tracking import ResponseTrackingMixin
 from humanization import HumanBehavior, HumanSchedule
 
-class ChatGPTHandler:
+class ChatGPTHandler(ResponseTrackingMixin):
     """
     Класс для работы с ChatGPT
     
@@ -28,7 +30,10 @@ class ChatGPTHandler:
         self.driver = driver
         self.error_handler = ChatGPTErrorHandler(driver)
         self.project_manager = ProjectManager(driver)
+        self.page_probe = self.error_handler.probe
+        self.init_response_tracking(driver)
         self.in_project = False
+        self._last_activity = time.time()
         
         # ✨ Инициализируем humanization
         self.human = HumanBehavior(humanization_config)
@@ -42,8 +47,18 @@ class ChatGPTHandler:
     # ПРОВЕРКА ГОТОВНОСТИ (из улучшенной версии)
     # ============================================================
     
-    def is_input_field_enabled(self, input_field=None):
-        """Проверяет доступно ли поле ввода"""
+    def is_input_field_enabled(self, input_field=None, state=None):
+        """
+        Проверяет доступно ли поле ввода
+        
+        state: состояние страницы (PageProbe.state) - одно обращение к браузеру
+        вместо нескольких; без скрипта - проверки через WebDriver
+        """
+        if state is None:
+            state = self.page_probe.state()
+        if state is not None:
+            return self.page_probe.readiness(state)
+        
         try:
             if input_field is None:
                 input_field = self.find_input_field()
@@ -76,11 +91,14 @@ class ChatGPTHandler:
         except Exception as e:
             return False, f"Ошибка: {str(e)}"
     
-    def wait_for_input_field_ready(self, max_wait=GENERATION_MAX_WAIT):
+    def wait_for_input_field_ready(self, max_wait=GENERATION_MAX_WAIT, check_interval=None):
         """
         Ждет готовности поля ввода
         
         ✨ С ИМИТАЦИЕЙ АКТИВНОСТИ чтения!
+        
+        check_interval: фиксированная пауза между проверками; по умолчанию -
+        адаптивная по плану опроса отправленного запроса (PollScheduler)
         """
         print(f"  ⏳ Жду готовности поля (макс {max_wait}с)...")
         
@@ -92,8 +110,9 @@ class ChatGPTHandler:
         while time.time() - start_time < max_wait:
             checks_count += 1
             
-            # Проверяем готовность
-            is_ready, reason = self.is_input_field_enabled()
+            # Проверяем готовность (одним скриптом вместе с ошибками)
+            state = self.page_probe.state()
+            is_ready, reason = self.is_input_field_enabled(state=state)
             
             if is_ready:
                 elapsed = time.time() - start_time
@@ -116,19 +135,68 @@ class ChatGPTHandler:
                         max_wait - (time.time() - start_time)
                     )
                     if activity_duration > 0:
-                        self.human.simulate_reading(self.driver, duration=activity_duration)
+                        # Прерывается, как только ответ готов (проверки каждые ~0.5с)
+                        self.human.simulate_reading(
+                            self.driver,
+                            duration=activity_duration,
+                            should_stop=self.is_generation_finished
+                        )
                         last_activity = time.time()
+                        # Состояние уже проверялось во время активности -
+                        # сразу проверяем заново, без паузы
+                        continue
             
             # Проверяем ошибки
-            error_type, error_msg = self.error_handler.check_for_errors()
+            error_type, error_msg = self.error_handler.check_for_errors(state)
             if error_type:
                 return False, f"Ошибка: {error_msg}"
             
-            time.sleep(2)
+            self.poll_response_stream()
+            
+            time.sleep(self.next_poll_interval(check_interval))
         
         elapsed = time.time() - start_time
         return False, f"Таймаут за {elapsed:.1f}с"
     
+    def between_completion_slices(self):
+        """
+        Между отрезками ожидания наблюдателя: куски ответа, ошибки и имитация чтения
+        
+        Возвращает: (False, message) при ошибке ChatGPT, иначе None
+        """
+        outcome = super().between_completion_slices()
+        if outcome is not None:
+            return outcome
+        
+        # ✨ HUMANIZATION: как в wait_for_input_field_ready
+        if self.human.config['simulate_reading']:
+            interval_range = self.human.config['reading_activity_interval']
+            if time.time() - self._last_activity > interval_range[0]:
+                self.human.simulate_reading(
+                    self.driver,
+                    duration=random.uniform(2, 5),
+                    should_stop=self.is_generation_finished
+                )
+                self._last_activity = time.time()
+        
+        return None
+    
+    def is_generation_finished(self):
+        """
+        Прерывать ли имитацию чтения: поле ввода готово или появилась ошибка
+        
+        Одно обращение к браузеру (PageProbe), поэтому его можно
+        вызывать часто - между короткими отрезками активности.
+        """
+        self.poll_response_stream()
+        
+        state = self.page_probe.state()
+        is_ready, _ = self.is_input_field_enabled(state=state)
+        if is_ready:
+            return True
+        error_type, _ = self.error_handler.check_for_errors(state)
+        return bool(error_type)
+    
     # ============================================================
     # БАЗОВЫЕ ФУНКЦИИ
     # ============================================================
@@ -230,6 +298,7 @@ class ChatGPTHandler:
         
         ✨ С ПОЛНОЙ HUMANIZATION!
         """
+        self.reset_response_tracking()
         try:
             # ✨ HUMANIZATION: Проверяем расписание
             self.schedule.wait_until_work_hours()
@@ -308,9 +377,11 @@ class ChatGPTHandler:
             # ✨ HUMANIZATION: Пауза перед отправкой (перечитывание)
             self.human.pause('verifying')
             
-            # Отправляем
+            # Отправляем (наблюдатели ставятся до Enter)
             print(f"  📤 Отправляю запрос...")
+            self.before_send(model)
             input_box.send_keys(Keys.RETURN)
+            self.after_send(model, prompt)
             
             # Ждем ответа
             return self.wait_for_response_smart()
@@ -335,28 +406,18 @@ class ChatGPTHandler:
                 )
                 print(f"  ✅ Ответ начал появляться")
             except TimeoutException:
+                self.finish_response_stream()
                 error_type, error_msg = self.error_handler.check_for_errors()
                 if error_type:
                     return False, None, error_type, error_msg
                 return False, None, 'timeout', "Ответ не появился"
             
-            # ШАГ 2: Ждем завершения генерации
-            print(f"  ⏳ Жду завершения генерации...")
-            success, msg = self.wait_for_input_field_ready(max_wait=GENERATION_MAX_WAIT)
-            
-            if not success:
-                print(f"  ⚠️ {msg}")
-                print(f"  💡 Пробую прочитать частичный ответ...")
-            else:
-                print(f"  ✅ Генерация завершена")
-            
-            # Небольшая пауза
-            time.sleep(2)
-            
-            # ШАГ 3: Читаем ответ
-            return self.read_final_response()
+            # ШАГ 2-3: Ждем завершения генерации и читаем ответ
+            self._last_activity = time.time()
+            return self.wait_for_generation()
                 
         except Exception as e:
+            self.finish_response_stream()
             return False, None, 'exception', str(e)
     
     def read_final_response(self, max_attempts=3):
@@ -0,0 +1,201 @@
+"""
+Определение завершения генерации ответа внутри страницы
+В страницу ставится MutationObserver, Python блокируется в одном
+execute_async_script, пока кнопка Stop не исчезнет и последнее сообщение
+ассистента не перестанет меняться в течение короткого окна тишины.
+Без опроса раз в 2 секунды и лишних обращений к WebDriver.
+"""
+import time
+from config import *
+
+ASSISTANT_SELECTOR = "[data-message-author-role='assistant']"
+
+COUNT_SCRIPT = f"return document.querySelectorAll(\"{ASSISTANT_SELECTOR}\").length;"
+
+# Аргументы: окно тишины (мс), предел ожидания (мс),
+# сообщений ассистента до отправки (-1 если неизвестно), callback от Selenium
+COMPLETION_SCRIPT = """
+var quietMs = arguments[0];
+var limitMs = arguments[1];
+var baseline = arguments[2];
+var done = arguments[arguments.length - 1];
+var start = Date.now();
+
+function lastText() {
+    // Ответ на прошлый запрос (режим одного чата) - не наш ответ
+    var messages = document.querySelectorAll("[data-message-author-role='assistant']");
+    return messages.length > baseline ? messages[messages.length - 1].textContent : null;
+}
+
+function stopVisible() {
+    var buttons = document.querySelectorAll("button");
+    for (var i = 0; i < buttons.length; i++) {
+        var button = buttons[i];
+        var label = (button.textContent || "") + " " + (button.getAttribute("aria-label") || "");
+        var isStop = button.getAttribute("data-testid") === "stop-button" ||
+                     label.indexOf("Stop") !== -1 || label.indexOf("Остановить") !== -1;
+        if (isStop && button.offsetParent !== null) {
+            return true;
+        }
+    }
+    return false;
+}
+
+var text = lastText();
+var lastChange = Date.now();
+var finished = false;
+var observer = null;
+var timer = null;
+
+function finish(result) {
+    if (finished) {
+        return;
+    }
+    finished = true;
+    if (observer) {
+        observer.disconnect();
+    }
+    clearInterval(timer);
+    result.elapsed = Date.now() - start;
+    result.length = text ? text.length : 0;
+    done(result);
+}
+
+function check() {
+    var current = lastText();
+    if (current !== text) {
+        text = current;
+        lastChange = Date.now();
+    }
+    var stop = stopVisible();
+    if (text && !stop && Date.now() - lastChange >= quietMs) {
+        finish({done: true, stop: false});
+    } else if (Date.now() - start >= limitMs) {
+        finish({done: false, stop: stop});
+    }
+}
+
+observer = new MutationObserver(check);
+observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+// Окно тишины - это отсутствие мутаций, его отсчитывает таймер
+timer = setInterval(check, Math.max(50, Math.min(quietMs, 250)));
+check();
+"""
+
+
+class CompletionDetector:
+    """
+    Ожидание завершения генерации через MutationObserver
+
+    Ждет отрезками по slice секунд: между ними вызывающий код
+    проверяет ошибки ChatGPT (и может прервать ожидание).
+    Если страница не поддерживает скрипт - wait() возвращает None,
+    и вызывающий код переходит на обычный опрос поля ввода.
+    """
+
+    def __init__(self, driver, quiet_window=COMPLETION_QUIET_WINDOW, slice_seconds=COMPLETION_SLICE_SECONDS):
+        """
+        quiet_window: сколько секунд текст ответа не должен меняться
+        slice_seconds: длина одного ожидания в execute_async_script
+        """
+        self.driver = driver
+        self.quiet_window = quiet_window
+        self.slice_seconds = slice_seconds
+        self.enabled = COMPLETION_OBSERVER_ENABLED
+        self.baseline = -1
+
+    def mark_baseline(self):
+        """
+        Запоминает количество сообщений ассистента (вызывать до отправки запроса)
+
+        wait() ждет только сообщение, появившееся после этого момента.
+        """
+        self.baseline = -1
+        if not self.enabled:
+            return
+        try:
+            self.baseline = self.driver.execute_script(COUNT_SCRIPT)
+        except Exception as e:
+            print(f"  ⚠️ Не удалось посчитать сообщения ассистента: {str(e).splitlines()[0][:100]}")
+
+    def _get_script_timeout(self):
+        """Текущий таймаут скриптов драйвера (None если не узнать)"""
+        try:
+            return self.driver.timeouts.script
+        except Exception:
+            return None
+
+    def wait(self, max_wait=GENERATION_MAX_WAIT, on_slice=None, slice_seconds=None):
+        """
+        Ждет завершения генерации
+
+        on_slice: функция без аргументов, вызывается после каждого отрезка
+        без результата; если она вернула (False, message) - ожидание прерывается
+        slice_seconds: длина отрезка вместо self.slice_seconds (короче -
+        чаще вызывается on_slice, например для потокового захвата ответа)
+        Возвращает: (success, message) или None (наблюдатель недоступен)
+        """
+        if not self.enabled:
+            return None
+
+        print(f"  ⏳ Жду завершения генерации (наблюдатель, макс {max_wait}с)...")
+
+        slice_seconds = slice_seconds or self.slice_seconds
+        previous_timeout = self._get_script_timeout()
+        try:
+            # Запас сверху, чтобы таймаут сработал в странице, а не в драйвере
+            self.driver.set_script_timeout(slice_seconds + 10)
+        except Exception as e:
+            print(f"  ⚠️ Наблюдатель недоступен ({str(e).splitlines()[0][:100]}), перехожу на опрос")
+            return None
+
+        try:
+            return self._wait_slices(max_wait, on_slice, slice_seconds)
+        finally:
+            if previous_timeout is not None:
+                try:
+                    self.driver.set_script_timeout(previous_timeout)
+                except Exception:
+                    pass
+
+    def _wait_slices(self, max_wait, on_slice, slice_seconds):
+        """Ожидание отрезками (таймаут скриптов уже выставлен)"""
+        start_time = time.time()
+        slices = 0
+
+        while True:
+            remaining = max_wait - (time.time() - start_time)
+            if remaining <= 0:
+                break
+
+            slice_length = min(slice_seconds, remaining)
+            slices += 1
+
+            try:
+                result = self.driver.execute_async_script(
+                    COMPLETION_SCRIPT,
+                    int(self.quiet_window * 1000),
+                    int(slice_length * 1000),
+                    self.baseline
+                )
+            except Exception as e:
+                print(f"  ⚠️ Наблюдатель недоступен ({str(e).splitlines()[0][:100]}), перехожу на опрос")
+                return None
+
+            if not isinstance(result, dict):
+                print(f"  ⚠️ Наблюдатель вернул {result!r}, перехожу на опрос")
+                return None
+
+            if result.get('done'):
+                elapsed = time.time() - start_time
+                print(f"  ✅ Генерация завершена за {elapsed:.1f}с "
+                      f"(символов: {result.get('length', 0)}, отрезков: {slices})")
+                return True, "Генерация завершена"
+
+            if on_slice is not None:
+                outcome = on_slice()
+                if outcome is not None and not outcome[0]:
+                    return outcome
+
+        elapsed = time.time() - start_time
+        return False, f"Таймаут: генерация не завершилась за {elapsed:.1f}с"
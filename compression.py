@@ -0,0 +1,139 @@
+"""
+Сжатие файлов результатов и логов (gzip или zstd)
+Формат определяется по расширению, чтение - потоковое
+"""
+import gzip
+import io
+import os
+import shutil
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Расширение файла для каждого вида сжатия
+COMPRESSION_EXTENSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst'
+}
+
+
+def resolve_compression(compression):
+    """
+    Проверяет вид сжатия
+
+    zstd требует пакет zstandard - без него используется gzip.
+    Возвращает: None, 'gzip' или 'zstd'
+    """
+    if not compression:
+        return None
+    if compression not in COMPRESSION_EXTENSIONS:
+        print(f"⚠️  Неизвестный вид сжатия '{compression}', использую gzip")
+        return 'gzip'
+    if compression == 'zstd' and zstandard is None:
+        print("⚠️  Пакет zstandard не установлен, использую gzip")
+        return 'gzip'
+    return compression
+
+
+def compression_extension(compression):
+    """Расширение для вида сжатия ('' без сжатия)"""
+    return COMPRESSION_EXTENSIONS.get(compression, '')
+
+
+def detect_compression(path):
+    """Вид сжатия по расширению файла (None для несжатых)"""
+    for compression, ext in COMPRESSION_EXTENSIONS.items():
+        if path.endswith(ext):
+            return compression
+    return None
+
+
+def compress_bytes(data, compression):
+    """Сжимает данные целиком в памяти (без сжатия - возвращает как есть)"""
+    if compression == 'gzip':
+        return gzip.compress(data)
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+class _ZstdWriter:
+    """Потоковая запись zstd поверх обычного файла (с поддержкой fsync)"""
+
+    def __init__(self, path, mode):
+        self._raw = open(path, mode)
+        self._writer = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+
+    def write(self, data):
+        return self._writer.write(data)
+
+    def flush(self):
+        # Закрываем текущий блок, чтобы записанное можно было прочитать после сбоя
+        self._writer.flush(zstandard.FLUSH_BLOCK)
+        self._raw.flush()
+
+    def fileno(self):
+        return self._raw.fileno()
+
+    def close(self):
+        self._writer.close()
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def open_compressed(path, mode='rb'):
+    """
+    Открывает файл в бинарном режиме с учетом сжатия
+
+    mode: 'rb', 'wb', 'ab' или 'xb'. У возвращаемого объекта есть
+    write/flush/fileno/close, поэтому после flush() можно делать os.fsync.
+    """
+    compression = detect_compression(path)
+
+    if compression == 'gzip':
+        return gzip.open(path, mode)
+
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Для чтения .zst нужен пакет zstandard")
+        if mode == 'rb':
+            return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True,
+                                                              read_across_frames=True)
+        return _ZstdWriter(path, mode)
+
+    return open(path, mode)
+
+
+def iter_lines(path):
+    """
+    Построчно читает (и распаковывает) файл, не загружая его целиком
+
+    Сжатый файл, который еще пишется (или оборван сбоем), читается
+    до последнего сброшенного на диск блока.
+    """
+    with open_compressed(path, 'rb') as f:
+        reader = f if detect_compression(path) != 'zstd' else io.BufferedReader(f)
+        try:
+            for line in reader:
+                yield line
+        except EOFError:
+            return
+
+
+def compress_file(source, destination):
+    """Сжимает файл целиком и удаляет исходный (вид сжатия - по расширению destination)"""
+    name, ext = os.path.splitext(destination)
+    tmp_destination = f"{name}.tmp{ext}"
+
+    with open(source, 'rb') as src, open_compressed(tmp_destination, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+
+    os.replace(tmp_destination, destination)
+    os.remove(source)
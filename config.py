@@ -17,6 +17,44 @@ COL_PROJECT = 6   # F - Проект ChatGPT (опционально)
 COL_MODEL = 7     # G - Модель (GPT-4, GPT-4o, o1, etc.)
 COL_CHAT_MODE = 8 # H - Режим чата (new/continue/series)
 
+# Источник запросов: 'excel', 'csv', 'jsonl' или 'sqlite'
+# Для csv/jsonl входной файл только читается, статусы пишутся в журнал {файл}.journal
+# Для sqlite EXCEL_FILE импортируется в базу при первом запуске, новые строки Excel - при каждом
+REQUEST_SOURCE = 'excel'
+CSV_FILE = "requests.csv"      # Колонки в том же порядке, что и в Excel
+CSV_DELIMITER = ","
+JSONL_FILE = "requests.jsonl"  # {"request": "...", "project": "...", "model": "...", "chat_mode": "new"}
+JOB_STORE_FILE = "jobs.db"
+JOB_STORE_EXPORT_FILE = "results.xlsx"  # Выгрузка результатов при завершении (None = не выгружать)
+JOB_CLAIM_TIMEOUT = 600                 # Через сколько секунд "зависший" запрос можно забрать снова
+
+# Отложенная запись Excel (write-behind)
+EXCEL_WRITE_BEHIND = True     # Копить изменения в памяти и сохранять пачками
+EXCEL_FLUSH_EVERY_ROWS = 10   # Сохранять после N измененных строк
+EXCEL_FLUSH_INTERVAL = 60     # ...или не реже чем раз в N секунд
+EXCEL_JOURNAL_ENABLED = True  # Журнал статусов для восстановления после сбоя
+
+# Способ сохранения Excel:
+# 'openpyxl' - пересохранить всю книгу
+# 'patch'    - переписать только измененные строки листа внутри xlsx, остальные части
+#              архива копируются без пересжатия. Быстрее openpyxl, но XML листа все равно
+#              распаковывается и сжимается целиком: сохранение дорожает с размером листа
+EXCEL_SAVE_ENGINE = 'patch'
+# С журналом и 'patch' каждый результат стоит одной дозаписи в журнал (не зависит
+# от размера книги), а сама книга собирается из журнала раз в N секунд и при завершении
+EXCEL_PATCH_ASSEMBLE_INTERVAL = 600
+
+# Отдельный файл для результатов (None = писать результаты в EXCEL_FILE)
+# Если задан - EXCEL_FILE только читается, результаты копятся в журнале
+# и собираются в этот файл при завершении
+EXCEL_OUTPUT_FILE = None
+
+# Длинные ответы (Excel ломается на ячейках > 32767 символов)
+RESPONSE_SIDECAR_THRESHOLD = 10000  # Длиннее - полный текст в файл, в ячейке начало + ссылка (0 = выкл)
+RESPONSE_PREVIEW_LENGTH = 500       # Сколько символов ответа оставлять в ячейке
+RESPONSE_SIDECAR_DIR = "responses"  # Папка для полных текстов
+RESPONSE_SIDECAR_COMPRESSION = None  # None, 'gzip' или 'zstd' - сжимать файлы ответов
+
 # Браузер настройки
 BRAVE_PATH = "C:/Program Files/BraveSoftware/Brave-Browser/Application/brave.exe"
 PROFILE_DIR = os.path.abspath(os.path.join(os.getcwd(), "chatgpt_profile"))
@@ -28,6 +66,25 @@ ELEMENT_WAIT_TIMEOUT = 20
 RESPONSE_WAIT_TIMEOUT = 90
 GENERATION_MAX_WAIT = 120
 
+# Завершение генерации: MutationObserver в странице вместо опроса поля ввода
+COMPLETION_OBSERVER_ENABLED = True  # False - только опрос (как раньше)
+COMPLETION_QUIET_WINDOW = 0.8  # Сколько секунд ответ не должен меняться
+COMPLETION_SLICE_SECONDS = 10  # Между отрезками ожидания проверяются ошибки
+PAGE_PROBE_ENABLED = True  # Готовность поля и ошибки одним скриптом в странице
+
+# Адаптивный опрос готовности (когда наблюдатель недоступен)
+POLL_HISTORY_FILE = "poll_history.json"  # Время генерации по моделям и длине запроса
+POLL_MIN_INTERVAL = 0.5  # Сразу после отправки и около ожидаемого конца
+POLL_MAX_INTERVAL = 5  # Во время долгого размышления
+POLL_FAST_PHASE = 3  # Секунд частого опроса после отправки
+POLL_DEFAULT_EXPECTED = 20  # Ожидаемое время генерации, пока нет истории
+POLL_HISTORY_ALPHA = 0.2  # Вес нового замера в скользящем среднем
+
+# Потоковый захват ответа (время до первого токена, скорость генерации)
+STREAM_CAPTURE_ENABLED = True
+STREAM_POLL_INTERVAL = 2  # Как часто забирать куски ответа из страницы (сек)
+STREAM_CHARS_PER_TOKEN = 4  # Для оценки количества токенов по длине текста
+
 # Задержки для переключения проектов/моделей
 PROJECT_SWITCH_DELAY = 3
 MODEL_SWITCH_DELAY = 2
@@ -47,6 +104,10 @@ KEEP_LAST_BACKUPS = 5
 # Логирование
 LOG_ENABLED = True
 LOG_DIR = "logs"
+LOG_COMPRESSION = None  # None, 'gzip' или 'zstd' - сжимать ротированные логи
+LOG_MAX_BYTES = 50 * 1024 * 1024  # Размер лога, после которого начинается новый файл
+LOG_BACKUP_COUNT = 50  # Сколько старых (сжатых) логов хранить
+LOG_ASYNC = True  # Писать лог в файл из отдельного потока (QueueListener)
 
 # ChatGPT URL
 CHATGPT_URL = "https://chat.openai.com/"
@@ -60,6 +121,13 @@ STATUS_RATE_LIMIT = "Превышен лимит"
 STATUS_NETWORK_ERROR = "Ошибка сети"
 STATUS_TIMEOUT = "Таймаут"
 
+# Статусы, при которых запрос нужно (пере)выполнить
+RETRY_STATUSES = [STATUS_ERROR, STATUS_IN_PROGRESS, STATUS_RATE_LIMIT,
+                  STATUS_NETWORK_ERROR, STATUS_TIMEOUT]
+
+# Статусы, которые считаются ошибками в статистике
+ERROR_STATUSES = [STATUS_ERROR, STATUS_RATE_LIMIT, STATUS_NETWORK_ERROR, STATUS_TIMEOUT]
+
 # Поддерживаемые модели (обновленный список для GPT-5)
 SUPPORTED_MODELS = {
     'gpt-5.2': 'GPT-5.2',
@@ -77,10 +145,42 @@ CHAT_MODE_NEW = 'new'          # Новый чат
 CHAT_MODE_CONTINUE = 'continue' # Продолжить текущий чат
 CHAT_MODE_SERIES = 'series'     # Серия запросов в одном чате
 
+# Кэш ответов (повторные запросы не отправляются в браузер)
+# Выключен по умолчанию: очищенный статус строки должен означать новый запрос,
+# а не ответ из кэша
+RESPONSE_CACHE_ENABLED = False
+RESPONSE_CACHE_REFRESH = False  # Обновить кэш: ответы не берутся из кэша, а записываются заново
+RESPONSE_CACHE_FILE = "response_cache.db"
+RESPONSE_CACHE_MAX_ENTRIES = 10000  # Максимум записей (вытесняются давно не использованные)
+RESPONSE_CACHE_MAX_BYTES = 200 * 1024 * 1024  # Максимальный суммарный размер ответов
+RESPONSE_CACHE_TTL = 7 * 24 * 60 * 60  # Срок жизни записи в секундах (0 = бессрочно)
+
+# Фоновая запись результатов (Excel/JSON сохраняются в отдельном потоке)
+BACKGROUND_WRITER_ENABLED = True
+BACKGROUND_WRITER_QUEUE_SIZE = 100  # При заполнении очереди основной поток ждет
+
 # JSON настройки
 JSON_ENABLED = True
 JSON_OUTPUT_DIR = "json_results"
 JSON_SAVE_INCREMENTAL = True  # Сохранять после каждого запроса
+JSON_SINK_MODE = 'files'  # 'files' - отдельный файл на запрос, 'jsonl' - строки в сегментах
+JSON_FILE_LAYOUT = 'sharded'  # 'sharded' - ab/cd/<hash>.json + манифест, 'flat' - {запрос}_{время}.json
+JSON_INDEX_ENABLED = True  # Индекс результатов в SQLite ({JSON_OUTPUT_DIR}/results.db), см. result_index.py
+JSON_VERSIONING_ENABLED = True  # История версий по строкам ({JSON_OUTPUT_DIR}/versions.jsonl, см. result_versions.py)
+# С версиями ответ длиннее RESPONSE_PREVIEW_LENGTH хранится один раз в {RESPONSE_SIDECAR_DIR} (по sha256),
+# в JSON - начало ответа + ссылка: повторные прогоны с тем же ответом не дублируют текст
+
+# Выгрузка и анализ результатов (result_export.py)
+RESULT_LOADER_WORKERS = None  # Процессов для чтения JSON (None = по числу ядер)
+RESULT_EXPORT_BATCH_SIZE = 10000  # Строк в одной пачке Parquet
+JSON_COMPACT_ENABLED = True  # Сжимать мелкие файлы результатов в Parquet во время пауз (нужен pyarrow)
+JSON_COMPACT_MIN_FILES = 500  # Сжимать, когда набралось столько файлов
+JSON_COMPACT_MAX_FILES = 20000  # Максимум файлов в одном архиве
+JSON_SEGMENT_MAX_BYTES = 64 * 1024 * 1024  # Размер сегмента, после которого начинается новый
+JSON_COMMIT_EVERY = 20  # fsync после N записей...
+JSON_COMMIT_INTERVAL = 5  # ...или если с прошлого fsync прошло N секунд
+JSON_SEGMENT_MAX_AGE = 24 * 60 * 60  # Новый сегмент не реже раза в N секунд (0 = только по размеру)
+JSON_COMPRESSION = None  # None, 'gzip' или 'zstd' (нужен пакет zstandard)
 
 # ============================================================
 # HUMANIZATION SETTINGS
@@ -107,6 +207,7 @@ HUMANIZATION_CONFIG = {
     # === АКТИВНОСТЬ ВО ВРЕМЯ ОЖИДАНИЯ ===
     'simulate_reading': True,  # Имитировать чтение ответа
     'reading_activity_interval': (10, 20),  # Активность каждые 10-20с
+    'reading_check_interval': 0.5,  # Как часто проверять готовность во время активности
     
     # === КЛИКИ МЫШИ ===
     'human_click_enabled': True,  # Клики со смещением
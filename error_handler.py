@@ -4,6 +4,7 @@
 from selenium.webdriver.common.by import By
 from selenium.common.exceptions import NoSuchElementException
 import time
+from page_probe import PageProbe
 
 class ChatGPTErrorHandler:
     """Класс для обнаружения и обработки ошибок ChatGPT"""
@@ -41,12 +42,22 @@ class ChatGPTErrorHandler:
     
     def __init__(self, driver):
         self.driver = driver
+        self.probe = PageProbe(driver, self.ERROR_PATTERNS)
     
-    def check_for_errors(self):
+    def check_for_errors(self, state=None):
         """
         Проверяет страницу на наличие ошибок
+        
+        state: уже полученное состояние страницы (PageProbe.state),
+        чтобы не обращаться к браузеру второй раз за проверку
         Возвращает: (error_type, error_message) или (None, None)
         """
+        if state is None:
+            state = self.probe.state()
+        if state is not None:
+            return self.probe.error(state)
+        
+        # Скрипт недоступен - проверяем через WebDriver
         try:
             # Проверяем весь текст страницы
             page_text = self.driver.find_element(By.TAG_NAME, "body").text.lower()
@@ -4,15 +4,46 @@
 from openpyxl import load_workbook, Workbook
 from datetime import datetime
 import os
+import time
 from config import *
+from status_journal import StatusJournal
+from status_index import StatusIndex
+from xlsx_patcher import XlsxPatcher
+from response_store import ResponseStore
 
 class ExcelHandler:
     """Класс для работы с Excel файлом"""
     
-    def __init__(self, filename=EXCEL_FILE):
+    def __init__(self, filename=EXCEL_FILE, write_behind=EXCEL_WRITE_BEHIND,
+                 flush_every=EXCEL_FLUSH_EVERY_ROWS, flush_interval=EXCEL_FLUSH_INTERVAL,
+                 journal=EXCEL_JOURNAL_ENABLED, save_engine=EXCEL_SAVE_ENGINE,
+                 sidecar_threshold=RESPONSE_SIDECAR_THRESHOLD,
+                 assemble_interval=EXCEL_PATCH_ASSEMBLE_INTERVAL):
+        """
+        write_behind: копить изменения в памяти и сохранять пачками
+        flush_every: сохранять после N измененных строк
+        flush_interval: сохранять не реже чем раз в N секунд
+        journal: писать каждое изменение в журнал статусов (fsync на запись)
+        save_engine: 'openpyxl' (вся книга) или 'patch' (только измененные строки)
+        sidecar_threshold: ответы длиннее выносятся в отдельные файлы (0 = выкл)
+        assemble_interval: с журналом и 'patch' - как часто собирать книгу из журнала (сек)
+        """
         self.filename = filename
+        self.results_file = filename  # Куда попадают результаты
         self.wb = None
         self.ws = None
+        self.index = None
+        
+        self.write_behind = write_behind
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.assemble_interval = assemble_interval
+        self._dirty_rows = set()
+        self._last_flush = time.time()
+        
+        self.journal = StatusJournal(f"{filename}.journal") if journal else None
+        self.patcher = XlsxPatcher(filename) if save_engine == 'patch' else None
+        self.response_store = ResponseStore(threshold=sidecar_threshold)
     
     def load(self):
         """Загружает Excel файл"""
@@ -23,61 +54,319 @@ class ExcelHandler:
         try:
             self.wb = load_workbook(self.filename)
             self.ws = self.wb[SHEET_NAME] if SHEET_NAME in self.wb.sheetnames else self.wb.active
-            return True
         except Exception as e:
             print(f"❌ Ошибка при загрузке Excel: {e}")
             return False
+        
+        self._build_index()
+        
+        if self.journal:
+            self._replay_journal()
+            self.journal.open()
+        
+        return True
+    
+    def is_loaded(self):
+        """Загружена ли книга"""
+        return self.wb is not None
+    
+    def check_structure(self):
+        """
+        Проверяет структуру загруженного листа
+        
+        Использует индекс, построенный при загрузке, - файл повторно не читается.
+        Возвращает: (errors, warnings)
+        """
+        errors = []
+        warnings = []
+        
+        total = self.index.get_statistics()['total']
+        
+        # Проверяем минимальное количество строк
+        if total < 1:
+            errors.append("Excel файл пустой (нет данных кроме заголовка)")
+            return errors, warnings
+        
+        # Проверяем заголовки
+        expected_headers = {
+            COL_REQUEST: "Запрос",
+            COL_RESPONSE: "Ответ", 
+            COL_STATUS: "Статус",
+            COL_DATE: "Дата выполнения",
+            COL_ERROR: "Ошибка"
+        }
+        
+        for col, expected_name in expected_headers.items():
+            actual_value = self._get_header(col)
+            if actual_value != expected_name:
+                warnings.append(
+                    f"Колонка {col}: ожидался заголовок '{expected_name}', "
+                    f"найден '{actual_value}'"
+                )
+        
+        # Проверяем что есть хотя бы один запрос
+        empty_count = self.index.count_empty_rows()
+        
+        if empty_count == total:
+            errors.append("Нет ни одного запроса для обработки")
+            return errors, warnings
+        
+        if empty_count:
+            empty_rows = self.index.empty_rows(limit=5)
+            warnings.append(
+                f"Найдены пустые строки: {', '.join(map(str, empty_rows))}"
+                f"{'...' if empty_count > 5 else ''}"
+            )
+        
+        return errors, warnings
+    
+    def _get_header(self, col):
+        """Возвращает заголовок колонки"""
+        return self.ws.cell(1, col).value
+    
+    def _build_index(self):
+        """Строит индекс статусов одним проходом по листу"""
+        self.index = StatusIndex(first_row=2)
+        
+        for row, values in self._iter_rows():
+            self.index.add_row(
+                status=self._get_value(values, COL_STATUS),
+                has_request=bool(self._get_value(values, COL_REQUEST)),
+                project=self._get_value(values, COL_PROJECT),
+                model=self._get_value(values, COL_MODEL),
+                chat_mode=self._get_value(values, COL_CHAT_MODE)
+            )
+    
+    def _replay_journal(self):
+        """
+        Проигрывает журнал статусов в загруженную книгу
+        
+        Восстанавливает изменения, не попавшие в Excel до сбоя (в т.ч.
+        строки, оставшиеся "В процессе"). Книга сохраняется при следующем flush.
+        """
+        if not self.journal.exists():
+            return
+        
+        replayed = 0
+        for record in self.journal.replay():
+            self._apply_update(
+                record['row'],
+                record['status'],
+                response=self.journal.read_response(record),
+                error_message=record.get('error') or "",
+                date=record.get('ts')
+            )
+            self._dirty_rows.add(record['row'])
+            replayed += 1
+        
+        if replayed:
+            print(f"♻️  Восстановлено из журнала: {replayed} изменений ({len(self._dirty_rows)} строк)")
     
     def save(self):
-        """Сохраняет изменения"""
+        """
+        Сохраняет изменения атомарно
+        
+        Книга пишется во временный файл рядом с оригиналом и затем
+        подменяет его через os.replace - при сбое во время записи
+        исходный файл остается целым.
+        """
+        name, ext = os.path.splitext(self.filename)
+        tmp_filename = f"{name}.tmp{ext}"
+        
         try:
-            self.wb.save(self.filename)
+            self.wb.save(tmp_filename)
+            os.replace(tmp_filename, self.filename)
             return True
         except Exception as e:
             print(f"❌ Ошибка при сохранении Excel: {e}")
+            if os.path.exists(tmp_filename):
+                try:
+                    os.remove(tmp_filename)
+                except OSError:
+                    pass
             return False
     
-    def get_pending_requests(self):
-        """Получает список невыполненных запросов"""
-        pending = []
+    def flush(self):
+        """Сохраняет накопленные изменения (если они есть)"""
+        if self.wb is None or not self._dirty_rows:
+            return True
         
-        for row in range(2, self.ws.max_row + 1):
-            request = self.ws.cell(row, COL_REQUEST).value
-            status = self.ws.cell(row, COL_STATUS).value
-            
-            # Берем запросы без статуса или с ошибкой
-            if request and (not status or status in [STATUS_ERROR, STATUS_IN_PROGRESS, 
-                                                     STATUS_RATE_LIMIT, STATUS_NETWORK_ERROR, 
-                                                     STATUS_TIMEOUT]):
-                
-                # Читаем дополнительные параметры
-                project = self._get_cell_value(row, COL_PROJECT)
-                model = self._get_cell_value(row, COL_MODEL)
-                chat_mode = self._get_cell_value(row, COL_CHAT_MODE)
-                
-                pending.append({
-                    'row': row,
-                    'request': request.strip(),
-                    'project': project,
-                    'model': model,
-                    'chat_mode': chat_mode if chat_mode else CHAT_MODE_NEW
-                })
+        # Сначала пробуем переписать только измененные строки,
+        # при неудаче - сохраняем книгу целиком
+        if not (self.patcher and self.patcher.apply(self._collect_changes())) and not self.save():
+            return False
+        
+        # Все изменения уже в книге - журнал можно очистить
+        if self.journal:
+            self.journal.compact()
+        
+        self._dirty_rows.clear()
+        self._last_flush = time.time()
+        return True
+    
+    def _collect_changes(self):
+        """Текущие значения изменяемых колонок для несохраненных строк"""
+        changes = {}
+        for row in self._dirty_rows:
+            changes[row] = {
+                col: self.ws.cell(row, col).value
+                for col in (COL_RESPONSE, COL_STATUS, COL_DATE, COL_ERROR)
+            }
+        return changes
+    
+    def close(self):
+        """Сохраняет несохраненные изменения перед завершением"""
+        result = self.flush()
+        if self.journal:
+            self.journal.close()
+        return result
+    
+    def _should_flush(self, status):
+        """Определяет пора ли сохранять накопленные изменения"""
+        if not self.write_behind:
+            return True
         
-        return pending
+        # Ошибки сохраняем сразу - после них работа часто прерывается
+        # (с журналом это не нужно: запись уже на диске)
+        if not self.journal and status in ERROR_STATUSES:
+            return True
+        
+        if self.journal and self.patcher:
+            # Изменение уже на диске в журнале, а сборка книги стоит тем больше,
+            # чем больше лист - собираем редко (и при завершении)
+            return time.time() - self._last_flush >= self.assemble_interval
+        
+        if len(self._dirty_rows) >= self.flush_every:
+            return True
+        
+        return time.time() - self._last_flush >= self.flush_interval
     
-    def _get_cell_value(self, row, col):
-        """Безопасно получает значение ячейки"""
+    def _iter_rows(self):
+        """
+        Построчно перебирает данные листа: (номер строки, значения колонок A..H)
+        
+        Если книга уже загружена - читает из нее (с учетом несохраненных
+        изменений). Иначе открывает файл в режиме read_only и держит
+        в памяти только текущую строку.
+        """
+        if self.ws is not None:
+            rows = self.ws.iter_rows(min_row=2, max_col=COL_CHAT_MODE, values_only=True)
+            for row, values in enumerate(rows, 2):
+                yield row, values
+            return
+        
+        wb = load_workbook(self.filename, read_only=True)
         try:
-            if self.ws.max_column >= col:
-                value = self.ws.cell(row, col).value
-                return value.strip() if value else None
+            ws = wb[SHEET_NAME] if SHEET_NAME in wb.sheetnames else wb.active
+            rows = ws.iter_rows(min_row=2, max_col=COL_CHAT_MODE, values_only=True)
+            for row, values in enumerate(rows, 2):
+                yield row, values
+        finally:
+            wb.close()
+    
+    def _make_pending_item(self, row, values):
+        """Возвращает описание запроса для строки или None если он уже выполнен"""
+        request = self._get_value(values, COL_REQUEST)
+        status = self._get_value(values, COL_STATUS)
+        
+        # Берем запросы без статуса или с ошибкой
+        if not request or (status and status not in RETRY_STATUSES):
             return None
-        except:
+        
+        chat_mode = self._get_value(values, COL_CHAT_MODE)
+        
+        return {
+            'row': row,
+            'request': str(request),
+            'project': self._get_value(values, COL_PROJECT),
+            'model': self._get_value(values, COL_MODEL),
+            'chat_mode': chat_mode if chat_mode else CHAT_MODE_NEW
+        }
+    
+    def _get_value(self, values, col):
+        """Безопасно получает значение колонки из строки"""
+        if len(values) < col:
             return None
+        return self._clean_value(values[col - 1])
+    
+    def _clean_value(self, value):
+        """Обрезает пробелы у строк, пустые значения превращает в None"""
+        if isinstance(value, str):
+            value = value.strip()
+        return value if value else None
+    
+    def iter_pending_requests(self):
+        """Лениво перебирает невыполненные запросы (генератор)"""
+        if self.index is not None:
+            # Из индекса: читаем с листа только текст невыполненных запросов
+            for row in self.index.pending_rows():
+                info = self.index.get(row)
+                yield {
+                    'row': row,
+                    'request': str(self._clean_value(self.ws.cell(row, COL_REQUEST).value)),
+                    'project': info['project'],
+                    'model': info['model'],
+                    'chat_mode': info['chat_mode'] if info['chat_mode'] else CHAT_MODE_NEW
+                }
+            return
+        
+        for row, values in self._iter_rows():
+            item = self._make_pending_item(row, values)
+            if item:
+                yield item
+    
+    def scan(self):
+        """
+        Один проход по листу
+        
+        Возвращает: (список невыполненных запросов, статистика)
+        """
+        if self.index is not None:
+            return self.get_pending_requests(), self.index.get_statistics()
+        
+        pending = []
+        counts = {'total': 0, 'success': 0, 'errors': 0, 'pending': 0}
+        
+        for row, values in self._iter_rows():
+            status = self._get_value(values, COL_STATUS)
+            
+            counts['total'] += 1
+            if status == STATUS_SUCCESS:
+                counts['success'] += 1
+            elif status in ERROR_STATUSES:
+                counts['errors'] += 1
+            else:
+                counts['pending'] += 1
+            
+            item = self._make_pending_item(row, values)
+            if item:
+                pending.append(item)
+        
+        return pending, counts
+    
+    def get_pending_requests(self):
+        """Получает список невыполненных запросов"""
+        return list(self.iter_pending_requests())
     
     def update_status(self, row, status, response="", error_message=""):
         """Обновляет статус запроса"""
+        response = self.response_store.make_cell_value(response)
+        
+        date = None
+        if self.journal:
+            date = self.journal.append(row, status, response, error_message)['ts']
+        
+        self._apply_update(row, status, response, error_message, date)
+        self._dirty_rows.add(row)
+        
+        if self._should_flush(status):
+            self.flush()
+    
+    def _apply_update(self, row, status, response="", error_message="", date=None):
+        """Записывает изменение статуса в ячейки листа"""
         self.ws.cell(row, COL_STATUS).value = status
+        if self.index is not None:
+            self.index.set_status(row, status)
         
         if response:
             self.ws.cell(row, COL_RESPONSE).value = response
@@ -86,29 +375,12 @@ class ExcelHandler:
             self.ws.cell(row, COL_ERROR).value = error_message
         
         if status == STATUS_SUCCESS:
-            self.ws.cell(row, COL_DATE).value = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        self.save()
+            self.ws.cell(row, COL_DATE).value = date or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
     def get_statistics(self):
         """Возвращает статистику по запросам"""
-        total = self.ws.max_row - 1  # Минус заголовок
-        success = 0
-        errors = 0
-        pending = 0
+        if self.index is not None:
+            return self.index.get_statistics()
         
-        for row in range(2, self.ws.max_row + 1):
-            status = self.ws.cell(row, COL_STATUS).value
-            if status == STATUS_SUCCESS:
-                success += 1
-            elif status in [STATUS_ERROR, STATUS_RATE_LIMIT, STATUS_NETWORK_ERROR, STATUS_TIMEOUT]:
-                errors += 1
-            else:
-                pending += 1
-        
-        return {
-            'total': total,
-            'success': success,
-            'errors': errors,
-            'pending': pending
-        }
\ No newline at end of file
+        _, counts = self.scan()
+        return counts
@@ -41,6 +41,7 @@ class HumanBehavior:
             # Активность во время ожидания
             'simulate_reading': True,
             'reading_activity_interval': (10, 20),
+            'reading_check_interval': 0.5,
             
             # Клики
             'human_click_enabled': True,
@@ -273,7 +274,7 @@ class HumanBehavior:
     # АКТИВНОСТЬ ВО ВРЕМЯ ОЖИДАНИЯ
     # ============================================================
     
-    def simulate_reading(self, driver, duration=10):
+    def simulate_reading(self, driver, duration=10, should_stop=None):
         """
         Имитирует чтение во время ожидания ответа
         
@@ -281,11 +282,18 @@ class HumanBehavior:
         - Движение мышкой
         - Скролл
         - Паузы
+        
+        should_stop: функция без аргументов (например, "ответ готов?").
+        Если задана - активность идет короткими отрезками, между которыми
+        (не реже чем раз в reading_check_interval) вызывается should_stop,
+        и имитация прерывается, как только она вернет True.
+        
+        Возвращает: True если имитация прервана, иначе False
         """
         if not self.config['simulate_reading']:
-            time.sleep(duration)
-            return
+            return self._pause(duration, should_stop)
         
+        check_interval = self.config.get('reading_check_interval', 0.5)
         start_time = time.time()
         
         while time.time() - start_time < duration:
@@ -297,7 +305,11 @@ class HumanBehavior:
             ])
             
             if activity == 'move_mouse':
-                self.move_mouse_randomly(driver, duration=random.uniform(1, 3))
+                move_duration = random.uniform(1, 3)
+                if should_stop is not None:
+                    # Движение целиком блокирует поток - делаем его коротким
+                    move_duration = min(move_duration, check_interval)
+                self.move_mouse_randomly(driver, duration=move_duration)
             
             elif activity == 'small_scroll':
                 scroll_amount = random.randint(-100, 100)
@@ -307,7 +319,31 @@ class HumanBehavior:
                     pass
             
             # Пауза между действиями
-            time.sleep(random.uniform(1.0, 3.0))
+            if self._pause(random.uniform(1.0, 3.0), should_stop):
+                return True
+        
+        return False
+    
+    def _pause(self, duration, should_stop=None):
+        """
+        Пауза, которую можно прервать
+        
+        Возвращает: True если should_stop вернула True до конца паузы
+        """
+        if should_stop is None:
+            time.sleep(duration)
+            return False
+        
+        check_interval = self.config.get('reading_check_interval', 0.5)
+        end_time = time.time() + duration
+        
+        while True:
+            if should_stop():
+                return True
+            remaining = end_time - time.time()
+            if remaining <= 0:
+                return False
+            time.sleep(min(check_interval, remaining))
     
     # ============================================================
     # СЛУЧАЙНЫЕ ДЕЙСТВИЯ
@@ -0,0 +1,366 @@
+"""
+Хранилище заданий в SQLite
+Альтернатива Excel во время работы: Excel только импортируется в начале
+и выгружается в конце, статусы обновляются точечными транзакциями
+"""
+from openpyxl import load_workbook, Workbook
+from datetime import datetime
+import os
+import sqlite3
+import time
+from config import *
+from response_store import ResponseStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    row         INTEGER PRIMARY KEY,
+    request     TEXT,
+    project     TEXT,
+    model       TEXT,
+    chat_mode   TEXT,
+    status      TEXT,
+    response    TEXT,
+    error       TEXT,
+    date        TEXT,
+    worker      TEXT,
+    claimed_at  REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+CREATE INDEX IF NOT EXISTS idx_jobs_project_model ON jobs(project, model);
+"""
+
+
+class SQLiteJobStore:
+    """
+    Очередь запросов в SQLite (WAL)
+
+    Интерфейс как у ExcelHandler, плюс claim_next() для параллельных
+    обработчиков: строка атомарно помечается "В процессе" за конкретным worker.
+    """
+
+    def __init__(self, filename=JOB_STORE_FILE, excel_file=EXCEL_FILE,
+                 export_file=JOB_STORE_EXPORT_FILE):
+        """
+        filename: файл базы SQLite
+        excel_file: откуда импортировать запросы (новые строки - при каждом открытии)
+        export_file: куда выгрузить результаты при закрытии (None = не выгружать)
+        """
+        self.filename = filename
+        self.excel_file = excel_file
+        self.export_file = export_file
+        self.results_file = export_file or filename
+        self.response_store = ResponseStore()
+        self.conn = None
+
+    def _connect(self):
+        """Открывает соединение с базой"""
+        # Обновления могут идти из потока фоновой записи
+        conn = sqlite3.connect(self.filename, timeout=30, isolation_level=None,
+                               check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def is_loaded(self):
+        """Открыта ли база"""
+        return self.conn is not None
+
+    def load(self):
+        """
+        Открывает базу и импортирует Excel
+
+        Первый запуск - все строки. Дальше - только строки, которых еще нет
+        в базе (добавленные в Excel после импорта); статусы и ответы строк
+        из базы не меняются.
+        """
+        try:
+            self.conn = self._connect()
+            self.conn.executescript(SCHEMA)
+
+            if self._count_rows() == 0:
+                if not os.path.exists(self.excel_file):
+                    print(f"❌ Файл {self.excel_file} не найден!")
+                    return False
+                imported = self.import_from_excel(self.excel_file)
+                print(f"📥 Импортировано из {self.excel_file}: {imported} строк")
+            elif os.path.exists(self.excel_file):
+                imported = self.import_from_excel(self.excel_file, only_new=True)
+                if imported:
+                    print(f"📥 Новых строк из {self.excel_file}: {imported}")
+
+            return True
+        except Exception as e:
+            print(f"❌ Ошибка при открытии базы {self.filename}: {e}")
+            return False
+
+    def _count_rows(self):
+        """Количество строк в базе"""
+        return self.conn.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+
+    # ============================================================
+    # ИМПОРТ / ЭКСПОРТ EXCEL
+    # ============================================================
+
+    def import_from_excel(self, filename, batch_size=1000, only_new=False):
+        """
+        Импортирует строки Excel (потоково, пачками)
+
+        only_new: добавить только строки, которых нет в базе (INSERT OR IGNORE
+        по номеру строки), существующие остаются как есть
+        Возвращает: количество добавленных/обновленных строк
+        """
+        wb = load_workbook(filename, read_only=True)
+        imported = 0
+
+        def clean(values, col):
+            """Значение колонки без пробелов (пустое → None)"""
+            value = values[col - 1] if len(values) >= col else None
+            if isinstance(value, str):
+                value = value.strip()
+            return value if value else None
+
+        try:
+            ws = wb[SHEET_NAME] if SHEET_NAME in wb.sheetnames else wb.active
+            batch = []
+
+            self.conn.execute("BEGIN")
+            for row, values in enumerate(ws.iter_rows(min_row=2, values_only=True), 2):
+                batch.append((
+                    row,
+                    clean(values, COL_REQUEST),
+                    clean(values, COL_PROJECT),
+                    clean(values, COL_MODEL),
+                    clean(values, COL_CHAT_MODE),
+                    clean(values, COL_STATUS),
+                    clean(values, COL_RESPONSE),
+                    clean(values, COL_ERROR),
+                    clean(values, COL_DATE)
+                ))
+                if len(batch) >= batch_size:
+                    imported += self._insert_batch(batch, only_new)
+                    batch = []
+            imported += self._insert_batch(batch, only_new)
+            self.conn.execute("COMMIT")
+
+        except Exception:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            raise
+        finally:
+            wb.close()
+
+        return imported
+
+    def _insert_batch(self, batch, only_new=False):
+        """Вставляет пачку строк, возвращает количество записанных"""
+        if not batch:
+            return 0
+        before = self.conn.total_changes
+        self.conn.executemany(
+            f"INSERT OR {'IGNORE' if only_new else 'REPLACE'} INTO jobs "
+            "(row, request, project, model, chat_mode, status, response, error, date) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            batch
+        )
+        return self.conn.total_changes - before
+
+    def export_to_excel(self, filename):
+        """Выгружает все строки в новую книгу (write_only, потоково)"""
+        name, ext = os.path.splitext(filename)
+        tmp_filename = f"{name}.tmp{ext}"
+
+        headers = {
+            COL_REQUEST: "Запрос",
+            COL_RESPONSE: "Ответ",
+            COL_STATUS: "Статус",
+            COL_DATE: "Дата выполнения",
+            COL_ERROR: "Ошибка",
+            COL_PROJECT: "Проект",
+            COL_MODEL: "Модель",
+            COL_CHAT_MODE: "Режим чата"
+        }
+        width = max(headers)
+
+        try:
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet(SHEET_NAME)
+            ws.append([headers.get(col) for col in range(1, width + 1)])
+
+            cursor = self.conn.execute(
+                "SELECT row, request, response, status, date, error, project, model, chat_mode "
+                "FROM jobs ORDER BY row"
+            )
+            next_row = 2
+            for row, request, response, status, date, error, project, model, chat_mode in cursor:
+                # Сохраняем номера строк как в исходной книге
+                while next_row < row:
+                    ws.append([])
+                    next_row += 1
+
+                values = [None] * width
+                values[COL_REQUEST - 1] = request
+                values[COL_RESPONSE - 1] = self.response_store.make_cell_value(response)
+                values[COL_STATUS - 1] = status
+                values[COL_DATE - 1] = date
+                values[COL_ERROR - 1] = error
+                values[COL_PROJECT - 1] = project
+                values[COL_MODEL - 1] = model
+                values[COL_CHAT_MODE - 1] = chat_mode
+                ws.append(values)
+                next_row += 1
+
+            wb.save(tmp_filename)
+            os.replace(tmp_filename, filename)
+            return True
+
+        except Exception as e:
+            print(f"❌ Ошибка при выгрузке в Excel: {e}")
+            if os.path.exists(tmp_filename):
+                try:
+                    os.remove(tmp_filename)
+                except OSError:
+                    pass
+            return False
+
+    # ============================================================
+    # ИНТЕРФЕЙС ИСТОЧНИКА ЗАПРОСОВ
+    # ============================================================
+
+    def _pending_condition(self):
+        """SQL условие для невыполненных запросов"""
+        placeholders = ", ".join("?" for _ in RETRY_STATUSES)
+        return (f"request IS NOT NULL AND (status IS NULL OR status IN ({placeholders}))",
+                list(RETRY_STATUSES))
+
+    def _make_item(self, row, request, project, model, chat_mode):
+        """Описание запроса в формате ExcelHandler.get_pending_requests"""
+        return {
+            'row': row,
+            'request': str(request),
+            'project': project,
+            'model': model,
+            'chat_mode': chat_mode if chat_mode else CHAT_MODE_NEW
+        }
+
+    def check_structure(self):
+        """Проверяет содержимое базы. Возвращает: (errors, warnings)"""
+        errors = []
+        warnings = []
+
+        total = self._count_rows()
+        if total < 1:
+            errors.append("В базе нет ни одной строки")
+            return errors, warnings
+
+        with_request = self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE request IS NOT NULL"
+        ).fetchone()[0]
+        if not with_request:
+            errors.append("Нет ни одного запроса для обработки")
+        elif with_request < total:
+            warnings.append(f"Найдены пустые строки: {total - with_request}")
+
+        return errors, warnings
+
+    def iter_pending_requests(self):
+        """Лениво перебирает невыполненные запросы (генератор)"""
+        condition, params = self._pending_condition()
+        cursor = self.conn.execute(
+            f"SELECT row, request, project, model, chat_mode FROM jobs "
+            f"WHERE {condition} ORDER BY row",
+            params
+        )
+        for values in cursor:
+            yield self._make_item(*values)
+
+    def get_pending_requests(self):
+        """Получает список невыполненных запросов"""
+        return list(self.iter_pending_requests())
+
+    def scan(self):
+        """Возвращает: (список невыполненных запросов, статистика)"""
+        return self.get_pending_requests(), self.get_statistics()
+
+    def get_statistics(self):
+        """Возвращает статистику по запросам (по индексу статусов)"""
+        counts = {'total': 0, 'success': 0, 'errors': 0, 'pending': 0}
+        for status, count in self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts['total'] += count
+            if status == STATUS_SUCCESS:
+                counts['success'] += count
+            elif status in ERROR_STATUSES:
+                counts['errors'] += count
+            else:
+                counts['pending'] += count
+        return counts
+
+    def update_status(self, row, status, response="", error_message=""):
+        """Обновляет статус одной строки (одна транзакция)"""
+        date = datetime.now().strftime("%Y-%m-%d %H:%M:%S") if status == STATUS_SUCCESS else None
+        claimed_at = time.time() if status == STATUS_IN_PROGRESS else None
+        
+        self.conn.execute(
+            "UPDATE jobs SET status = ?, "
+            "response = COALESCE(?, response), "
+            "error = COALESCE(?, error), "
+            "date = COALESCE(?, date), "
+            "claimed_at = COALESCE(?, claimed_at) "
+            "WHERE row = ?",
+            (status, response or None, error_message or None, date, claimed_at, row)
+        )
+
+    def claim_next(self, worker_id, claim_timeout=JOB_CLAIM_TIMEOUT):
+        """
+        Атомарно забирает следующий невыполненный запрос для обработчика
+
+        Строки "В процессе" у другого обработчика пропускаются, пока не
+        истечет claim_timeout (обработчик мог упасть).
+        Возвращает описание запроса или None, если очередь пуста.
+        """
+        retry = [status for status in RETRY_STATUSES if status != STATUS_IN_PROGRESS]
+        placeholders = ", ".join("?" for _ in retry)
+        now = time.time()
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            values = self.conn.execute(
+                f"SELECT row, request, project, model, chat_mode FROM jobs "
+                f"WHERE request IS NOT NULL AND (status IS NULL OR status IN ({placeholders}) "
+                f"OR (status = ? AND (claimed_at IS NULL OR claimed_at < ?))) "
+                f"ORDER BY row LIMIT 1",
+                retry + [STATUS_IN_PROGRESS, now - claim_timeout]
+            ).fetchone()
+
+            if values is None:
+                self.conn.execute("COMMIT")
+                return None
+
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, claimed_at = ? WHERE row = ?",
+                (STATUS_IN_PROGRESS, worker_id, now, values[0])
+            )
+            self.conn.execute("COMMIT")
+            return self._make_item(*values)
+
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def flush(self):
+        """Каждое изменение уже зафиксировано транзакцией"""
+        return True
+
+    def close(self):
+        """Выгружает результаты в Excel (если задано) и закрывает базу"""
+        if self.conn is None:
+            return True
+
+        result = True
+        if self.export_file:
+            result = self.export_to_excel(self.export_file)
+            if result:
+                print(f"💾 Результаты выгружены: {self.export_file}")
+
+        self.conn.close()
+        self.conn = None
+        return result
@@ -1,19 +1,85 @@
 """
 Сохранение результатов в отдельные JSON файлы
-Каждый запрос = отдельный JSON файл
+Каждый запрос = отдельный JSON файл (или строка в JSONL сегменте)
 """
+import hashlib
 import json
 import os
 import re
 from datetime import datetime
 from config import *
+from response_store import ResponseStore
+from jsonl_sink import JSONLSegmentWriter
+from result_manifest import ResultManifest
+from result_index import ResultIndex
+from result_versions import ResultVersionStore
 
 class JSONHandlerV2:
-    """Класс для сохранения каждого запроса в отдельный JSON"""
+    """
+    Класс для сохранения каждого запроса в отдельный JSON
+
+    sink_mode:
+    - 'files' - отдельный JSON файл на запрос
+    - 'jsonl' - одна строка на запрос в JSONL сегментах (group commit)
+    
+    layout (для 'files'):
+    - 'sharded' - {output_dir}/ab/cd/<sha256>.json, имя зависит от строки, запроса, модели
+      и времени сохранения (повторный прогон - новый файл, старые ссылки не меняются)
+    - 'flat' - {output_dir}/{sanitized_request}_{timestamp}.json
     
-    def __init__(self, output_dir="json_results"):
+    Каждое сохранение записывается в манифест (строка → файл)
+    и в индекс результатов (поиск по metadata, см. result_index.py).
+    Повторные прогоны строки сохраняются как версии (см. result_versions.py),
+    длинный ответ при этом хранится один раз в ResponseStore, а в записи -
+    начало ответа + ссылка [sidecar:<sha256>] (раскрывается при чтении).
+    """
+    
+    def __init__(self, output_dir="json_results", sink_mode=JSON_SINK_MODE, layout=JSON_FILE_LAYOUT,
+                 index_enabled=JSON_INDEX_ENABLED, versioning=JSON_VERSIONING_ENABLED):
         self.output_dir = output_dir
+        self.sink_mode = sink_mode
+        self.layout = layout
+        self.response_store = ResponseStore()
+        # Тексты ответов по sha256 - одинаковые ответы повторных прогонов хранятся один раз
+        self.response_blobs = ResponseStore(threshold=RESPONSE_PREVIEW_LENGTH) if versioning else None
         os.makedirs(output_dir, exist_ok=True)
+        
+        self.writer = JSONLSegmentWriter(output_dir) if sink_mode == 'jsonl' else None
+        self.manifest = ResultManifest(output_dir)
+        self.index = ResultIndex(output_dir) if index_enabled else None
+        self.versions = ResultVersionStore(output_dir) if versioning else None
+    
+    def resolve_response(self, value):
+        """Возвращает полный текст ответа, если передана ссылка на sidecar файл"""
+        return self.response_store.resolve(value)
+    
+    def result_key(self, row, request, model=None, timestamp=None):
+        """
+        Ключ результата: sha256 от строки, запроса, модели и времени сохранения
+
+        timestamp отличает прогоны одной строки: каждый прогон пишется
+        в свой файл, и манифест/индекс/версии прошлых прогонов
+        продолжают указывать на их собственное содержимое.
+        """
+        source = f"{row}\0{request or ''}\0{model or ''}\0{timestamp or ''}"
+        return hashlib.sha256(source.encode('utf-8')).hexdigest()
+    
+    def has_result(self, row):
+        """Есть ли сохраненный результат для строки (без обхода папки)"""
+        return self.manifest.has_result(row)
+    
+    def find_result(self, row):
+        """Путь к файлу с последним результатом строки (None если нет)"""
+        return self.manifest.find_result(row)
+    
+    def load_result(self, row):
+        """Читает последний сохраненный результат строки (None если нет)"""
+        self.flush()
+        return self.manifest.load_result(row)
+    
+    def get_history(self, row):
+        """Все версии результата строки (пустой список без версионирования)"""
+        return self.versions.history(row) if self.versions else []
     
     def _transliterate(self, text):
         """Транслитерация кириллицы в латиницу"""
@@ -85,19 +151,16 @@ class JSONHandlerV2:
         """
         Сохраняет запрос в отдельный JSON файл
         
-        Формат имени: {sanitized_request}_{timestamp}.json
+        Формат имени ('sharded'): ab/cd/{sha256(row, request, model, timestamp)}.json
+        Формат имени ('flat'): {sanitized_request}_{timestamp}.json
         Пример: napishy_stikh_pro_kota_20260129_170533_123.json
+        
+        В режиме 'jsonl' запись дописывается в текущий сегмент.
         """
         try:
-            # Генерируем timestamp с миллисекундами для уникальности
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:19]  # YYYYMMDD_HHMMSS_mmm
-            
-            # Очищаем запрос для имени файла
-            sanitized_request = self._sanitize_filename(request, max_length=60)
-            
-            # Формируем имя файла
-            filename = f"{sanitized_request}_{timestamp}.json"
-            filepath = os.path.join(self.output_dir, filename)
+            # Полный текст ответа: ссылку из Excel раскрываем
+            response = self.resolve_response(response)
+            stored_response = self.response_blobs.make_cell_value(response) if self.response_blobs else response
             
             # Формируем данные
             data = {
@@ -110,7 +173,7 @@ class JSONHandlerV2:
                     "duration_seconds": round(duration, 2)
                 },
                 "request": request,
-                "response": response,
+                "response": stored_response,
                 "status": status,
                 "success": status == STATUS_SUCCESS,
                 "error": error_message,
@@ -120,13 +183,84 @@ class JSONHandlerV2:
                 }
             }
             
-            # Сохраняем с форматированием
-            with open(filepath, 'w', encoding='utf-8') as f:
+            key = self.result_key(row, request, model, data["metadata"]["timestamp"])
+            
+            if self.writer:
+                segment, offset = self.writer.write(data)
+                self.manifest.add(row, key, segment, status, offset, sync=False)
+                self._index_result(data, segment, offset)
+                self._record_version(row, segment, offset, request, response, status, error_message,
+                                     project, model, attempts, duration, sync=False)
+                return segment
+            
+            filepath = self._make_filepath(key, request)
+            
+            # Сохраняем с форматированием (атомарно: tmp → replace)
+            tmp_filepath = f"{filepath}.tmp"
+            with open(tmp_filepath, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_filepath, filepath)
+            
+            self.manifest.add(row, key, filepath, status)
+            self._index_result(data, filepath)
+            self._record_version(row, filepath, None, request, response, status, error_message,
+                                 project, model, attempts, duration)
             
-            print(f"  📄 JSON: {filename}")
+            print(f"  📄 JSON: {os.path.relpath(filepath, self.output_dir)}")
             return filepath
             
         except Exception as e:
             print(f"  ❌ Ошибка сохранения JSON: {e}")
-            return None
\ No newline at end of file
+            return None
+    
+    def _record_version(self, *args, **kwargs):
+        """Добавляет версию - ссылку на только что записанный результат (ошибка не отменяет сохранение)"""
+        if not self.versions:
+            return
+        try:
+            self.versions.record(*args, **kwargs)
+        except Exception as e:
+            print(f"  ⚠️  Не удалось сохранить версию результата: {e}")
+    
+    def _index_result(self, data, path, offset=None):
+        """Добавляет результат в индекс (ошибка индекса не отменяет сохранение)"""
+        if not self.index:
+            return
+        try:
+            self.index.add(data, path, offset)
+        except Exception as e:
+            print(f"  ⚠️  Не удалось обновить индекс результатов: {e}")
+    
+    def _make_filepath(self, key, request):
+        """Путь к JSON файлу результата (папки создаются при необходимости)"""
+        if self.layout == 'sharded':
+            directory = os.path.join(self.output_dir, key[:2], key[2:4])
+            os.makedirs(directory, exist_ok=True)
+            return os.path.join(directory, f"{key}.json")
+        
+        # Генерируем timestamp с миллисекундами для уникальности
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:19]  # YYYYMMDD_HHMMSS_mmm
+        
+        # Очищаем запрос для имени файла
+        sanitized_request = self._sanitize_filename(request, max_length=60)
+        
+        # Формируем имя файла
+        return os.path.join(self.output_dir, f"{sanitized_request}_{timestamp}.json")
+    
+    def flush(self):
+        """Сбрасывает накопленные JSONL записи и манифест на диск"""
+        if self.writer:
+            self.writer.commit()
+            self.manifest.sync()
+            if self.versions:
+                self.versions.sync()
+    
+    def close(self):
+        """Закрывает текущий JSONL сегмент и манифест"""
+        if self.writer:
+            self.writer.close()
+        self.manifest.close()
+        if self.index:
+            self.index.close()
+        if self.versions:
+            self.versions.close()
@@ -0,0 +1,185 @@
+"""
+Запись результатов в JSONL сегменты (append-only)
+Одна компактная JSON строка на запрос, сегменты ротируются по размеру
+и по времени, могут сжиматься (gzip/zstd), fsync выполняется пачками (group commit)
+"""
+import atexit
+import glob
+import io
+import json
+import os
+import time
+from datetime import datetime
+from config import *
+from compression import resolve_compression, compression_extension, detect_compression, open_compressed, iter_lines
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def serialize_record(record):
+    """Сериализует запись в одну строку JSON (orjson если установлен)"""
+    if orjson is not None:
+        return orjson.dumps(record) + b"\n"
+    return (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+
+
+class JSONLSegmentWriter:
+    """
+    Писатель JSONL сегментов
+
+    Файлы: {output_dir}/{prefix}_{YYYYMMDD_HHMMSS}_{N}.jsonl[.gz|.zst]
+    Новый сегмент начинается, когда текущий превышает max_segment_bytes
+    (несжатых данных) или старше max_segment_age секунд.
+    Данные сбрасываются на диск (fsync) после commit_every записей
+    или если с прошлого сброса прошло commit_interval секунд.
+    """
+
+    def __init__(self, output_dir=JSON_OUTPUT_DIR, prefix="results",
+                 max_segment_bytes=JSON_SEGMENT_MAX_BYTES,
+                 commit_every=JSON_COMMIT_EVERY, commit_interval=JSON_COMMIT_INTERVAL,
+                 compression=JSON_COMPRESSION, max_segment_age=JSON_SEGMENT_MAX_AGE):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.compression = resolve_compression(compression)
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.commit_every = commit_every
+        self.commit_interval = commit_interval
+
+        self._file = None
+        self._segment_path = None
+        self._segment_size = 0
+        self._segment_number = 0
+        self._segment_opened = 0
+        self._uncommitted = 0
+        self._last_commit = time.time()
+
+        os.makedirs(output_dir, exist_ok=True)
+        atexit.register(self.close)
+
+    def _open_segment(self):
+        """
+        Открывает новый сегмент
+
+        Файл всегда создается заново ('xb'): если сегмент с таким именем уже
+        есть (перезапуск в ту же секунду), берется следующий номер - иначе
+        смещения новых записей считались бы от нуля посреди чужих данных.
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        ext = compression_extension(self.compression)
+        while True:
+            self._segment_number += 1
+            filename = f"{self.prefix}_{timestamp}_{self._segment_number:04d}.jsonl{ext}"
+            self._segment_path = os.path.join(self.output_dir, filename)
+            try:
+                self._file = open_compressed(self._segment_path, 'xb')
+                break
+            except FileExistsError:
+                continue
+        self._segment_size = 0
+        self._segment_opened = time.time()
+
+    def _rotate_if_needed(self):
+        """Закрывает сегмент, если он достиг предельного размера или возраста"""
+        if self._file is None:
+            return
+        if (self._segment_size >= self.max_segment_bytes
+                or (self.max_segment_age and time.time() - self._segment_opened >= self.max_segment_age)):
+            self.commit()
+            self._file.close()
+            self._file = None
+
+    def write(self, record):
+        """
+        Дописывает запись
+
+        Возвращает: (путь к сегменту, смещение строки в несжатых данных сегмента)
+        """
+        self._rotate_if_needed()
+        if self._file is None:
+            self._open_segment()
+
+        data = serialize_record(record)
+        offset = self._segment_size
+        self._file.write(data)
+        self._segment_size += len(data)
+        self._uncommitted += 1
+
+        if (self._uncommitted >= self.commit_every
+                or time.time() - self._last_commit >= self.commit_interval):
+            self.commit()
+
+        return self._segment_path, offset
+
+    def commit(self):
+        """Сбрасывает накопленные записи на диск"""
+        if self._file is not None and self._uncommitted:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._uncommitted = 0
+        self._last_commit = time.time()
+
+    @property
+    def current_segment(self):
+        """Путь к сегменту, который сейчас дописывается (None если закрыт)"""
+        return self._segment_path if self._file is not None else None
+
+    def close(self):
+        """Сбрасывает данные и закрывает текущий сегмент"""
+        if self._file is not None:
+            self.commit()
+            self._file.close()
+            self._file = None
+
+
+def list_segments(output_dir=JSON_OUTPUT_DIR, prefix="results"):
+    """Сегменты по порядку записи (сжатые и несжатые)"""
+    return sorted(glob.glob(os.path.join(output_dir, f"{prefix}_*.jsonl*")))
+
+
+def iter_segment_entries(output_dir=JSON_OUTPUT_DIR, prefix="results"):
+    """
+    Последовательно читает записи всех сегментов (генератор)
+
+    Сегменты распаковываются потоково. Оборванная последняя строка
+    (сбой во время записи) пропускается.
+    Возвращает: (путь к сегменту, смещение строки, запись)
+    """
+    for path in list_segments(output_dir, prefix):
+        for offset, record in iter_file_entries(path):
+            yield path, offset, record
+
+
+def iter_file_entries(path):
+    """
+    Читает записи одного сегмента (генератор)
+
+    Возвращает: (смещение строки, запись)
+    """
+    offset = 0
+    for line in iter_lines(path):
+        if not line.endswith(b"\n"):
+            break
+        line_offset = offset
+        offset += len(line)
+        try:
+            yield line_offset, json.loads(line)
+        except ValueError:
+            continue
+
+
+def iter_segment_records(output_dir=JSON_OUTPUT_DIR, prefix="results"):
+    """Последовательно читает записи всех сегментов (генератор)"""
+    for _, _, record in iter_segment_entries(output_dir, prefix):
+        yield record
+
+
+def read_record_at(path, offset):
+    """Читает одну запись сегмента по смещению (из JSONLSegmentWriter.write)"""
+    with open_compressed(path, 'rb') as f:
+        f.seek(offset)
+        reader = f if detect_compression(path) != 'zstd' else io.BufferedReader(f)
+        return json.loads(reader.readline())
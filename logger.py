@@ -2,14 +2,18 @@
 Система логирования
 """
 import logging
+import logging.handlers
 import os
+import queue
 from datetime import datetime
 from config import *
+from compression import resolve_compression, compression_extension, compress_file
 
 class Logger:
     """Класс для логирования событий в файл и консоль"""
     
-    def __init__(self, log_dir="logs"):
+    def __init__(self, log_dir="logs", compression=LOG_COMPRESSION,
+                 max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT, use_async=LOG_ASYNC):
         self.log_dir = log_dir
         os.makedirs(log_dir, exist_ok=True)
         
@@ -27,8 +31,8 @@ class Logger:
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         
-        # Хендлер для файла
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
+        # Хендлер для файла (с ротацией по размеру и сжатием старых файлов)
+        file_handler = self._create_file_handler(log_file, compression, max_bytes, backup_count)
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(formatter)
         
@@ -37,7 +41,16 @@ class Logger:
         console_handler.setLevel(logging.WARNING)
         console_handler.setFormatter(formatter)
         
-        self.logger.addHandler(file_handler)
+        # Файл пишется отдельным потоком: вызов logger.info() только ставит запись в очередь
+        self.listener = None
+        if use_async:
+            log_queue = queue.Queue(-1)
+            self.listener = logging.handlers.QueueListener(log_queue, file_handler,
+                                                           respect_handler_level=True)
+            self.listener.start()
+            self.logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        else:
+            self.logger.addHandler(file_handler)
         self.logger.addHandler(console_handler)
         
         self.log_file = log_file
@@ -46,6 +59,24 @@ class Logger:
         self.logger.info(f"Файл лога: {log_file}")
         self.logger.info("=" * 70)
     
+    def _create_file_handler(self, log_file, compression, max_bytes, backup_count):
+        """Создает файловый хендлер: обычный или с ротацией и сжатием"""
+        if not max_bytes:
+            return logging.FileHandler(log_file, encoding='utf-8')
+        
+        handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        )
+        
+        compression = resolve_compression(compression)
+        if compression:
+            # parser_....log.1 → parser_....log.1.gz, сжатие при ротации
+            ext = compression_extension(compression)
+            handler.namer = lambda name: name + ext
+            handler.rotator = compress_file
+        
+        return handler
+    
     def info(self, message):
         """Информационное сообщение"""
         self.logger.info(message)
@@ -88,6 +119,13 @@ class Logger:
         self.logger.info("Логирование завершено")
         self.logger.info("=" * 70)
         
+        # Дописываем очередь и останавливаем поток записи
+        if self.listener:
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
+        
         # Закрываем все хендлеры
         for handler in self.logger.handlers[:]:
             handler.close()
@@ -5,7 +5,7 @@ Production Ready - Full Version with Projects & Models Support + JSON Export
 import time
 import os
 from config import *
-from excel_handler import ExcelHandler
+from request_sources import create_request_source
 from browser_manager import BrowserManager
 from chatgpt_handler import ChatGPTHandler
 from logger import Logger
@@ -14,6 +14,9 @@ from validator import Validator
 from backup_manager import BackupManager
 from statistics import Statistics
 from json_handler_v2 import JSONHandlerV2
+from response_cache import ResponseCache
+from background_writer import BackgroundWriter, AsyncSink
+from result_compactor import ResultCompactor
 from humanization import HumanBehavior, HumanSchedule
 
 def print_header():
@@ -49,17 +52,43 @@ def manual_login():
     print("\n✅ Отлично! Даю странице 5 секунд...")
     time.sleep(5)
 
-def process_requests(excel_handler, chatgpt_handler, logger, retry_handler, stats):
-    """Обрабатывает все запросы (главная функция маршрутизации)"""
+def process_requests(excel_handler, chatgpt_handler, logger, retry_handler, stats, pending=None, writer=None):
+    """
+    Обрабатывает все запросы (главная функция маршрутизации)
+    
+    pending: уже полученный список запросов (None = прочитать из Excel)
+    """
     
     if USE_NEW_CHAT_FOR_EACH_REQUEST:
-        process_requests_separate_chats(excel_handler, chatgpt_handler, logger, retry_handler, stats)
+        process_requests_separate_chats(excel_handler, chatgpt_handler, logger, retry_handler, stats, pending, writer)
     else:
-        process_requests_single_chat(excel_handler, chatgpt_handler, logger, retry_handler, stats)
+        process_requests_single_chat(excel_handler, chatgpt_handler, logger, retry_handler, stats, pending, writer)
+
+def save_reused_result(excel_handler, json_handler, logger, item, response, source):
+    """Записывает результат, полученный без отправки в браузер (из кэша или от дубликата)"""
+    row = item['row']
+    excel_handler.update_status(row, STATUS_SUCCESS, response=response)
+    if logger:
+        logger.info(f"[ROW {row}] Ответ взят {source}. Длина ответа: {len(response)} символов")
+    
+    if json_handler:
+        json_handler.save_request(
+            row=row,
+            request=item['request'],
+            response=response,
+            status=STATUS_SUCCESS,
+            project=item.get('project'),
+            model=item.get('model'),
+            attempts=0,
+            duration=0
+        )
+    
+    print(f"  💾 Строка {row}: ответ взят {source}")
 
-def process_requests_separate_chats(excel_handler, chatgpt_handler, logger, retry_handler, stats):
+def process_requests_separate_chats(excel_handler, chatgpt_handler, logger, retry_handler, stats, pending=None, writer=None):
     """Обрабатывает запросы - каждый в новом чате"""
-    pending = excel_handler.get_pending_requests()
+    if pending is None:
+        pending = excel_handler.get_pending_requests()
     
     if not pending:
         print("\n✅ Все запросы уже выполнены!")
@@ -78,12 +107,43 @@ def process_requests_separate_chats(excel_handler, chatgpt_handler, logger, retr
     
     # Создаем JSON handler V2 (отдельный файл для каждого запроса)
     json_handler = JSONHandlerV2(JSON_OUTPUT_DIR) if JSON_ENABLED else None
+    if json_handler and writer:
+        json_handler = AsyncSink(json_handler, writer)
     if json_handler:
-        print(f"📄 JSON экспорт включен: каждый запрос → отдельный файл")
+        if json_handler.sink_mode == 'jsonl':
+            print(f"📄 JSON экспорт включен: каждый запрос → строка в JSONL сегменте")
+        else:
+            print(f"📄 JSON экспорт включен: каждый запрос → отдельный файл")
+    
+    # Кэш ответов: только для запросов в новом чате (без контекста)
+    response_cache = ResponseCache() if RESPONSE_CACHE_ENABLED else None
+    cache_keys = {}
+    duplicates = {}
+    if response_cache:
+        for item in pending:
+            if item.get('chat_mode', CHAT_MODE_NEW) == CHAT_MODE_NEW:
+                key = response_cache.make_key(item['request'], item.get('project'), item.get('model'))
+                cache_keys[item['row']] = key
+                duplicates.setdefault(key, []).append(item)
+        
+        repeated = sum(len(items) - 1 for items in duplicates.values())
+        print(f"💾 Кэш ответов включен" + (f" (повторов в пакете: {repeated})" if repeated else ""))
+        if RESPONSE_CACHE_REFRESH:
+            print(f"   Режим обновления: ответы из кэша не берутся, запросы отправляются заново")
+    
+    # Сжатие мелких файлов результатов в Parquet - во время пауз между запросами
+    compactor = None
+    if json_handler and JSON_COMPACT_ENABLED:
+        compactor = ResultCompactor(JSON_OUTPUT_DIR, json_handler.manifest, json_handler.index,
+                                     versions=json_handler.versions)
+        if not compactor.is_available():
+            print(f"⚠️  Сжатие результатов отключено: не установлен pyarrow")
+            compactor = None
     
     stats.start()
     success_count = 0
     error_count = 0
+    done_rows = set()
     
     for idx, item in enumerate(pending, 1):
         row = item['row']
@@ -92,6 +152,10 @@ def process_requests_separate_chats(excel_handler, chatgpt_handler, logger, retr
         model = item.get('model')
         chat_mode = item.get('chat_mode', CHAT_MODE_NEW)
         
+        if row in done_rows:
+            # Ответ уже записан вместе с первым таким же запросом
+            continue
+        
         print(f"\n{'='*70}")
         print(f"📝 Запрос {idx}/{len(pending)} (строка Excel: {row})")
         print(f"💬 '{request[:70]}{'...' if len(request) > 70 else ''}'")
@@ -110,6 +174,19 @@ def process_requests_separate_chats(excel_handler, chatgpt_handler, logger, retr
             if model:
                 logger.info(f"[ROW {row}] Модель: {model}")
         
+        cache_key = cache_keys.get(row)
+        if cache_key and not RESPONSE_CACHE_REFRESH:
+            cached_response = response_cache.get(cache_key)
+            if cached_response is not None:
+                save_reused_result(excel_handler, json_handler, logger, item, cached_response, "из кэша")
+                stats.add_cache_hit()
+                success_count += 1
+                done_rows.add(row)
+                # Браузер не использовался - пауза не нужна
+                stats.print_progress(idx, len(pending))
+                continue
+            stats.add_cache_miss()
+        
         excel_handler.update_status(row, STATUS_IN_PROGRESS)
         
         request_start_time = time.time()
@@ -128,8 +205,16 @@ def process_requests_separate_chats(excel_handler, chatgpt_handler, logger, retr
         
         request_duration = time.time() - request_start_time
         
+        stream_metrics = chatgpt_handler.last_stream_metrics
+        if stream_metrics:
+            stats.add_stream_metrics(stream_metrics['model'], stream_metrics['ttft'],
+                                     stream_metrics['tokens_per_sec'])
+        
         if success:
-            excel_handler.update_status(row, STATUS_SUCCESS, response=response)
+            # Генерация не уложилась в GENERATION_MAX_WAIT - ответ сохраняется с пометкой
+            partial_message = chatgpt_handler.last_partial_message
+            partial_note = f"Частичный ответ: {partial_message}" if partial_message else None
+            excel_handler.update_status(row, STATUS_SUCCESS, response=response, error_message=partial_note or "")
             success_count += 1
             if logger:
                 logger.request_success(row, len(response))
@@ -142,6 +227,7 @@ def process_requests_separate_chats(excel_handler, chatgpt_handler, logger, retr
                     request=request,
                     response=response,
                     status=STATUS_SUCCESS,
+                    error_message=partial_note,
                     project=project,
                     model=model,
                     attempts=attempts,
@@ -152,6 +238,20 @@ def process_requests_separate_chats(excel_handler, chatgpt_handler, logger, retr
             print(f"  📄 Начало ответа: {response[:150]}...")
             print(f"  ⏱️  Время выполнения: {stats.format_duration(request_duration)}")
             print(f"  🔄 Попыток: {attempts}")
+            
+            if partial_note:
+                print(f"  ⚠️ {partial_note} (в кэш не сохраняется)")
+            elif cache_key:
+                response_cache.put(cache_key, response)
+                
+                # Одинаковые запросы в пакете получают этот же ответ
+                for duplicate in duplicates.get(cache_key, []):
+                    if duplicate['row'] != row and duplicate['row'] not in done_rows:
+                        save_reused_result(excel_handler, json_handler, logger, duplicate, response,
+                                           f"от строки {row}")
+                        stats.add_cache_hit()
+                        success_count += 1
+                        done_rows.add(duplicate['row'])
         else:
             status = STATUS_ERROR
             if error_type == 'rate_limit':
@@ -198,19 +298,32 @@ def process_requests_separate_chats(excel_handler, chatgpt_handler, logger, retr
             # ✨ HUMANIZATION: Случайная задержка
             delay = chatgpt_handler.human.get_request_delay()
             print(f"\n  ⏸️  Пауза {delay:.1f} сек (как человек)...")
-            time.sleep(delay)
+            if compactor:
+                # Сначала дописываем очередь записи, текущий сегмент не трогаем
+                json_handler.flush()
+                current_segment = json_handler.writer.current_segment if json_handler.writer else None
+                compactor.run_for(delay, exclude=[current_segment])
+            else:
+                time.sleep(delay)
             
             # ✨ HUMANIZATION: Мини-перерыв если нужно
             chatgpt_handler.schedule.take_break_if_needed()
     
     stats.end()
     
+    if json_handler:
+        json_handler.close()
+    if writer:
+        writer.flush()
+    if response_cache:
+        response_cache.close()
+    
     print("\n" + "=" * 70)
     print("📋 ШАГ 3: ОБРАБОТКА ЗАВЕРШЕНА!")
     print("=" * 70)
     print(f"✅ Выполнено успешно: {success_count}")
     print(f"❌ Ошибок: {error_count}")
-    print(f"📂 Результаты Excel: {os.path.abspath(EXCEL_FILE)}")
+    print(f"📂 Результаты Excel: {os.path.abspath(excel_handler.results_file)}")
     print(f"📂 Результаты JSON: {os.path.abspath(JSON_OUTPUT_DIR)}/")
     if logger:
         print(f"📋 Лог файл: {logger.get_log_file()}")
@@ -221,9 +334,10 @@ def process_requests_separate_chats(excel_handler, chatgpt_handler, logger, retr
     
     stats.print_summary()
 
-def process_requests_single_chat(excel_handler, chatgpt_handler, logger, retry_handler, stats):
+def process_requests_single_chat(excel_handler, chatgpt_handler, logger, retry_handler, stats, pending=None, writer=None):
     """Обрабатывает все запросы в ОДНОМ чате (альтернативный режим)"""
-    pending = excel_handler.get_pending_requests()
+    if pending is None:
+        pending = excel_handler.get_pending_requests()
     
     if not pending:
         print("\n✅ Все запросы уже выполнены!")
@@ -242,6 +356,8 @@ def process_requests_single_chat(excel_handler, chatgpt_handler, logger, retry_h
     print("=" * 70)
     
     json_handler = JSONHandlerV2(JSON_OUTPUT_DIR) if JSON_ENABLED else None
+    if json_handler and writer:
+        json_handler = AsyncSink(json_handler, writer)
     
     first_item = pending[0]
     if first_item.get('project') or first_item.get('model'):
@@ -291,8 +407,16 @@ def process_requests_single_chat(excel_handler, chatgpt_handler, logger, retry_h
         
         request_duration = time.time() - request_start_time
         
+        stream_metrics = chatgpt_handler.last_stream_metrics
+        if stream_metrics:
+            stats.add_stream_metrics(stream_metrics['model'], stream_metrics['ttft'],
+                                     stream_metrics['tokens_per_sec'])
+        
         if success:
-            excel_handler.update_status(row, STATUS_SUCCESS, response=response)
+            # Генерация не уложилась в GENERATION_MAX_WAIT - ответ сохраняется с пометкой
+            partial_message = chatgpt_handler.last_partial_message
+            partial_note = f"Частичный ответ: {partial_message}" if partial_message else None
+            excel_handler.update_status(row, STATUS_SUCCESS, response=response, error_message=partial_note or "")
             success_count += 1
             if logger:
                 logger.request_success(row, len(response))
@@ -304,6 +428,7 @@ def process_requests_single_chat(excel_handler, chatgpt_handler, logger, retry_h
                     request=request,
                     response=response,
                     status=STATUS_SUCCESS,
+                    error_message=partial_note,
                     project=first_item.get('project'),
                     model=first_item.get('model'),
                     attempts=attempts,
@@ -361,12 +486,17 @@ def process_requests_single_chat(excel_handler, chatgpt_handler, logger, retry_h
     
     stats.end()
     
+    if json_handler:
+        json_handler.close()
+    if writer:
+        writer.flush()
+    
     print("\n" + "=" * 70)
     print("📋 ШАГ 3: ОБРАБОТКА ЗАВЕРШЕНА!")
     print("=" * 70)
     print(f"✅ Выполнено успешно: {success_count}")
     print(f"❌ Ошибок: {error_count}")
-    print(f"📂 Результаты Excel: {os.path.abspath(EXCEL_FILE)}")
+    print(f"📂 Результаты Excel: {os.path.abspath(excel_handler.results_file)}")
     print(f"📂 Результаты JSON: {os.path.abspath(JSON_OUTPUT_DIR)}/")
     if logger:
         print(f"📋 Лог файл: {logger.get_log_file()}")
@@ -399,7 +529,7 @@ def main():
     logger = Logger(LOG_DIR) if LOG_ENABLED else None
     validator = Validator()
     backup_manager = BackupManager() if BACKUP_ENABLED else None
-    excel_handler = ExcelHandler()
+    excel_handler = create_request_source(REQUEST_SOURCE)
     browser_manager = BrowserManager()
     retry_handler = RetryHandler(
         max_attempts=MAX_RETRY_ATTEMPTS,
@@ -407,9 +537,12 @@ def main():
         exponential_backoff=RETRY_EXPONENTIAL_BACKOFF
     )
     stats = Statistics()
+    writer = BackgroundWriter() if BACKGROUND_WRITER_ENABLED else None
+    stats.persistence = writer
     
     try:
-        if not validator.validate_all():
+        # Валидатор загружает файл запросов через excel_handler - файл парсится один раз
+        if not validator.validate_all(excel_handler):
             if logger:
                 logger.error("Валидация не пройдена")
             input("\n❌ Исправьте ошибки и запустите снова. Нажмите ENTER...")
@@ -418,7 +551,8 @@ def main():
         if logger:
             logger.info("Валидация пройдена успешно")
         
-        if backup_manager:
+        # CSV/JSONL только читаются (статусы идут в журнал) - копия нужна лишь для Excel
+        if backup_manager and REQUEST_SOURCE == 'excel':
             print("\n💾 Создаю резервную копию Excel...")
             backup_path = backup_manager.create_backup(EXCEL_FILE)
             if backup_path and logger:
@@ -426,19 +560,23 @@ def main():
             
             backup_manager.cleanup_old_backups(KEEP_LAST_BACKUPS)
         
-        if not excel_handler.load():
+        if not excel_handler.is_loaded() and not excel_handler.load():
             if logger:
-                logger.error("Не удалось загрузить Excel")
+                logger.error(f"Не удалось загрузить {excel_handler.filename}")
             input("\nНажмите ENTER для выхода...")
             return
         
         if logger:
-            logger.info(f"Excel файл загружен: {EXCEL_FILE}")
+            logger.info(f"Файл запросов загружен: {excel_handler.filename}")
         
-        excel_stats = excel_handler.get_statistics()
+        # Один проход по листу: и статистика, и список запросов
+        pending, excel_stats = excel_handler.scan()
         print_statistics(excel_stats)
         
-        pending = excel_handler.get_pending_requests()
+        # Дальше статусы сохраняются в фоне - браузер не ждет записи на диск
+        if writer:
+            excel_handler = AsyncSink(excel_handler, writer)
+        
         uses_projects = any(item.get('project') for item in pending)
         uses_models = any(item.get('model') for item in pending)
         
@@ -474,18 +612,20 @@ def main():
         driver = browser_manager.get_driver()
         chatgpt_handler = ChatGPTHandler(driver, HUMANIZATION_CONFIG)
         
-        process_requests(excel_handler, chatgpt_handler, logger, retry_handler, stats)
+        process_requests(excel_handler, chatgpt_handler, logger, retry_handler, stats, pending, writer)
         
         manual_close()
         
     except KeyboardInterrupt:
         print("\n\n⚠️ Программа прервана (Ctrl+C)")
+        excel_handler.flush()
         print("💾 Весь прогресс сохранен")
         if logger:
             logger.warning("Программа прервана пользователем")
         
     except Exception as e:
         print(f"\n❌ Критическая ошибка: {e}")
+        excel_handler.flush()
         if logger:
             logger.error(f"Критическая ошибка: {e}")
         import traceback
@@ -493,6 +633,9 @@ def main():
         input("\nНажмите ENTER...")
         
     finally:
+        excel_handler.close()
+        if writer:
+            writer.close()
         browser_manager.close()
         if logger:
             logger.close()
@@ -0,0 +1,162 @@
+"""
+Состояние страницы ChatGPT за одно обращение к браузеру
+В страницу один раз внедряется небольшая библиотека (после перехода на
+новую страницу - заново), которая возвращает готовность поля ввода,
+кнопку Stop и ошибки одним JSON объектом из одного execute_script.
+Вместо ~10 обращений к WebDriver на каждую проверку - одно.
+"""
+from config import *
+
+PROBE_VERSION = 1
+
+# Аргументы: {тип ошибки: [шаблоны]}, версия
+PROBE_LIBRARY = """
+var patterns = arguments[0] || {};
+var version = arguments[1];
+
+function visible(element) {
+    return !!element && element.offsetParent !== null;
+}
+
+function findInput() {
+    var selectors = ["#prompt-textarea", "textarea[placeholder*='Message']",
+                     "textarea[placeholder*='Новый чат']", "textarea"];
+    for (var i = 0; i < selectors.length; i++) {
+        var element = document.querySelector(selectors[i]);
+        if (element) {
+            return element;
+        }
+    }
+    return null;
+}
+
+function inputState() {
+    var element = findInput();
+    if (!element) {
+        return {found: false};
+    }
+    return {
+        found: true,
+        displayed: visible(element),
+        disabled: element.disabled === true || element.hasAttribute("disabled"),
+        readonly: element.readOnly === true || element.hasAttribute("readonly"),
+        placeholder: element.getAttribute("placeholder") || ""
+    };
+}
+
+function stopVisible() {
+    var buttons = document.querySelectorAll("button");
+    for (var i = 0; i < buttons.length; i++) {
+        var text = buttons[i].textContent || "";
+        if ((text.indexOf("Stop") !== -1 || text.indexOf("Остановить") !== -1) && visible(buttons[i])) {
+            return true;
+        }
+    }
+    return false;
+}
+
+function findError() {
+    var pageText = (document.body.innerText || "").toLowerCase();
+    for (var type in patterns) {
+        var list = patterns[type];
+        for (var i = 0; i < list.length; i++) {
+            if (pageText.indexOf(list[i].toLowerCase()) !== -1) {
+                return {type: type, pattern: list[i]};
+            }
+        }
+    }
+    var modals = document.querySelectorAll("[role='dialog'], .modal, .error-message");
+    for (var j = 0; j < modals.length; j++) {
+        var text = visible(modals[j]) ? (modals[j].innerText || "").trim() : "";
+        if (text) {
+            return {type: "unknown", text: text.substring(0, 200)};
+        }
+    }
+    return null;
+}
+
+window.__chatgptProbe = {
+    version: version,
+    state: function () {
+        return {input: inputState(), stop: stopVisible(), error: findError()};
+    }
+};
+return window.__chatgptProbe.state();
+"""
+
+PROBE_CALL = """
+var probe = window.__chatgptProbe;
+return probe && probe.version === arguments[0] ? probe.state() : null;
+"""
+
+
+class PageProbe:
+    """
+    Библиотека проверки состояния страницы
+
+    state() возвращает словарь:
+    {"input": {"found", "displayed", "disabled", "readonly", "placeholder"},
+     "stop": кнопка Stop видна,
+     "error": {"type", "pattern"} / {"type": "unknown", "text"} / None}
+    или None, если выполнить скрипт не удалось (тогда - проверки через WebDriver).
+    """
+
+    def __init__(self, driver, error_patterns=None):
+        """error_patterns: {тип ошибки: [шаблоны]} для поиска в тексте страницы"""
+        self.driver = driver
+        self.error_patterns = error_patterns or {}
+        self.enabled = PAGE_PROBE_ENABLED
+        self.injections = 0
+
+    def state(self):
+        """Все состояние страницы за одно обращение (два - если библиотеку нужно внедрить)"""
+        if not self.enabled:
+            return None
+
+        try:
+            state = self.driver.execute_script(PROBE_CALL, PROBE_VERSION)
+            if state is None:
+                # Новая страница - библиотеки еще нет
+                self.injections += 1
+                state = self.driver.execute_script(PROBE_LIBRARY, self.error_patterns, PROBE_VERSION)
+            return state
+        except Exception as e:
+            print(f"    ⚠️ Проверка страницы скриптом не удалась: {str(e).splitlines()[0][:100]}")
+            return None
+
+    @staticmethod
+    def readiness(state):
+        """
+        Готовность поля ввода по состоянию страницы
+
+        Возвращает: (is_enabled, reason) - как ChatGPTHandler.is_input_field_enabled
+        """
+        field = state.get('input') or {}
+        if not field.get('found'):
+            return False, "Поле ввода не найдено"
+        if not field.get('displayed'):
+            return False, "Поле ввода не отображается"
+        if field.get('disabled'):
+            return False, "Поле ввода заблокировано (disabled)"
+        if field.get('readonly'):
+            return False, "Поле ввода только для чтения (readonly)"
+        placeholder = (field.get('placeholder') or "").lower()
+        if "typing" in placeholder or "печатает" in placeholder:
+            return False, "ChatGPT печатает"
+        if state.get('stop'):
+            return False, "Кнопка Stop активна - генерация идет"
+        return True, "Поле ввода готово"
+
+    @staticmethod
+    def error(state):
+        """
+        Ошибка ChatGPT по состоянию страницы
+
+        Возвращает: (error_type, error_message) или (None, None) - как check_for_errors
+        """
+        error = state.get('error')
+        if not error:
+            return None, None
+        if error.get('type') == 'unknown':
+            return 'unknown', f"Модальное окно: {error.get('text', '')}"
+        return error['type'], f"Обнаружена ошибка: {error.get('pattern')}"
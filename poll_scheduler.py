@@ -0,0 +1,145 @@
+"""
+Адаптивный интервал опроса готовности ответа
+Время генерации предсказывается по истории (скользящее среднее по модели
+и длине запроса, файл POLL_HISTORY_FILE). Опрос частый сразу после
+отправки и около ожидаемого конца, реже - в середине долгого размышления.
+"""
+import json
+import os
+import time
+from config import *
+
+# Границы групп по длине запроса (символов)
+PROMPT_LENGTH_BUCKETS = (500, 2000, 8000)
+
+
+def length_bucket(prompt_length):
+    """Группа длины запроса: '<500', '<2000', '<8000', '>=8000'"""
+    for bound in PROMPT_LENGTH_BUCKETS:
+        if prompt_length < bound:
+            return f"<{bound}"
+    return f">={PROMPT_LENGTH_BUCKETS[-1]}"
+
+
+class PollScheduler:
+    """
+    Предсказание времени генерации и интервалы опроса
+
+    История: {"модель|группа длины": {"mean": сек, "count": n}}, плюс
+    "модель|*" (вся модель) и "*" (все запросы) - запасные оценки,
+    пока по группе мало данных.
+    """
+
+    def __init__(self, history_file=POLL_HISTORY_FILE, min_interval=POLL_MIN_INTERVAL,
+                 max_interval=POLL_MAX_INTERVAL, fast_phase=POLL_FAST_PHASE,
+                 default_expected=POLL_DEFAULT_EXPECTED, alpha=POLL_HISTORY_ALPHA):
+        """
+        min_interval, max_interval: границы интервала опроса (сек)
+        fast_phase: сколько секунд после отправки опрашивать часто
+        default_expected: ожидаемое время, пока истории нет
+        alpha: вес нового замера в скользящем среднем
+        """
+        self.history_file = history_file
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.fast_phase = fast_phase
+        self.default_expected = default_expected
+        self.alpha = alpha
+        self.history = self._load()
+
+    def _load(self):
+        """Читает историю (пустая, если файла нет или он поврежден)"""
+        if not self.history_file or not os.path.exists(self.history_file):
+            return {}
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Не удалось прочитать историю времени ответов: {e}")
+            return {}
+
+    def _save(self):
+        """Сохраняет историю атомарно"""
+        if not self.history_file:
+            return
+        tmp_filename = f"{self.history_file}.tmp"
+        try:
+            with open(tmp_filename, 'w', encoding='utf-8') as f:
+                json.dump(self.history, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_filename, self.history_file)
+        except OSError as e:
+            print(f"⚠️  Не удалось сохранить историю времени ответов: {e}")
+
+    def _keys(self, model, prompt_length):
+        """Ключи истории от точного к общему"""
+        model = model or "default"
+        return [f"{model}|{length_bucket(prompt_length)}", f"{model}|*", "*"]
+
+    def expected(self, model, prompt_length):
+        """Ожидаемое время генерации (сек)"""
+        for key in self._keys(model, prompt_length):
+            entry = self.history.get(key)
+            if entry and entry.get('count'):
+                return entry['mean']
+        return self.default_expected
+
+    def record(self, model, prompt_length, duration):
+        """Добавляет замер времени генерации в историю"""
+        for key in self._keys(model, prompt_length):
+            entry = self.history.get(key)
+            if entry and entry.get('count'):
+                entry['mean'] = round(entry['mean'] + self.alpha * (duration - entry['mean']), 2)
+                entry['count'] += 1
+            else:
+                self.history[key] = {'mean': round(duration, 2), 'count': 1}
+        self._save()
+
+    def interval(self, elapsed, expected):
+        """
+        Пауза до следующей проверки
+
+        elapsed: сколько секунд прошло после отправки
+        expected: ожидаемое время генерации
+        """
+        window = max(2.0, expected * 0.25)
+
+        if elapsed < self.fast_phase or abs(elapsed - expected) <= window:
+            # Сразу после отправки (быстрые ответы) и около ожидаемого конца
+            interval = self.min_interval
+        elif elapsed < expected:
+            # Долгое размышление: реже, но не проспать начало окна
+            interval = (expected - window - elapsed) * 0.5
+        else:
+            # Дольше обычного: постепенно реже
+            interval = (elapsed - expected - window) * 0.25
+
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def start(self, model, prompt_length):
+        """План опроса для только что отправленного запроса"""
+        return PollPlan(self, model, prompt_length)
+
+
+class PollPlan:
+    """Опрос одного запроса: отсчет от момента отправки"""
+
+    def __init__(self, scheduler, model, prompt_length):
+        self.scheduler = scheduler
+        self.model = model
+        self.prompt_length = prompt_length
+        self.expected = scheduler.expected(model, prompt_length)
+        self.start_time = time.time()
+
+    def elapsed(self):
+        """Секунд после отправки"""
+        return time.time() - self.start_time
+
+    def next_interval(self):
+        """Пауза до следующей проверки"""
+        return self.scheduler.interval(self.elapsed(), self.expected)
+
+    def finish(self):
+        """Генерация завершена - запоминает ее время"""
+        duration = self.elapsed()
+        self.scheduler.record(self.model, self.prompt_length, duration)
+        return duration
@@ -0,0 +1,476 @@
+"""
+Источники запросов: Excel, CSV, JSONL, SQLite
+Все источники предоставляют один интерфейс (как у ExcelHandler):
+load, check_structure, scan, iter_pending_requests, get_pending_requests,
+get_statistics, update_status, flush, close
+"""
+import abc
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+from config import *
+from excel_handler import ExcelHandler
+from split_excel_handler import SplitExcelHandler
+from job_store import SQLiteJobStore
+from status_index import StatusIndex
+from status_journal import StatusJournal
+from response_store import ResponseStore
+
+
+class JournalRequestSource(abc.ABC):
+    """
+    База для источников, входной файл которых только читается
+
+    Статусы и ответы пишутся в журнал {filename}.journal (append-only, fsync),
+    при следующем запуске выполненные строки берутся из него.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.journal = StatusJournal(f"{filename}.journal")
+        self.results_file = self.journal.filename
+        self.response_store = ResponseStore()
+        self.results = {}
+        self._loaded = False
+
+    def is_loaded(self):
+        """Прочитан ли источник"""
+        return self._loaded
+
+    def load(self):
+        """Читает источник и журнал статусов"""
+        if not os.path.exists(self.filename):
+            print(f"❌ Файл {self.filename} не найден!")
+            return False
+
+        try:
+            self.results = self.journal.load_results()
+            self._load_source()
+        except Exception as e:
+            print(f"❌ Ошибка при загрузке {self.filename}: {e}")
+            return False
+
+        if self.results:
+            print(f"♻️  Результатов в журнале: {len(self.results)} строк")
+
+        self.journal.open()
+        self._loaded = True
+        return True
+
+    @abc.abstractmethod
+    def _load_source(self):
+        """Читает входной файл"""
+
+    def _make_item(self, row, record):
+        """Описание запроса в формате ExcelHandler.get_pending_requests"""
+        chat_mode = record.get('chat_mode')
+        return {
+            'row': row,
+            'request': str(record['request']).strip(),
+            'project': record.get('project') or None,
+            'model': record.get('model') or None,
+            'chat_mode': chat_mode if chat_mode else CHAT_MODE_NEW
+        }
+
+    @abc.abstractmethod
+    def iter_pending_requests(self):
+        """Лениво перебирает невыполненные запросы"""
+
+    @abc.abstractmethod
+    def get_statistics(self):
+        """Возвращает статистику по запросам"""
+
+    def get_pending_requests(self):
+        """Получает список невыполненных запросов"""
+        return list(self.iter_pending_requests())
+
+    def scan(self):
+        """Возвращает: (список невыполненных запросов, статистика)"""
+        return self.get_pending_requests(), self.get_statistics()
+
+    def update_status(self, row, status, response="", error_message=""):
+        """Записывает изменение статуса в журнал"""
+        response = self.response_store.make_cell_value(response)
+        record = self.journal.append(row, status, response, error_message)
+        self.journal.merge_record(self.results, record)
+        self._on_status_changed(row, status)
+
+    def _on_status_changed(self, row, status):
+        """Обновляет внутренние счетчики после изменения статуса"""
+
+    def get_response(self, row):
+        """Полный текст ответа для строки (или None)"""
+        result = self.results.get(row)
+        if not result or result.get('offset') is None:
+            return None
+        return self.response_store.resolve(self.journal.read_response(result))
+
+    def flush(self):
+        """Журнал пишется на диск сразу - сохранять нечего"""
+        return True
+
+    def close(self):
+        """Закрывает журнал"""
+        self.journal.close()
+        return True
+
+
+class CSVRequestSource(JournalRequestSource):
+    """
+    Запросы из CSV файла
+
+    Колонки в том же порядке, что и в Excel (COL_REQUEST, COL_STATUS, ...),
+    первая строка - заголовок. Номер строки считается как в Excel.
+    """
+
+    def __init__(self, filename=CSV_FILE, delimiter=CSV_DELIMITER):
+        super().__init__(filename)
+        self.delimiter = delimiter
+        self.index = None
+
+    def _iter_records(self):
+        """Построчно читает CSV: (номер строки, значения колонок)"""
+        with open(self.filename, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f, delimiter=self.delimiter)
+            next(reader, None)  # Заголовок
+            for row, values in enumerate(reader, 2):
+                yield row, values
+
+    def _get_value(self, values, col):
+        """Безопасно получает значение колонки из строки"""
+        if len(values) < col:
+            return None
+        value = values[col - 1].strip()
+        return value if value else None
+
+    def _load_source(self):
+        """Строит индекс статусов одним проходом по CSV"""
+        self.index = StatusIndex(first_row=2)
+
+        for row, values in self._iter_records():
+            result = self.results.get(row)
+            self.index.add_row(
+                status=result['status'] if result else self._get_value(values, COL_STATUS),
+                has_request=bool(self._get_value(values, COL_REQUEST)),
+                project=self._get_value(values, COL_PROJECT),
+                model=self._get_value(values, COL_MODEL),
+                chat_mode=self._get_value(values, COL_CHAT_MODE)
+            )
+
+    def check_structure(self):
+        """Проверяет структуру CSV. Возвращает: (errors, warnings)"""
+        errors = []
+        warnings = []
+
+        total = self.index.get_statistics()['total']
+        if total < 1:
+            errors.append("CSV файл пустой (нет данных кроме заголовка)")
+            return errors, warnings
+
+        empty_count = self.index.count_empty_rows()
+        if empty_count == total:
+            errors.append("Нет ни одного запроса для обработки")
+            return errors, warnings
+
+        if empty_count:
+            empty_rows = self.index.empty_rows(limit=5)
+            warnings.append(
+                f"Найдены пустые строки: {', '.join(map(str, empty_rows))}"
+                f"{'...' if empty_count > 5 else ''}"
+            )
+
+        return errors, warnings
+
+    def iter_pending_requests(self):
+        """Лениво перебирает невыполненные запросы (генератор)"""
+        for row, values in self._iter_records():
+            if not self.index.is_pending(row):
+                continue
+            yield self._make_item(row, {
+                'request': self._get_value(values, COL_REQUEST),
+                'project': self._get_value(values, COL_PROJECT),
+                'model': self._get_value(values, COL_MODEL),
+                'chat_mode': self._get_value(values, COL_CHAT_MODE)
+            })
+
+    def _on_status_changed(self, row, status):
+        """Обновляет индекс статусов"""
+        self.index.set_status(row, status)
+
+    def get_statistics(self):
+        """Возвращает статистику по запросам"""
+        return self.index.get_statistics()
+
+
+class JSONLRequestSource(JournalRequestSource):
+    """
+    Запросы из JSONL файла (одна строка = один JSON объект)
+
+    Формат строки: {"request": "...", "project": "...", "model": "...", "chat_mode": "new"}
+    (вместо "request" можно "prompt"). Номер строки файла (с 1) = row.
+
+    Файл отображается в память (mmap), для него строится индекс смещений
+    начала строк и признаков "строка - запрос". Индекс сохраняется в
+    {filename}.idx и при дописывании в конец файла только дополняется.
+    В заголовке индекса - размер, mtime и sha256 проиндексированной части
+    файла: если файл переписан, индекс строится заново.
+    JSON невыполненных строк разбирается повторно только начиная
+    с первой незавершенной.
+    """
+
+    INDEX_MAGIC = b'JLIDX2\n\0'
+    # Проиндексировано байт, mtime_ns файла, sha256 проиндексированной части, строк
+    INDEX_HEADER = struct.Struct('<QQ32sQ')
+
+    def __init__(self, filename=JSONL_FILE):
+        super().__init__(filename)
+        self.index_filename = f"{filename}.idx"
+        self._offsets = array('Q')  # Начала строк + конец файла
+        self._valid = bytearray()  # 1 - строка содержит запрос
+        self._requests_count = 0
+        self._counts = {'success': 0, 'errors': 0}
+        self._first_unfinished = 1
+
+    # ------------------------------------------------------------
+    # Индекс смещений
+    # ------------------------------------------------------------
+
+    def _hash_prefix(self, mm, size):
+        """sha256 первых size байт файла"""
+        digest = hashlib.sha256()
+        for pos in range(0, size, 1 << 20):
+            digest.update(mm[pos:min(pos + (1 << 20), size)])
+        return digest.digest()
+
+    def _load_offsets(self, mm):
+        """
+        Загружает сохраненный индекс (если он подходит к файлу)
+
+        Возвращает: (смещения, признаки запросов); пустой индекс, если
+        сохраненного нет или файл с тех пор не только дописывался
+        """
+        empty = (array('Q', [0]), bytearray())
+        if not os.path.exists(self.index_filename):
+            return empty
+
+        with open(self.index_filename, 'rb') as f:
+            if f.read(len(self.INDEX_MAGIC)) != self.INDEX_MAGIC:
+                return empty
+            header = f.read(self.INDEX_HEADER.size)
+            if len(header) != self.INDEX_HEADER.size:
+                return empty
+            indexed_size, mtime_ns, digest, rows = self.INDEX_HEADER.unpack(header)
+            offsets = array('Q')
+            try:
+                offsets.fromfile(f, rows + 1)
+            except EOFError:
+                return empty
+            valid = bytearray(f.read(rows))
+
+        if len(valid) != rows or offsets[-1] != indexed_size or indexed_size > len(mm):
+            return empty
+
+        # Файл не менялся - проверять содержимое не нужно
+        stat = os.stat(self.filename)
+        if not (stat.st_size == indexed_size and stat.st_mtime_ns == mtime_ns):
+            if self._hash_prefix(mm, indexed_size) != digest:
+                print(f"♻️  {self.filename} изменен - индекс строк строится заново")
+                return empty
+
+        # Последняя строка могла быть недописанной - переиндексируем ее
+        if rows and mm[indexed_size - 1:indexed_size] != b'\n':
+            offsets.pop()
+            valid.pop()
+        return offsets, valid
+
+    def _save_offsets(self, mm):
+        """Сохраняет индекс смещений с отпечатком проиндексированной части файла"""
+        indexed_size = self._offsets[-1]
+        header = self.INDEX_HEADER.pack(
+            indexed_size,
+            os.stat(self.filename).st_mtime_ns,
+            self._hash_prefix(mm, indexed_size),
+            self.get_total()
+        )
+        tmp_filename = f"{self.index_filename}.tmp"
+        with open(tmp_filename, 'wb') as f:
+            f.write(self.INDEX_MAGIC)
+            f.write(header)
+            self._offsets.tofile(f)
+            f.write(self._valid)
+        os.replace(tmp_filename, self.index_filename)
+
+    def _build_offsets(self, mm, offsets, valid):
+        """Дополняет индекс строками, дописанными после offsets[-1]"""
+        pos = offsets[-1]
+        size = len(mm)
+        added = False
+
+        while pos < size:
+            end = mm.find(b'\n', pos)
+            if end == -1:
+                end = size
+            else:
+                end += 1
+            valid.append(1 if self._parse_record(mm[pos:end]) else 0)
+            offsets.append(end)
+            pos = end
+            added = True
+
+        return added
+
+    def _load_source(self):
+        """Строит (или дополняет) индекс смещений строк"""
+        self._offsets = array('Q', [0])
+        self._valid = bytearray()
+
+        if os.path.getsize(self.filename) > 0:
+            with open(self.filename, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    self._offsets, self._valid = self._load_offsets(mm)
+                    if self._build_offsets(mm, self._offsets, self._valid):
+                        self._save_offsets(mm)
+
+        # Счетчики и первая незавершенная строка - по журналу
+        self._requests_count = sum(self._valid)
+        self._counts = {'success': 0, 'errors': 0}
+        for row, result in self.results.items():
+            if self._is_request(row):
+                self._count(result['status'], +1)
+        self._advance_first_unfinished()
+
+    def _count(self, status, delta):
+        """Изменяет счетчик категории статуса"""
+        if status == STATUS_SUCCESS:
+            self._counts['success'] += delta
+        elif status in ERROR_STATUSES:
+            self._counts['errors'] += delta
+
+    def _is_done(self, row):
+        """Выполнен ли запрос в строке (по журналу)"""
+        result = self.results.get(row)
+        return bool(result) and bool(result['status']) and result['status'] not in RETRY_STATUSES
+
+    def _advance_first_unfinished(self):
+        """Сдвигает указатель первой незавершенной строки"""
+        total = self.get_total()
+        while self._first_unfinished <= total and (
+                self._is_done(self._first_unfinished) or not self._is_request(self._first_unfinished)):
+            self._first_unfinished += 1
+
+    def get_total(self):
+        """Количество строк в файле"""
+        return len(self._offsets) - 1
+
+    # ------------------------------------------------------------
+    # Чтение записей
+    # ------------------------------------------------------------
+
+    def _is_request(self, row):
+        """Есть ли в строке файла запрос (по индексу)"""
+        return 1 <= row <= len(self._valid) and self._valid[row - 1] == 1
+
+    def _parse_line(self, mm, row):
+        """Разбирает строку файла по номеру (None если строка пустая/битая)"""
+        return self._parse_record(mm[self._offsets[row - 1]:self._offsets[row]])
+
+    def _parse_record(self, line):
+        """Разбирает строку файла (None если строка пустая/битая)"""
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(record, dict):
+            return None
+
+        request = record.get('request') or record.get('prompt')
+        if not request or not str(request).strip():
+            return None
+        record['request'] = request
+        return record
+
+    def iter_pending_requests(self):
+        """
+        Лениво перебирает невыполненные запросы (генератор)
+
+        Начинает сразу с первой незавершенной строки, выполненные строки не разбираются.
+        """
+        total = self.get_total()
+        if total < 1:
+            return
+
+        with open(self.filename, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for row in range(self._first_unfinished, total + 1):
+                    if self._is_done(row) or not self._is_request(row):
+                        continue
+                    record = self._parse_line(mm, row)
+                    if record:
+                        yield self._make_item(row, record)
+
+    def check_structure(self):
+        """Проверяет JSONL файл. Возвращает: (errors, warnings)"""
+        errors = []
+        warnings = []
+
+        if self.get_total() < 1:
+            errors.append("JSONL файл пустой")
+        elif not self._requests_count:
+            errors.append("Нет ни одной строки с запросом")
+        else:
+            invalid = self.get_total() - self._requests_count
+            if invalid:
+                warnings.append(f"Пустых или нечитаемых строк: {invalid}")
+
+        return errors, warnings
+
+    def update_status(self, row, status, response="", error_message=""):
+        """Записывает изменение статуса в журнал"""
+        old = self.results.get(row)
+        if old and self._is_request(row):
+            self._count(old['status'], -1)
+        super().update_status(row, status, response, error_message)
+
+    def _on_status_changed(self, row, status):
+        """Обновляет счетчики и указатель первой незавершенной строки"""
+        if self._is_request(row):
+            self._count(status, +1)
+        if row == self._first_unfinished:
+            self._advance_first_unfinished()
+
+    def get_statistics(self):
+        """Возвращает статистику по запросам (только строки с запросом)"""
+        total = self._requests_count
+        return {
+            'total': total,
+            'success': self._counts['success'],
+            'errors': self._counts['errors'],
+            'pending': total - self._counts['success'] - self._counts['errors']
+        }
+
+
+def create_request_source(kind=REQUEST_SOURCE):
+    """
+    Создает источник запросов по типу из конфигурации
+
+    kind: 'excel', 'csv', 'jsonl' или 'sqlite'
+    """
+    if kind == 'csv':
+        return CSVRequestSource(CSV_FILE)
+    if kind == 'jsonl':
+        return JSONLRequestSource(JSONL_FILE)
+    if kind == 'sqlite':
+        return SQLiteJobStore(JOB_STORE_FILE, EXCEL_FILE, JOB_STORE_EXPORT_FILE)
+    if kind != 'excel':
+        raise ValueError(f"Неизвестный источник запросов: {kind}")
+
+    if EXCEL_OUTPUT_FILE:
+        return SplitExcelHandler(EXCEL_FILE, EXCEL_OUTPUT_FILE)
+    return ExcelHandler(EXCEL_FILE)
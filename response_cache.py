@@ -0,0 +1,127 @@
+"""
+Постоянный кэш ответов (SQLite)
+Повторный запрос с тем же текстом, проектом, моделью и режимом чата
+не отправляется в браузер - ответ берется из кэша
+"""
+import hashlib
+import re
+import sqlite3
+import time
+from config import *
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key         TEXT PRIMARY KEY,
+    response    TEXT,
+    size        INTEGER,
+    created     REAL,
+    accessed    REAL,
+    hits        INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache(accessed);
+"""
+
+
+def normalize_prompt(text):
+    """Нормализует текст запроса: пробелы и переносы по краям и внутри схлопываются"""
+    return re.sub(r'\s+', ' ', str(text or '')).strip()
+
+
+class ResponseCache:
+    """
+    Кэш ответов с вытеснением
+
+    - TTL: записи старше ttl секунд не выдаются и удаляются
+    - LRU: при превышении max_entries или max_bytes удаляются
+      записи, которые дольше всего не запрашивались
+    """
+
+    def __init__(self, filename=RESPONSE_CACHE_FILE, max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+                 max_bytes=RESPONSE_CACHE_MAX_BYTES, ttl=RESPONSE_CACHE_TTL):
+        self.filename = filename
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self.conn = sqlite3.connect(filename, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.evict()
+
+    def make_key(self, request, project=None, model=None, chat_mode=CHAT_MODE_NEW):
+        """Ключ кэша: sha256 от нормализованных запроса, проекта, модели и режима чата"""
+        parts = [
+            normalize_prompt(request),
+            normalize_prompt(project).lower(),
+            normalize_prompt(model).lower(),
+            normalize_prompt(chat_mode or CHAT_MODE_NEW).lower()
+        ]
+        return hashlib.sha256("\0".join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Ответ из кэша (None если нет или устарел)"""
+        values = self.conn.execute(
+            "SELECT response, created FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if values is None:
+            return None
+
+        response, created = values
+        now = time.time()
+        if self.ttl and now - created > self.ttl:
+            self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return None
+
+        self.conn.execute(
+            "UPDATE cache SET accessed = ?, hits = hits + 1 WHERE key = ?", (now, key)
+        )
+        return response
+
+    def put(self, key, response):
+        """Сохраняет ответ и вытесняет лишние записи"""
+        if not response:
+            return
+
+        now = time.time()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO cache (key, response, size, created, accessed, hits) "
+            "VALUES (?, ?, ?, ?, ?, 0)",
+            (key, response, len(response.encode('utf-8')), now, now)
+        )
+        self.evict()
+
+    def evict(self):
+        """Удаляет устаревшие записи и лишние по количеству/размеру (LRU)"""
+        if self.ttl:
+            self.conn.execute("DELETE FROM cache WHERE created < ?", (time.time() - self.ttl,))
+
+        count, total_size = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+
+        if self.max_entries and count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM cache WHERE key IN "
+                "(SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,)
+            )
+            count, total_size = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+            ).fetchone()
+
+        if self.max_bytes and total_size > self.max_bytes:
+            excess = total_size - self.max_bytes
+            keys = []
+            for key, size in self.conn.execute("SELECT key, size FROM cache ORDER BY accessed"):
+                keys.append(key)
+                excess -= size
+                if excess <= 0:
+                    break
+            self.conn.executemany("DELETE FROM cache WHERE key = ?", [(key,) for key in keys])
+
+    def close(self):
+        """Закрывает базу кэша"""
+        if self.conn:
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,102 @@
+"""
+Хранение длинных ответов во внешних файлах (sidecar)
+В ячейке Excel остается начало ответа и ссылка на файл с полным текстом
+"""
+import hashlib
+import os
+import re
+from config import *
+from compression import resolve_compression, compression_extension, compress_bytes, open_compressed
+
+# Ссылка в конце значения ячейки: [sidecar:<sha256>]
+SIDECAR_REF_PATTERN = re.compile(r'\[sidecar:([0-9a-f]{64})\]\s*$')
+
+
+class ResponseStore:
+    """
+    Хранилище полных текстов ответов
+
+    Файлы адресуются по содержимому (sha256): {base_dir}/ab/abcdef...txt[.gz|.zst]
+    Одинаковые ответы хранятся один раз, файл пишется однократно.
+    """
+
+    def __init__(self, base_dir=RESPONSE_SIDECAR_DIR, threshold=RESPONSE_SIDECAR_THRESHOLD,
+                 preview_length=RESPONSE_PREVIEW_LENGTH, compression=RESPONSE_SIDECAR_COMPRESSION):
+        """
+        threshold: длина ответа (символов), начиная с которой он выносится в файл
+        preview_length: сколько символов ответа оставлять в ячейке
+        compression: None, 'gzip' или 'zstd' - сжатие новых файлов
+        """
+        self.base_dir = base_dir
+        self.threshold = threshold
+        self.preview_length = preview_length
+        self.compression = resolve_compression(compression)
+
+    def path_for(self, digest, compression=None):
+        """Путь к файлу с ответом"""
+        ext = compression_extension(compression)
+        return os.path.join(self.base_dir, digest[:2], f"{digest}.txt{ext}")
+
+    def _find_path(self, digest):
+        """Путь к существующему файлу ответа (в любом формате) или None"""
+        for compression in (self.compression, None, 'gzip', 'zstd'):
+            path = self.path_for(digest, compression)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, text):
+        """Сохраняет текст (если его еще нет) и возвращает его sha256"""
+        data = text.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+
+        if self._find_path(digest) is None:
+            path = self.path_for(digest, self.compression)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            name, ext = os.path.splitext(path)
+            tmp_path = f"{name}.tmp{ext}"
+            with open(tmp_path, 'wb') as f:
+                f.write(compress_bytes(data, self.compression))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+
+        return digest
+
+    def get(self, digest):
+        """Читает текст по sha256 (None если файла нет)"""
+        path = self._find_path(digest)
+        if path is None:
+            return None
+        with open_compressed(path, 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def make_cell_value(self, text):
+        """
+        Значение для ячейки Excel
+
+        Короткий ответ возвращается как есть, длинный - сохраняется
+        в файл и заменяется на начало текста + ссылку.
+        """
+        if not text or not self.threshold or len(text) <= self.threshold:
+            return text
+
+        digest = self.put(text)
+        return f"{text[:self.preview_length]}…\n\n[sidecar:{digest}]"
+
+    def resolve(self, value):
+        """Возвращает полный текст, если значение содержит ссылку на файл"""
+        if not isinstance(value, str):
+            return value
+
+        match = SIDECAR_REF_PATTERN.search(value)
+        if not match:
+            return value
+
+        text = self.get(match.group(1))
+        return text if text is not None else value
+
+
+def resolve_response(value, base_dir=RESPONSE_SIDECAR_DIR):
+    """Раскрывает ссылку на sidecar файл в полный текст ответа"""
+    return ResponseStore(base_dir).resolve(value)
@@ -0,0 +1,192 @@
+"""
+Потоковый захват ответа ChatGPT
+Перед отправкой запроса в страницу ставится MutationObserver, который
+записывает прирост текста нового сообщения ассистента (кусками, с временем).
+Python забирает накопленные куски одним execute_script и передает их
+в callback. Дает время до первого токена, скорость генерации и частичный
+ответ без повторного чтения, если генерация не уложилась в таймаут.
+"""
+import time
+from config import *
+
+# Аргументы: нет. Ставится ДО нажатия Enter - иначе не отличить новое сообщение
+STREAM_START_SCRIPT = """
+var selector = "[data-message-author-role='assistant']";
+var previous = window.__chatgptStream;
+if (previous && previous.observer) {
+    previous.observer.disconnect();
+}
+
+var state = {
+    baseline: document.querySelectorAll(selector).length,
+    startedAt: Date.now(),
+    firstTokenAt: null,
+    lastChunkAt: null,
+    text: "",
+    chunks: [],
+    observer: null
+};
+
+function update() {
+    var messages = document.querySelectorAll(selector);
+    if (messages.length <= state.baseline) {
+        return;
+    }
+    var current = messages[messages.length - 1].textContent || "";
+    if (current === state.text) {
+        return;
+    }
+    var now = Date.now();
+    if (state.firstTokenAt === null && current.trim()) {
+        state.firstTokenAt = now;
+    }
+    if (current.indexOf(state.text) === 0) {
+        state.chunks.push({t: now, text: current.substring(state.text.length), replace: false});
+    } else {
+        // Текст перерисован целиком (разметка) - отдаем его полностью
+        state.chunks.push({t: now, text: current, replace: true});
+    }
+    state.text = current;
+    state.lastChunkAt = now;
+}
+
+state.observer = new MutationObserver(update);
+state.observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+window.__chatgptStream = state;
+return state.startedAt;
+"""
+
+# Аргументы: остановить ли наблюдатель
+STREAM_TAKE_SCRIPT = """
+var state = window.__chatgptStream;
+if (!state) {
+    return null;
+}
+if (arguments[0] && state.observer) {
+    state.observer.disconnect();
+    state.observer = null;
+}
+var chunks = state.chunks;
+state.chunks = [];
+return {chunks: chunks, startedAt: state.startedAt, firstTokenAt: state.firstTokenAt,
+        lastChunkAt: state.lastChunkAt};
+"""
+
+
+def estimate_tokens(text):
+    """Приблизительное количество токенов в тексте"""
+    return len(text) / STREAM_CHARS_PER_TOKEN if text else 0
+
+
+class ResponseStream:
+    """
+    Захват одного ответа по мере генерации
+
+    on_chunk(text, replace): вызывается для каждого куска; replace=True
+    значит, что текст перерисован и text - весь ответ целиком,
+    иначе text - дописанный к ответу кусок.
+    """
+
+    def __init__(self, driver, on_chunk=None, model=None, poll_interval=STREAM_POLL_INTERVAL):
+        """
+        model: модель запроса (для статистики по моделям)
+        poll_interval: как часто забирать куски из страницы во время опроса
+        """
+        self.driver = driver
+        self.on_chunk = on_chunk
+        self.model = model
+        self.poll_interval = poll_interval
+        self.text = ""
+        self.chunks_count = 0
+        self.started_at = None
+        self.first_token_at = None
+        self.last_chunk_at = None
+        self.active = False
+        self._last_poll = 0
+
+    def start(self):
+        """Ставит наблюдатель (вызывать до отправки запроса)"""
+        if not STREAM_CAPTURE_ENABLED:
+            return False
+        try:
+            self.started_at = self.driver.execute_script(STREAM_START_SCRIPT)
+            self.active = True
+        except Exception as e:
+            print(f"  ⚠️ Потоковый захват недоступен: {str(e).splitlines()[0][:100]}")
+            self.active = False
+        return self.active
+
+    def poll(self, stop=False):
+        """
+        Забирает накопленные куски и передает их в on_chunk
+
+        stop: остановить наблюдатель (после завершения генерации)
+        Возвращает: количество новых кусков
+        """
+        if not self.active:
+            return 0
+
+        self._last_poll = time.time()
+        try:
+            result = self.driver.execute_script(STREAM_TAKE_SCRIPT, stop)
+        except Exception as e:
+            print(f"  ⚠️ Не удалось забрать куски ответа: {str(e).splitlines()[0][:100]}")
+            return 0
+
+        if stop:
+            self.active = False
+        if not result:
+            # Страница перезагрузилась - наблюдателя больше нет
+            self.active = False
+            return 0
+
+        self.first_token_at = result.get('firstTokenAt')
+        self.last_chunk_at = result.get('lastChunkAt')
+
+        chunks = result.get('chunks') or []
+        for chunk in chunks:
+            if chunk.get('replace'):
+                self.text = chunk['text']
+            else:
+                self.text += chunk['text']
+            if self.on_chunk is not None:
+                try:
+                    self.on_chunk(chunk['text'], chunk.get('replace', False))
+                except Exception as e:
+                    print(f"  ⚠️ Ошибка в обработчике кусков ответа: {e}")
+
+        self.chunks_count += len(chunks)
+        return len(chunks)
+
+    def poll_if_due(self):
+        """poll(), если с прошлого раза прошло не меньше poll_interval"""
+        if self.active and time.time() - self._last_poll >= self.poll_interval:
+            return self.poll()
+        return 0
+
+    def stop(self):
+        """Забирает последние куски и снимает наблюдатель"""
+        return self.poll(stop=True)
+
+    def get_metrics(self):
+        """
+        Метрики ответа: {"model", "ttft", "tokens_per_sec", "chunks", "length"}
+
+        ttft - секунд от отправки до первого текста,
+        tokens_per_sec - приблизительно (STREAM_CHARS_PER_TOKEN символов на токен).
+        None, если первый текст не появился.
+        """
+        if self.started_at is None or self.first_token_at is None:
+            return None
+
+        ttft = (self.first_token_at - self.started_at) / 1000
+        generation_time = ((self.last_chunk_at or self.first_token_at) - self.first_token_at) / 1000
+        tokens_per_sec = estimate_tokens(self.text) / generation_time if generation_time > 0 else None
+
+        return {
+            'model': self.model,
+            'ttft': ttft,
+            'tokens_per_sec': tokens_per_sec,
+            'chunks': self.chunks_count,
+            'length': len(self.text)
+        }
@@ -0,0 +1,156 @@
+"""
+Отслеживание ответа после отправки запроса (общее для обоих ChatGPTHandler)
+Завершение генерации (наблюдатель в странице, иначе опрос поля ввода),
+потоковый захват ответа и адаптивный интервал опроса - в одном месте,
+чтобы исправления не приходилось повторять в каждом обработчике.
+"""
+import time
+from config import *
+from completion_detector import CompletionDetector
+from poll_scheduler import PollScheduler
+from response_stream import ResponseStream
+
+
+class ResponseTrackingMixin:
+    """
+    Ожидание и захват ответа для ChatGPTHandler
+
+    Обработчик должен иметь driver, error_handler и методы
+    wait_for_input_field_ready(max_wait) и read_final_response().
+    Порядок в send_request:
+    reset_response_tracking() → ... → before_send(model) → Enter →
+    after_send(model, prompt) → wait_for_generation()
+    """
+
+    def init_response_tracking(self, driver):
+        """Создает помощников (вызывать в __init__ обработчика)"""
+        self.completion_detector = CompletionDetector(driver)
+        self.poll_scheduler = PollScheduler()
+        self.poll_plan = None
+        self.response_stream = None
+        self.on_response_chunk = None  # callback(text, replace) для кусков ответа
+        self.last_stream_metrics = None  # Время до первого токена и скорость последнего ответа
+        self.last_partial_message = None  # Почему последний ответ неполный (None - полный)
+
+    def reset_response_tracking(self):
+        """Сбрасывает состояние прошлого запроса"""
+        self.poll_plan = None
+        self.response_stream = None
+        self.last_stream_metrics = None
+        self.last_partial_message = None
+
+    def before_send(self, model=None):
+        """
+        Подготовка перед нажатием Enter
+
+        Ждать завершения будем только нового ответа, не прошлого в этом же чате;
+        потоковый захват ставится до отправки, чтобы не пропустить первый токен.
+        """
+        self.completion_detector.mark_baseline()
+        self.response_stream = ResponseStream(self.driver, on_chunk=self.on_response_chunk, model=model)
+        self.response_stream.start()
+
+    def after_send(self, model, prompt):
+        """Запрос отправлен - начинается отсчет для плана опроса"""
+        self.poll_plan = self.poll_scheduler.start(model, len(prompt))
+
+    def next_poll_interval(self, check_interval=None):
+        """Пауза до следующей проверки готовности"""
+        if check_interval is not None:
+            return check_interval
+        if self.poll_plan is not None:
+            return self.poll_plan.next_interval()
+        return 2
+
+    def poll_response_stream(self):
+        """Забирает куски ответа, если подошло время (во время опроса поля)"""
+        if self.response_stream is not None:
+            self.response_stream.poll_if_due()
+
+    def between_completion_slices(self):
+        """
+        Между отрезками ожидания наблюдателя: куски ответа и проверка ошибок
+
+        Возвращает: (False, message) при ошибке ChatGPT, иначе None
+        """
+        if self.response_stream is not None:
+            self.response_stream.poll()
+
+        error_type, error_msg = self.error_handler.check_for_errors()
+        if error_type:
+            return False, f"Ошибка ChatGPT: {error_msg}"
+        return None
+
+    def finish_response_stream(self):
+        """
+        Останавливает потоковый захват и запоминает метрики ответа
+
+        Возвращает: захваченный текст ответа ("" если захвата не было)
+        """
+        stream = self.response_stream
+        if stream is None:
+            return ""
+
+        stream.stop()
+        self.response_stream = None
+        self.last_stream_metrics = stream.get_metrics()
+
+        metrics = self.last_stream_metrics
+        if metrics:
+            speed = f", ~{metrics['tokens_per_sec']:.0f} ток/с" if metrics['tokens_per_sec'] else ""
+            print(f"  📶 Первый токен через {metrics['ttft']:.1f}с{speed} (кусков: {metrics['chunks']})")
+        return stream.text
+
+    def wait_for_generation(self):
+        """
+        Ждет завершения генерации и читает ответ
+
+        Наблюдатель в странице, если он недоступен - опрос готовности поля
+        ввода оставшееся время. Все это время куски ответа забираются
+        потоковым захватом.
+
+        Генерация, не уложившаяся в GENERATION_MAX_WAIT, - не ошибка: ответ
+        (из захвата, иначе прочитанный со страницы) возвращается как успех,
+        а причина запоминается в last_partial_message - такой ответ
+        не кэшируется и не раздается одинаковым запросам.
+
+        Возвращает: (success, response_text, error_type, error_message)
+        """
+        generation_start = time.time()
+        streaming = self.response_stream is not None and self.response_stream.active
+        outcome = self.completion_detector.wait(
+            max_wait=GENERATION_MAX_WAIT,
+            on_slice=self.between_completion_slices,
+            slice_seconds=STREAM_POLL_INTERVAL if streaming else None
+        )
+
+        if outcome is None:
+            print(f"  ⏳ Жду завершения генерации...")
+            success, msg = self.wait_for_input_field_ready(
+                max_wait=max(1, GENERATION_MAX_WAIT - (time.time() - generation_start))
+            )
+        else:
+            success, msg = outcome
+
+        streamed_text = self.finish_response_stream()
+
+        if not success:
+            # Даже если таймаут - берем то, что уже пришло
+            print(f"  ⚠️ {msg}")
+            self.last_partial_message = msg
+            if streamed_text.strip():
+                print(f"  💡 Частичный ответ из потокового захвата ({len(streamed_text)} символов)")
+                return True, streamed_text, None, None
+            print(f"  💡 Пробую прочитать частичный ответ...")
+            return self.read_final_response()
+
+        print(f"  ✅ Генерация завершена")
+        # Время генерации - в историю для следующих запросов этой модели
+        if self.poll_plan is not None:
+            self.poll_plan.finish()
+        if outcome is None:
+            # Небольшая пауза для стабилизации DOM
+            # (наблюдатель сам дожидается, пока текст перестанет меняться)
+            time.sleep(2)
+
+        return self.read_final_response()
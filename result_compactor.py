@@ -0,0 +1,243 @@
+"""
+Сжатие мелких файлов результатов в архивы Parquet
+Множество JSON файлов / закрытых JSONL сегментов собирается в один
+колоночный файл {output_dir}/archive/results_{время}.parquet,
+манифест и индекс результатов переводятся на новые места
+
+Использование:
+    python result_compactor.py
+    python result_compactor.py --min-files 10 --max-files 50000
+
+Требует пакет pyarrow.
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+from config import *
+from jsonl_sink import list_segments, iter_file_entries
+from result_export import DICTIONARY_COLUMNS, parquet_schema, rows_to_batch, pyarrow
+from result_index import ResultIndex
+from result_manifest import ResultManifest
+from result_versions import ResultVersionStore
+from results_reader import flatten_result, parse_json
+
+
+class ResultCompactor:
+    """
+    Сборщик архивов результатов
+
+    Порядок действий (сбой на любом шаге не теряет данные):
+    1. архив пишется во временный файл и переименовывается
+    2. манифест и индекс переводятся на архив
+    3. исходные файлы удаляются
+    """
+
+    def __init__(self, output_dir=JSON_OUTPUT_DIR, manifest=None, index=None,
+                 min_files=JSON_COMPACT_MIN_FILES, max_files=JSON_COMPACT_MAX_FILES,
+                 batch_size=RESULT_EXPORT_BATCH_SIZE, versions=None):
+        """
+        manifest, index, versions: объекты JSONHandlerV2, если сжатие идет
+        во время работы (иначе открываются свои)
+        min_files: сжимать, только если набралось столько файлов
+        max_files: максимум файлов в одном архиве
+        """
+        self.output_dir = output_dir
+        self.archive_dir = os.path.join(output_dir, "archive")
+        self.manifest = manifest if manifest is not None else ResultManifest(output_dir)
+        self.index = index
+        self.versions = versions
+        self.min_files = min_files
+        self.max_files = max_files
+        self.batch_size = batch_size
+
+    def is_available(self):
+        """Установлен ли pyarrow"""
+        return pyarrow is not None
+
+    def _select_sources(self, exclude=()):
+        """Мелкие файлы для сжатия: JSON файлы и закрытые сегменты"""
+        exclude = {os.path.abspath(path) for path in exclude if path}
+        sources = []
+
+        for directory, dirnames, filenames in os.walk(self.output_dir):
+            # Архивы не трогаем
+            dirnames[:] = [name for name in dirnames
+                           if os.path.join(directory, name) != self.archive_dir]
+            for filename in filenames:
+                if filename.endswith('.json'):
+                    sources.append(os.path.join(directory, filename))
+
+        sources = [(os.path.getmtime(path), path) for path in sources]
+        sources = [path for _, path in sorted(sources)]
+        sources += list_segments(self.output_dir)
+
+        return [path for path in sources if os.path.abspath(path) not in exclude][:self.max_files]
+
+    def _iter_source(self, path):
+        """Записи исходного файла: (offset, запись), offset=None для JSON файла"""
+        if path.endswith('.json'):
+            with open(path, 'rb') as f:
+                yield None, parse_json(f.read())
+        else:
+            yield from iter_file_entries(path)
+
+    def compact(self, exclude=(), deadline=None):
+        """
+        Собирает один архив
+
+        exclude: файлы, которые сейчас дописываются (текущий сегмент)
+        deadline: time.time(), после которого новые файлы не берутся
+        Возвращает: количество сжатых файлов
+        """
+        if not self.is_available():
+            return 0
+
+        sources = self._select_sources(exclude)
+        if len(sources) < self.min_files:
+            return 0
+
+        os.makedirs(self.archive_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        archive_path = os.path.join(self.archive_dir, f"results_{timestamp}.parquet")
+        tmp_path = os.path.join(self.archive_dir, f"results_{timestamp}.tmp.parquet")
+
+        schema = parquet_schema()
+        writer = pyarrow.parquet.ParquetWriter(tmp_path, schema, compression='zstd',
+                                               use_dictionary=DICTIONARY_COLUMNS)
+        moved = {}
+        done = []
+        batch = []
+        position = 0
+
+        try:
+            for path in sources:
+                if deadline and done and time.time() >= deadline:
+                    break
+
+                relpath = os.path.relpath(path, self.output_dir)
+                try:
+                    entries = list(self._iter_source(path))
+                except (OSError, ValueError) as e:
+                    print(f"⚠️  Пропускаю {path}: {e}")
+                    continue
+
+                for offset, record in entries:
+                    batch.append(flatten_result(record))
+                    moved[(relpath, offset)] = position
+                    position += 1
+                    if len(batch) >= self.batch_size:
+                        writer.write_batch(rows_to_batch(batch, schema))
+                        batch = []
+                done.append(path)
+
+            if batch:
+                writer.write_batch(rows_to_batch(batch, schema))
+            writer.close()
+            writer = None
+
+            if not done:
+                os.remove(tmp_path)
+                return 0
+
+            os.replace(tmp_path, archive_path)
+
+        except Exception as e:
+            print(f"❌ Ошибка при сжатии результатов: {e}")
+            if writer is not None:
+                writer.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return 0
+
+        self._relocate(moved, archive_path)
+
+        for path in done:
+            os.remove(path)
+        self._remove_empty_dirs()
+
+        return len(done)
+
+    def _relocate(self, moved, archive_path):
+        """Переводит манифест, индекс и версии на архив"""
+        archive_relpath = os.path.relpath(archive_path, self.output_dir)
+
+        for entry in self.manifest.entries.values():
+            position = moved.get((entry['path'], entry.get('offset')))
+            if position is not None:
+                entry['path'] = archive_relpath
+                entry['offset'] = position
+        self.manifest.rewrite()
+
+        index = self.index if self.index is not None else ResultIndex(self.output_dir)
+        try:
+            index.relocate(moved, archive_path)
+        finally:
+            if index is not self.index:
+                index.close()
+
+        versions = self.versions if self.versions is not None else ResultVersionStore(self.output_dir)
+        try:
+            versions.relocate(moved, archive_path)
+        finally:
+            if versions is not self.versions:
+                versions.close()
+
+    def _remove_empty_dirs(self):
+        """Удаляет опустевшие папки шардов"""
+        for directory, _, _ in os.walk(self.output_dir, topdown=False):
+            if directory != self.output_dir and not os.listdir(directory):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    pass
+
+    def run_for(self, seconds, exclude=()):
+        """
+        Сжимает результаты не дольше seconds (например, во время паузы между запросами)
+
+        Оставшееся время - обычное ожидание.
+        """
+        start = time.time()
+        deadline = start + seconds
+        compacted = self.compact(exclude, deadline=deadline)
+        if compacted:
+            print(f"  🗜️  Сжато файлов результатов: {compacted} ({time.time() - start:.1f} сек)")
+
+        remaining = deadline - time.time()
+        if remaining > 0:
+            time.sleep(remaining)
+        return compacted
+
+
+def main():
+    """Командная строка сжатия"""
+    parser = argparse.ArgumentParser(description="Сжатие мелких файлов результатов в Parquet")
+    parser.add_argument('--dir', default=JSON_OUTPUT_DIR, help="Папка с результатами")
+    parser.add_argument('--min-files', type=int, default=JSON_COMPACT_MIN_FILES,
+                        help="Сжимать, только если файлов не меньше")
+    parser.add_argument('--max-files', type=int, default=JSON_COMPACT_MAX_FILES,
+                        help="Максимум файлов в одном архиве")
+    args = parser.parse_args()
+
+    compactor = ResultCompactor(args.dir, min_files=args.min_files, max_files=args.max_files)
+    if not compactor.is_available():
+        print("❌ Для сжатия нужен пакет pyarrow (pip install pyarrow)")
+        return
+
+    total = 0
+    try:
+        while True:
+            compacted = compactor.compact()
+            if not compacted:
+                break
+            total += compacted
+            print(f"🗜️  В архив: {compacted} файлов")
+    finally:
+        compactor.manifest.close()
+
+    print(f"✅ Сжато файлов: {total}")
+
+
+if __name__ == "__main__":
+    main()
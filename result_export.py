@@ -0,0 +1,198 @@
+"""
+Выгрузка всех сохраненных результатов в Parquet и/или Excel
+
+Использование:
+    python result_export.py --parquet results.parquet
+    python result_export.py --xlsx all_results.xlsx --workers 8
+    python result_export.py --source excel --parquet results.parquet
+
+Parquet требует пакет pyarrow. Данные обрабатываются пачками,
+поэтому память не зависит от количества результатов.
+Полные тексты - только в Parquet: в Excel длинные запросы и ответы
+пишутся как начало текста + ссылка на sidecar файл (как в книге запросов).
+"""
+import argparse
+import os
+import time
+from openpyxl import Workbook
+from config import *
+from results_reader import RESULT_COLUMNS, iter_results, iter_excel_results
+from response_store import ResponseStore
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Колонки с небольшим числом разных значений - хранятся словарем
+DICTIONARY_COLUMNS = ['project', 'model', 'status']
+
+# Excel обрезает ячейки длиннее этого
+EXCEL_CELL_MAX_LENGTH = 32767
+
+# Колонки с длинными текстами - в Excel через ResponseStore.make_cell_value
+TEXT_COLUMNS = ('request', 'response')
+
+XLSX_HEADERS = {
+    'row': "Строка",
+    'timestamp': "Время",
+    'project': "Проект",
+    'model': "Модель",
+    'status': "Статус",
+    'success': "Успешно",
+    'attempts': "Попыток",
+    'duration': "Длительность (сек)",
+    'error': "Ошибка",
+    'request': "Запрос",
+    'response': "Ответ",
+    'request_length': "Длина запроса",
+    'response_length': "Длина ответа"
+}
+
+
+def parquet_schema():
+    """Схема Parquet для RESULT_COLUMNS"""
+    return pyarrow.schema([
+        ('row', pyarrow.int64()),
+        ('timestamp', pyarrow.string()),
+        ('project', pyarrow.string()),
+        ('model', pyarrow.string()),
+        ('status', pyarrow.string()),
+        ('success', pyarrow.bool_()),
+        ('attempts', pyarrow.int32()),
+        ('duration', pyarrow.float64()),
+        ('error', pyarrow.string()),
+        ('request', pyarrow.string()),
+        ('response', pyarrow.string()),
+        ('request_length', pyarrow.int64()),
+        ('response_length', pyarrow.int64())
+    ])
+
+
+def rows_to_batch(rows, schema):
+    """Пачка кортежей → RecordBatch (по колонкам)"""
+    columns = list(zip(*rows)) if rows else [[] for _ in RESULT_COLUMNS]
+    arrays = [pyarrow.array(column, type=schema.field(i).type) for i, column in enumerate(columns)]
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _tmp_filename(filename):
+    """Временное имя файла для атомарной записи"""
+    name, ext = os.path.splitext(filename)
+    return f"{name}.tmp{ext}"
+
+
+def export_results(rows, parquet_file=None, xlsx_file=None, batch_size=RESULT_EXPORT_BATCH_SIZE,
+                   response_store=None):
+    """
+    Выгружает результаты за один проход
+
+    rows: итератор кортежей в порядке RESULT_COLUMNS
+    response_store: куда выносить длинные тексты для Excel (по умолчанию -
+    общее хранилище sidecar ответов; выносится все, что не влезает в ячейку,
+    даже если RESPONSE_SIDECAR_THRESHOLD выключен)
+    Возвращает: количество выгруженных строк (None при ошибке)
+    """
+    if parquet_file and pyarrow is None:
+        print("❌ Для выгрузки в Parquet нужен пакет pyarrow (pip install pyarrow)")
+        return None
+
+    parquet_writer = None
+    wb = None
+    ws = None
+    count = 0
+    tmp_files = []
+
+    try:
+        if parquet_file:
+            schema = parquet_schema()
+            tmp_files.append(_tmp_filename(parquet_file))
+            parquet_writer = pyarrow.parquet.ParquetWriter(
+                tmp_files[-1], schema, compression='zstd', use_dictionary=DICTIONARY_COLUMNS
+            )
+
+        if xlsx_file:
+            if response_store is None:
+                threshold = min(RESPONSE_SIDECAR_THRESHOLD or EXCEL_CELL_MAX_LENGTH, EXCEL_CELL_MAX_LENGTH)
+                response_store = ResponseStore(threshold=threshold)
+            text_positions = [RESULT_COLUMNS.index(column) for column in TEXT_COLUMNS]
+            tmp_files.append(_tmp_filename(xlsx_file))
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet(SHEET_NAME)
+            ws.append([XLSX_HEADERS[column] for column in RESULT_COLUMNS])
+
+        batch = []
+        for values in rows:
+            if ws is not None:
+                cells = list(values)
+                for position in text_positions:
+                    cells[position] = response_store.make_cell_value(cells[position])
+                ws.append(cells)
+            if parquet_writer is not None:
+                batch.append(values)
+                if len(batch) >= batch_size:
+                    parquet_writer.write_batch(rows_to_batch(batch, schema))
+                    batch = []
+            count += 1
+
+        if parquet_writer is not None:
+            if batch:
+                parquet_writer.write_batch(rows_to_batch(batch, schema))
+            parquet_writer.close()
+            parquet_writer = None
+            os.replace(_tmp_filename(parquet_file), parquet_file)
+
+        if wb is not None:
+            wb.save(_tmp_filename(xlsx_file))
+            os.replace(_tmp_filename(xlsx_file), xlsx_file)
+
+        return count
+
+    except Exception as e:
+        print(f"❌ Ошибка при выгрузке: {e}")
+        if parquet_writer is not None:
+            parquet_writer.close()
+        for tmp_file in tmp_files:
+            if os.path.exists(tmp_file):
+                try:
+                    os.remove(tmp_file)
+                except OSError:
+                    pass
+        return None
+
+
+def main():
+    """Командная строка выгрузки"""
+    parser = argparse.ArgumentParser(description="Выгрузка сохраненных результатов")
+    parser.add_argument('--source', choices=['json', 'excel'], default='json',
+                        help="Откуда читать: папка JSON результатов или книга Excel")
+    parser.add_argument('--dir', default=JSON_OUTPUT_DIR, help="Папка с JSON результатами")
+    parser.add_argument('--excel-file', default=EXCEL_FILE, help="Книга Excel для --source excel")
+    parser.add_argument('--parquet', help="Файл Parquet")
+    parser.add_argument('--xlsx', help="Файл Excel")
+    parser.add_argument('--workers', type=int, default=RESULT_LOADER_WORKERS,
+                        help="Количество процессов для чтения JSON")
+    args = parser.parse_args()
+
+    if not args.parquet and not args.xlsx:
+        parser.error("укажите --parquet и/или --xlsx")
+
+    if args.source == 'excel':
+        rows = iter_excel_results(args.excel_file)
+    else:
+        rows = iter_results(args.dir, workers=args.workers)
+
+    start = time.time()
+    count = export_results(rows, args.parquet, args.xlsx)
+    if count is None:
+        return
+
+    print(f"✅ Выгружено строк: {count} за {time.time() - start:.1f} сек")
+    for filename in (args.parquet, args.xlsx):
+        if filename:
+            print(f"📂 {os.path.abspath(filename)}")
+
+
+if __name__ == "__main__":
+    main()
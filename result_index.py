@@ -0,0 +1,280 @@
+"""
+Индекс сохраненных результатов (SQLite)
+Поиск по metadata без открытия JSON файлов: строка, проект, модель, статус, дата
+
+Использование:
+    python result_index.py --row 18342 --show
+    python result_index.py --model gpt-4o --project X --failed --since yesterday
+    python result_index.py --rebuild
+"""
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from config import *
+from jsonl_sink import iter_segment_entries
+from results_reader import iter_parquet_rows, load_stored_result, unflatten_result
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    row         INTEGER,
+    project     TEXT,
+    model       TEXT,
+    status      TEXT,
+    success     INTEGER,
+    attempts    INTEGER,
+    duration    REAL,
+    timestamp   TEXT,
+    error       TEXT,
+    path        TEXT,
+    offset      INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_results_row ON results(row);
+CREATE INDEX IF NOT EXISTS idx_results_model_project ON results(model, project, success);
+CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results(timestamp);
+"""
+
+COLUMNS = ("id", "row", "project", "model", "status", "success", "attempts",
+           "duration", "timestamp", "error", "path", "offset")
+
+
+class ResultIndex:
+    """
+    Индекс результатов по блоку metadata, который пишет JSONHandlerV2
+
+    Одна строка таблицы на каждое сохранение (повторы строки Excel
+    тоже сохраняются, последний - с наибольшим id).
+    path - относительно output_dir, offset - смещение в JSONL сегменте
+    или номер строки в архиве Parquet.
+    """
+
+    def __init__(self, output_dir=JSON_OUTPUT_DIR, filename="results.db"):
+        self.output_dir = output_dir
+        self.filename = os.path.join(output_dir, filename)
+        os.makedirs(output_dir, exist_ok=True)
+
+        # Индекс обновляется из потока фоновой записи
+        self.conn = sqlite3.connect(self.filename, timeout=30, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def add(self, data, path, offset=None):
+        """Добавляет сохраненный результат в индекс"""
+        metadata = data.get('metadata', {})
+        self.conn.execute(
+            "INSERT INTO results "
+            "(row, project, model, status, success, attempts, duration, timestamp, error, path, offset) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                metadata.get('row'),
+                metadata.get('project'),
+                metadata.get('model'),
+                data.get('status'),
+                1 if data.get('success') else 0,
+                metadata.get('attempts'),
+                metadata.get('duration_seconds'),
+                metadata.get('timestamp'),
+                data.get('error'),
+                os.path.relpath(path, self.output_dir),
+                offset
+            )
+        )
+
+    def query(self, row=None, project=None, model=None, status=None, success=None,
+              since=None, until=None, latest_only=False, limit=None):
+        """
+        Ищет результаты по условиям (None = без условия)
+
+        since/until: datetime или строка ISO
+        latest_only: только последнее сохранение для каждой строки
+        Возвращает: список словарей с колонками таблицы
+        """
+        conditions = []
+        params = []
+
+        for column, value in (('row', row), ('project', project), ('model', model), ('status', status)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+
+        if success is not None:
+            conditions.append("success = ?")
+            params.append(1 if success else 0)
+
+        if since is not None:
+            conditions.append("timestamp >= ?")
+            params.append(since.isoformat() if isinstance(since, datetime) else since)
+
+        if until is not None:
+            conditions.append("timestamp < ?")
+            params.append(until.isoformat() if isinstance(until, datetime) else until)
+
+        if latest_only:
+            conditions.append("id IN (SELECT MAX(id) FROM results GROUP BY row)")
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM results"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY row, id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+
+        return [dict(zip(COLUMNS, values)) for values in self.conn.execute(sql, params)]
+
+    def latest(self, row):
+        """Последнее сохранение для строки (None если нет)"""
+        values = self.conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM results WHERE row = ? ORDER BY id DESC LIMIT 1",
+            (row,)
+        ).fetchone()
+        return dict(zip(COLUMNS, values)) if values else None
+
+    def load(self, entry):
+        """Читает полный результат, на который ссылается запись индекса"""
+        return load_stored_result(os.path.join(self.output_dir, entry['path']), entry.get('offset'))
+
+    def relocate(self, moved, new_path):
+        """
+        Переносит ссылки индекса после сжатия в архив
+
+        moved: {(старый path, старый offset): номер строки в архиве}
+        """
+        new_path = os.path.relpath(new_path, self.output_dir)
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany(
+                "UPDATE results SET path = ?, offset = ? WHERE path = ? AND offset IS ?",
+                [(new_path, position, path, offset) for (path, offset), position in moved.items()]
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def rebuild(self):
+        """
+        Пересобирает индекс по содержимому output_dir
+        (архивы Parquet, JSON файлы и JSONL сегменты)
+
+        Возвращает: количество проиндексированных результатов
+        """
+        count = 0
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.execute("DELETE FROM results")
+
+            files = []
+            archives = []
+            for directory, _, filenames in os.walk(self.output_dir):
+                for filename in filenames:
+                    if filename.endswith('.json'):
+                        path = os.path.join(directory, filename)
+                        files.append((os.path.getmtime(path), path))
+                    elif filename.endswith('.parquet'):
+                        archives.append(os.path.join(directory, filename))
+
+            for path in sorted(archives):
+                for position, values in enumerate(iter_parquet_rows(path)):
+                    self.add(unflatten_result(values), path, position)
+                    count += 1
+
+            for _, path in sorted(files):
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        self.add(json.load(f), path)
+                    count += 1
+                except (OSError, ValueError):
+                    continue
+
+            for path, offset, data in iter_segment_entries(self.output_dir):
+                self.add(data, path, offset)
+                count += 1
+
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        return count
+
+    def close(self):
+        """Закрывает базу индекса"""
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+
+def parse_time(value):
+    """
+    Разбирает время для --since/--until
+
+    Форматы: 2026-01-29, "2026-01-29 17:05", today, yesterday, 12h, 7d
+    """
+    now = datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    if value == 'today':
+        return today
+    if value == 'yesterday':
+        return today - timedelta(days=1)
+    if value[-1:] in ('h', 'd') and value[:-1].isdigit():
+        amount = int(value[:-1])
+        return now - (timedelta(hours=amount) if value[-1] == 'h' else timedelta(days=amount))
+    return datetime.fromisoformat(value)
+
+
+def main():
+    """Командная строка для поиска по индексу"""
+    parser = argparse.ArgumentParser(description="Поиск по сохраненным результатам")
+    parser.add_argument('--dir', default=JSON_OUTPUT_DIR, help="Папка с результатами")
+    parser.add_argument('--row', type=int, help="Номер строки Excel")
+    parser.add_argument('--project', help="Проект")
+    parser.add_argument('--model', help="Модель")
+    parser.add_argument('--status', help="Статус")
+    parser.add_argument('--failed', action='store_true', help="Только неуспешные")
+    parser.add_argument('--succeeded', action='store_true', help="Только успешные")
+    parser.add_argument('--since', type=parse_time, help="Не раньше (today, yesterday, 12h, 7d, ISO)")
+    parser.add_argument('--until', type=parse_time, help="Раньше чем")
+    parser.add_argument('--all-attempts', action='store_true', help="Все сохранения, а не только последнее")
+    parser.add_argument('--limit', type=int, help="Максимум результатов")
+    parser.add_argument('--show', action='store_true', help="Показать запрос и ответ")
+    parser.add_argument('--rebuild', action='store_true', help="Пересобрать индекс по файлам")
+    args = parser.parse_args()
+
+    index = ResultIndex(args.dir)
+    try:
+        if args.rebuild:
+            count = index.rebuild()
+            print(f"✅ Индекс пересобран: {count} результатов")
+            return
+
+        success = True if args.succeeded else (False if args.failed else None)
+        entries = index.query(
+            row=args.row, project=args.project, model=args.model, status=args.status,
+            success=success, since=args.since, until=args.until,
+            latest_only=not args.all_attempts, limit=args.limit
+        )
+
+        for entry in entries:
+            mark = "✅" if entry['success'] else "❌"
+            print(f"{mark} [ROW {entry['row']}] {entry['status']} | {entry['project'] or '-'} | "
+                  f"{entry['model'] or '-'} | попыток: {entry['attempts']} | "
+                  f"{entry['duration']} сек | {entry['timestamp']} | {entry['path']}")
+            if entry['error']:
+                print(f"   ⚠️  {entry['error']}")
+            if args.show:
+                data = index.load(entry)
+                print(f"   ❓ {data.get('request')}")
+                print(f"   💬 {data.get('response')}")
+
+        print(f"\n📊 Найдено: {len(entries)}")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
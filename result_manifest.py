@@ -0,0 +1,127 @@
+"""
+Манифест результатов: строка Excel → файл с результатом
+Append-only журнал, в памяти - словарь для поиска за O(1) без обхода папки
+"""
+import json
+import os
+from datetime import datetime
+from config import *
+from results_reader import load_stored_result
+
+
+class ResultManifest:
+    """
+    Манифест сохраненных результатов
+
+    Файл: {output_dir}/manifest.jsonl, одна строка на сохранение:
+    {"row", "key", "path", "offset", "status", "ts"}
+    path - относительно output_dir, offset - смещение строки в JSONL сегменте
+    или номер строки в архиве Parquet (None для отдельного JSON файла).
+    Последняя запись по строке главнее.
+    """
+
+    def __init__(self, output_dir=JSON_OUTPUT_DIR, filename="manifest.jsonl"):
+        self.output_dir = output_dir
+        self.filename = os.path.join(output_dir, filename)
+        self.entries = {}
+        self._file = None
+        self.load()
+
+    def load(self):
+        """Читает манифест в память (оборванная последняя строка пропускается)"""
+        self.entries = {}
+        if not os.path.exists(self.filename):
+            return
+
+        with open(self.filename, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                self.entries[entry['row']] = entry
+
+    def add(self, row, key, path, status, offset=None, sync=True):
+        """
+        Дописывает запись о сохраненном результате
+
+        sync=False - без fsync (для JSONL сегментов, которые сами
+        сбрасываются пачками: манифест синхронизируется вместе с ними)
+        """
+        entry = {
+            'row': row,
+            'key': key,
+            'path': os.path.relpath(path, self.output_dir),
+            'offset': offset,
+            'status': status,
+            'ts': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+        if self._file is None:
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._file = open(self.filename, 'ab')
+
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        self._file.write(line.encode('utf-8'))
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+        self.entries[row] = entry
+        return entry
+
+    def rewrite(self):
+        """
+        Перезаписывает манифест текущим состоянием (по одной записи на строку)
+
+        Файл заменяется атомарно (tmp → replace).
+        """
+        self.close()
+        tmp_filename = f"{self.filename}.tmp"
+        with open(tmp_filename, 'wb') as f:
+            for entry in self.entries.values():
+                f.write((json.dumps(entry, ensure_ascii=False) + "\n").encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, self.filename)
+
+    def sync(self):
+        """Сбрасывает манифест на диск"""
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def has_result(self, row):
+        """Есть ли сохраненный результат для строки"""
+        return row in self.entries
+
+    def find_result(self, row):
+        """Путь к файлу с результатом строки (None если результата нет)"""
+        entry = self.entries.get(row)
+        if entry is None:
+            return None
+        return os.path.join(self.output_dir, entry['path'])
+
+    def load_result(self, row):
+        """Читает сохраненный результат строки (None если результата нет)"""
+        entry = self.entries.get(row)
+        if entry is None:
+            return None
+
+        path = os.path.join(self.output_dir, entry['path'])
+        if entry.get('offset') is not None:
+            try:
+                return load_stored_result(path, entry['offset'])
+            except (OSError, EOFError, ValueError):
+                # Запись сегмента не успела попасть на диск до сбоя
+                return None
+
+        return load_stored_result(path)
+
+    def close(self):
+        """Закрывает файл манифеста"""
+        if self._file:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,233 @@
+"""
+Версии результатов по строкам
+Каждый прогон строки (после ошибки, после правки запроса) добавляет версию.
+Версия - короткая строка со ссылкой на уже сохраненный результат
+(JSON файл, JSONL сегмент или архив Parquet) и sha256 текстов запроса
+и ответа. Длинный ответ лежит один раз в ResponseStore под своим sha256
+(туда его кладет JSONHandlerV2), поэтому одинаковые ответы разных версий
+не дублируются.
+
+Использование:
+    python result_versions.py --row 18342
+    python result_versions.py --row 18342 --diff 1 3
+"""
+import argparse
+import difflib
+import hashlib
+import json
+import os
+from datetime import datetime
+from config import *
+from response_store import ResponseStore
+from results_reader import load_stored_result
+
+
+def text_digest(text):
+    """sha256 текста (None для пустого) - чтобы сравнивать версии без чтения"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest() if text else None
+
+
+class ResultVersionStore:
+    """
+    Хранилище версий результатов
+
+    Файл: {base_dir}/versions.jsonl (append-only), одна строка на версию:
+    {"row", "version", "status", "path", "offset", "request_sha", "response_sha",
+     "error", "project", "model", "attempts", "duration", "ts"}
+    path - путь к сохраненному результату относительно base_dir (папки
+    результатов), offset - как в манифесте. При сжатии в архив ссылки
+    переводятся через relocate() (как манифест и индекс).
+    В памяти: {row: [версии по порядку]} - последняя версия за O(1).
+    """
+
+    def __init__(self, base_dir=JSON_OUTPUT_DIR):
+        """base_dir: папка результатов JSONHandlerV2"""
+        self.base_dir = base_dir
+        self.filename = os.path.join(base_dir, "versions.jsonl")
+        self.response_store = ResponseStore()
+        self.versions = {}
+        self._file = None
+        self.load()
+
+    def load(self):
+        """Читает версии в память (оборванная последняя строка пропускается)"""
+        self.versions = {}
+        if not os.path.exists(self.filename):
+            return
+
+        with open(self.filename, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    version = json.loads(line)
+                except ValueError:
+                    continue
+                self.versions.setdefault(version['row'], []).append(version)
+
+    def record(self, row, path, offset, request, response, status, error_message=None,
+               project=None, model=None, attempts=1, duration=0, sync=True):
+        """
+        Добавляет новую версию результата строки
+
+        path, offset: где сохранен результат (вызывать после успешной записи)
+        sync=False - без fsync (для JSONL сегментов, как в манифесте)
+        """
+        history = self.versions.setdefault(row, [])
+        version = {
+            'row': row,
+            'version': len(history) + 1,
+            'status': status,
+            'path': os.path.relpath(path, self.base_dir),
+            'offset': offset,
+            'request_sha': text_digest(request),
+            'response_sha': text_digest(response),
+            'error': error_message,
+            'project': project,
+            'model': model,
+            'attempts': attempts,
+            'duration': round(duration, 2),
+            'ts': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+        if self._file is None:
+            os.makedirs(self.base_dir, exist_ok=True)
+            self._file = open(self.filename, 'ab')
+
+        line = json.dumps(version, ensure_ascii=False) + "\n"
+        self._file.write(line.encode('utf-8'))
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+        history.append(version)
+        return version
+
+    def sync(self):
+        """Сбрасывает файл версий на диск"""
+        if self._file:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def relocate(self, moved, archive_path):
+        """
+        Переводит версии на архив после сжатия
+
+        moved: {(относительный путь, offset): номер строки в архиве}
+        """
+        archive_relpath = os.path.relpath(archive_path, self.base_dir)
+        changed = False
+
+        for history in self.versions.values():
+            for version in history:
+                position = moved.get((version.get('path'), version.get('offset')))
+                if position is not None:
+                    version['path'] = archive_relpath
+                    version['offset'] = position
+                    changed = True
+
+        if changed:
+            self.rewrite()
+
+    def rewrite(self):
+        """Перезаписывает файл версий текущим состоянием (атомарно: tmp → replace)"""
+        self.close()
+        tmp_filename = f"{self.filename}.tmp"
+        with open(tmp_filename, 'wb') as f:
+            for history in self.versions.values():
+                for version in history:
+                    f.write((json.dumps(version, ensure_ascii=False) + "\n").encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, self.filename)
+
+    def latest(self, row):
+        """Последняя версия строки (None если версий нет)"""
+        history = self.versions.get(row)
+        return history[-1] if history else None
+
+    def history(self, row):
+        """Все версии строки по порядку"""
+        return list(self.versions.get(row, []))
+
+    def get_version(self, row, number):
+        """Версия строки по номеру (с 1), None если такой нет"""
+        history = self.versions.get(row, [])
+        return history[number - 1] if 0 < number <= len(history) else None
+
+    def _load_record(self, version):
+        """Сохраненный результат версии (None если файл уже удален)"""
+        try:
+            return load_stored_result(os.path.join(self.base_dir, version['path']), version.get('offset'))
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"⚠️  Не удалось прочитать версию {version['version']} строки {version['row']}: {e}")
+            return None
+
+    def get_request(self, version):
+        """Текст запроса версии"""
+        record = self._load_record(version)
+        return record.get('request') if record else None
+
+    def get_response(self, version):
+        """Текст ответа версии (длинный - из ResponseStore по sha256, без чтения результата)"""
+        digest = version.get('response_sha')
+        text = self.response_store.get(digest) if digest else None
+        if text is not None:
+            return text
+        record = self._load_record(version)
+        return record.get('response') if record else None
+
+    def compare(self, row, first, second):
+        """Построчная разница ответов двух версий строки (unified diff)"""
+        a = self.get_version(row, first)
+        b = self.get_version(row, second)
+        if a is None or b is None:
+            return []
+
+        return list(difflib.unified_diff(
+            (self.get_response(a) or "").splitlines(),
+            (self.get_response(b) or "").splitlines(),
+            fromfile=f"row {row} v{first}",
+            tofile=f"row {row} v{second}",
+            lineterm=""
+        ))
+
+    def close(self):
+        """Закрывает файл версий"""
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def main():
+    """Командная строка просмотра версий"""
+    parser = argparse.ArgumentParser(description="История результатов строки")
+    parser.add_argument('--dir', default=JSON_OUTPUT_DIR, help="Папка с результатами")
+    parser.add_argument('--row', type=int, required=True, help="Номер строки Excel")
+    parser.add_argument('--diff', type=int, nargs=2, metavar=('A', 'B'), help="Сравнить ответы версий")
+    args = parser.parse_args()
+
+    store = ResultVersionStore(args.dir)
+
+    if args.diff:
+        diff = store.compare(args.row, *args.diff)
+        print("\n".join(diff) if diff else "Ответы совпадают (или версии не найдены)")
+        return
+
+    history = store.history(args.row)
+    previous = None
+    for version in history:
+        same = ""
+        if previous and version['response_sha'] == previous['response_sha']:
+            same = " (ответ не изменился)"
+        previous = version
+        print(f"v{version['version']} | {version['ts']} | {version['status']} | "
+              f"{version['model'] or '-'} | попыток: {version['attempts']}{same}")
+        if version['error']:
+            print(f"   ⚠️  {version['error']}")
+
+    print(f"\n📊 Версий: {len(history)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Чтение сохраненных результатов (JSON файлы, JSONL сегменты, Excel)
+Общий слой для выгрузки и анализа: записи приводятся к плоским строкам
+с колонками RESULT_COLUMNS, файлы разбираются параллельно в нескольких процессах.
+Также читаются архивы Parquet, собранные result_compactor.py
+Ссылки на тексты ответов ([sidecar:<sha256>]) раскрываются при чтении.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from openpyxl import load_workbook
+from config import *
+from compression import iter_lines
+from jsonl_sink import list_segments, read_record_at
+from response_store import ResponseStore
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+RESULT_COLUMNS = (
+    'row', 'timestamp', 'project', 'model', 'status', 'success', 'attempts',
+    'duration', 'error', 'request', 'response', 'request_length', 'response_length'
+)
+
+
+def parse_json(data):
+    """Разбирает JSON (orjson если установлен)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def flatten_result(record):
+    """Запись JSONHandlerV2 → кортеж значений в порядке RESULT_COLUMNS"""
+    metadata = record.get('metadata') or {}
+    stats = record.get('stats') or {}
+    return (
+        metadata.get('row'),
+        metadata.get('timestamp'),
+        metadata.get('project'),
+        metadata.get('model'),
+        record.get('status'),
+        bool(record.get('success')),
+        metadata.get('attempts'),
+        metadata.get('duration_seconds'),
+        record.get('error'),
+        record.get('request'),
+        record.get('response'),
+        stats.get('request_length'),
+        stats.get('response_length')
+    )
+
+
+def unflatten_result(values):
+    """Кортеж в порядке RESULT_COLUMNS → запись в формате JSONHandlerV2"""
+    result = dict(zip(RESULT_COLUMNS, values))
+    return {
+        "metadata": {
+            "row": result['row'],
+            "timestamp": result['timestamp'],
+            "project": result['project'],
+            "model": result['model'],
+            "attempts": result['attempts'],
+            "duration_seconds": result['duration']
+        },
+        "request": result['request'],
+        "response": result['response'],
+        "status": result['status'],
+        "success": result['success'],
+        "error": result['error'],
+        "stats": {
+            "request_length": result['request_length'],
+            "response_length": result['response_length']
+        }
+    }
+
+
+def list_result_sources(output_dir=JSON_OUTPUT_DIR):
+    """Все файлы с результатами: архивы Parquet, отдельные JSON и JSONL сегменты"""
+    archives = []
+    files = []
+    for directory, _, filenames in os.walk(output_dir):
+        for filename in filenames:
+            if filename.endswith('.json'):
+                files.append(os.path.join(directory, filename))
+            elif filename.endswith('.parquet'):
+                archives.append(os.path.join(directory, filename))
+    return sorted(archives) + sorted(files) + list_segments(output_dir)
+
+
+def iter_parquet_rows(path):
+    """Перебирает строки архива Parquet (кортежи в порядке RESULT_COLUMNS)"""
+    if pyarrow is None:
+        raise RuntimeError("Для чтения Parquet нужен пакет pyarrow")
+
+    parquet_file = pyarrow.parquet.ParquetFile(path)
+    for batch in parquet_file.iter_batches(columns=list(RESULT_COLUMNS)):
+        columns = [batch.column(i).to_pylist() for i in range(batch.num_columns)]
+        yield from zip(*columns)
+
+
+def load_stored_result(path, offset=None):
+    """
+    Читает один сохраненный результат (ответ - полным текстом)
+
+    path: JSON файл, JSONL сегмент (offset - смещение строки)
+    или архив Parquet (offset - номер строки в архиве)
+    """
+    record = read_stored_record(path, offset)
+    if record is not None:
+        record['response'] = ResponseStore().resolve(record.get('response'))
+    return record
+
+
+def read_stored_record(path, offset=None):
+    """Один сохраненный результат как есть (ответ может быть ссылкой)"""
+    if path.endswith('.json'):
+        with open(path, 'rb') as f:
+            return parse_json(f.read())
+
+    if path.endswith('.parquet'):
+        if pyarrow is None:
+            raise RuntimeError("Для чтения Parquet нужен пакет pyarrow")
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+        for group in range(parquet_file.num_row_groups):
+            group_rows = parquet_file.metadata.row_group(group).num_rows
+            if offset < group_rows:
+                table = parquet_file.read_row_group(group, columns=list(RESULT_COLUMNS))
+                row = table.slice(offset, 1).to_pylist()[0]
+                return unflatten_result([row[column] for column in RESULT_COLUMNS])
+            offset -= group_rows
+        return None
+
+    return read_record_at(path, offset)
+
+
+def load_source(path, columns=None):
+    """
+    Читает один файл результатов
+
+    Вызывается в процессах-обработчиках, поэтому возвращает
+    уже плоские кортежи (их дешевле передавать между процессами).
+    columns: оставить только эти колонки (например, без текстов запроса и ответа)
+    """
+    rows = load_source_rows(path)
+    if not columns or 'response' in columns:
+        rows = resolve_rows(rows)
+    if columns:
+        positions = [RESULT_COLUMNS.index(column) for column in columns]
+        rows = [tuple(values[i] for i in positions) for values in rows]
+    return rows
+
+
+def resolve_rows(rows):
+    """Раскрывает ссылки на тексты ответов в плоских строках"""
+    response_store = ResponseStore()
+    position = RESULT_COLUMNS.index('response')
+    resolved = []
+    for values in rows:
+        response = values[position]
+        if response:
+            values = values[:position] + (response_store.resolve(response),) + values[position + 1:]
+        resolved.append(values)
+    return resolved
+
+
+def load_source_rows(path):
+    """Читает один файл результатов: все колонки RESULT_COLUMNS"""
+    rows = []
+    try:
+        if path.endswith('.json'):
+            with open(path, 'rb') as f:
+                rows.append(flatten_result(parse_json(f.read())))
+        elif path.endswith('.parquet'):
+            rows.extend(iter_parquet_rows(path))
+        else:
+            for line in iter_lines(path):
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    rows.append(flatten_result(parse_json(line)))
+                except ValueError:
+                    continue
+    except (OSError, ValueError) as e:
+        print(f"⚠️  Не удалось прочитать {path}: {e}")
+    return rows
+
+
+def iter_results(output_dir=JSON_OUTPUT_DIR, workers=RESULT_LOADER_WORKERS, window=None, columns=None):
+    """
+    Перебирает все результаты из output_dir (генератор плоских кортежей)
+
+    Файлы разбираются в workers процессах. Одновременно в работе не больше
+    window файлов, поэтому память не растет с размером папки.
+    columns: какие колонки вернуть (по умолчанию все RESULT_COLUMNS)
+    """
+    paths = list_result_sources(output_dir)
+    workers = workers or os.cpu_count() or 1
+    load = partial(load_source, columns=columns)
+
+    if workers <= 1 or len(paths) < 2:
+        for path in paths:
+            yield from load(path)
+        return
+
+    window = window or workers * 64
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for start in range(0, len(paths), window):
+            chunk = paths[start:start + window]
+            chunksize = max(1, len(chunk) // (workers * 4))
+            for rows in executor.map(load, chunk, chunksize=chunksize):
+                yield from rows
+
+
+def iter_excel_results(filename=EXCEL_FILE):
+    """Перебирает строки Excel с результатами (потоково, read_only)"""
+    response_store = ResponseStore()
+    wb = load_workbook(filename, read_only=True)
+
+    def value(values, col):
+        return values[col - 1] if len(values) >= col else None
+
+    try:
+        ws = wb[SHEET_NAME] if SHEET_NAME in wb.sheetnames else wb.active
+        for row, values in enumerate(ws.iter_rows(min_row=2, values_only=True), 2):
+            request = value(values, COL_REQUEST)
+            if request is None:
+                continue
+
+            request = str(request)
+            response = response_store.resolve(value(values, COL_RESPONSE))
+            status = value(values, COL_STATUS)
+            date = value(values, COL_DATE)
+
+            yield (
+                row,
+                str(date) if date is not None else None,
+                value(values, COL_PROJECT),
+                value(values, COL_MODEL),
+                status,
+                status == STATUS_SUCCESS,
+                None,
+                None,
+                value(values, COL_ERROR),
+                request,
+                response,
+                len(request),
+                len(response) if response else 0
+            )
+    finally:
+        wb.close()
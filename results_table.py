@@ -0,0 +1,212 @@
+"""
+Колоночная таблица всех сохраненных результатов и метрики по всей истории
+
+Использование:
+    python results_table.py
+    python results_table.py --workers 8 --by model --since 7d
+
+Файлы читаются параллельно (results_reader), тексты запросов и ответов
+не загружаются. Метрики считаются векторно (NumPy) - как в Statistics,
+но по всем прогонам, а не только по текущему.
+"""
+import argparse
+import time
+from array import array
+from datetime import datetime
+from config import *
+from results_reader import iter_results
+from result_index import parse_time
+from statistics import Statistics
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TABLE_COLUMNS = ('row', 'timestamp', 'project', 'model', 'status', 'success', 'attempts', 'duration')
+
+# Колонки с небольшим числом разных значений: коды + словарь значений
+CATEGORY_COLUMNS = ('project', 'model', 'status')
+
+
+class ResultsTable:
+    """
+    Результаты в виде колонок NumPy
+
+    row, attempts - int, duration, timestamp (unix время) - float (nan если нет),
+    success - bool, project/model/status - коды (uint32) + self.categories[колонка]
+    """
+
+    def __init__(self, columns, categories):
+        self.columns = columns
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.columns['row'])
+
+    def select(self, mask):
+        """Подмножество строк по булевой маске"""
+        return ResultsTable({name: values[mask] for name, values in self.columns.items()},
+                            self.categories)
+
+    def since(self, moment):
+        """Только результаты не раньше moment (datetime)"""
+        return self.select(self.columns['timestamp'] >= moment.timestamp())
+
+    def get_success_rate(self):
+        """Процент успешных результатов"""
+        if not len(self):
+            return 0
+        return float(self.columns['success'].mean() * 100)
+
+    def get_duration_percentiles(self, percentiles=(50, 90, 95, 99)):
+        """Перцентили длительности (сек) по результатам, где она известна"""
+        durations = self.columns['duration']
+        durations = durations[~numpy.isnan(durations)]
+        if not len(durations):
+            return {p: 0 for p in percentiles}
+        values = numpy.percentile(durations, percentiles)
+        return dict(zip(percentiles, (float(v) for v in values)))
+
+    def get_average_attempts(self):
+        """Среднее количество попыток"""
+        attempts = self.columns['attempts']
+        return float(attempts.mean()) if len(attempts) else 0
+
+    def get_attempts_distribution(self):
+        """{попыток: количество результатов}"""
+        counts = numpy.bincount(self.columns['attempts'])
+        return {attempts: int(count) for attempts, count in enumerate(counts) if count}
+
+    def get_error_breakdown(self):
+        """Разбивка неуспешных результатов по статусу"""
+        return self._count_by('status', ~self.columns['success'])
+
+    def _count_by(self, column, mask=None):
+        """{значение: количество} по колонке-категории"""
+        codes = self.columns[column] if mask is None else self.columns[column][mask]
+        counts = numpy.bincount(codes, minlength=len(self.categories[column]))
+        names = self.categories[column]
+        return {names[code]: int(count) for code, count in enumerate(counts) if count}
+
+    def group_by(self, column):
+        """Метрики по группам колонки-категории: {значение: ResultsTable}"""
+        codes = self.columns[column]
+        return {name: self.select(codes == code)
+                for code, name in enumerate(self.categories[column])
+                if numpy.any(codes == code)}
+
+
+def _parse_timestamp(value):
+    """ISO время → unix время (nan если нет)"""
+    if not value:
+        return float('nan')
+    try:
+        return datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        return float('nan')
+
+
+def load_results_table(output_dir=JSON_OUTPUT_DIR, workers=RESULT_LOADER_WORKERS):
+    """
+    Загружает все результаты из output_dir в ResultsTable
+
+    Строки копятся в компактных array (как StatusIndex), в NumPy
+    переводятся одним копированием в конце.
+    """
+    if numpy is None:
+        raise RuntimeError("Для таблицы результатов нужен пакет numpy")
+
+    rows = array('q')
+    timestamps = array('d')
+    success = bytearray()
+    attempts = array('l')
+    durations = array('d')
+    codes = {column: array('I') for column in CATEGORY_COLUMNS}
+    lookups = {column: {} for column in CATEGORY_COLUMNS}
+    categories = {column: [] for column in CATEGORY_COLUMNS}
+
+    def intern(column, value):
+        lookup = lookups[column]
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(categories[column])
+            categories[column].append(value)
+        return code
+
+    for row, timestamp, project, model, status, ok, tries, duration in iter_results(
+            output_dir, workers=workers, columns=TABLE_COLUMNS):
+        rows.append(row if row is not None else -1)
+        timestamps.append(_parse_timestamp(timestamp))
+        success.append(1 if ok else 0)
+        attempts.append(tries or 0)
+        durations.append(duration if duration is not None else float('nan'))
+        codes['project'].append(intern('project', project))
+        codes['model'].append(intern('model', model))
+        codes['status'].append(intern('status', status))
+
+    columns = {
+        'row': numpy.array(rows, dtype=numpy.int64),
+        'timestamp': numpy.array(timestamps, dtype=numpy.float64),
+        'success': numpy.frombuffer(bytes(success), dtype=numpy.uint8).astype(bool),
+        'attempts': numpy.array(attempts, dtype=numpy.int64),
+        'duration': numpy.array(durations, dtype=numpy.float64)
+    }
+    for column in CATEGORY_COLUMNS:
+        columns[column] = numpy.array(codes[column], dtype=numpy.uint32)
+
+    return ResultsTable(columns, categories)
+
+
+def print_table_summary(table, title="ВСЯ ИСТОРИЯ"):
+    """Выводит метрики таблицы в стиле Statistics.print_summary"""
+    format_duration = Statistics().format_duration
+    percentiles = table.get_duration_percentiles()
+
+    print(f"\n📊 {title}")
+    print(f"   • Результатов: {len(table)}")
+    print(f"   • Успешно: {int(table.columns['success'].sum())} ({table.get_success_rate():.1f}%)")
+    print(f"   • Попыток на запрос: {table.get_average_attempts():.2f}")
+    print(f"   • Время на запрос: " + ", ".join(
+        f"p{p} {format_duration(value)}" for p, value in percentiles.items()))
+
+    error_breakdown = table.get_error_breakdown()
+    if error_breakdown:
+        print(f"   ⚠️  Ошибки:")
+        for status, count in sorted(error_breakdown.items(), key=lambda x: x[1], reverse=True):
+            print(f"      • {status}: {count}")
+
+
+def main():
+    """Командная строка: метрики по всем сохраненным результатам"""
+    parser = argparse.ArgumentParser(description="Метрики по всем сохраненным результатам")
+    parser.add_argument('--dir', default=JSON_OUTPUT_DIR, help="Папка с результатами")
+    parser.add_argument('--workers', type=int, default=RESULT_LOADER_WORKERS,
+                        help="Количество процессов для чтения")
+    parser.add_argument('--since', type=parse_time, help="Не раньше (today, yesterday, 12h, 7d, ISO)")
+    parser.add_argument('--by', choices=CATEGORY_COLUMNS, help="Разбить метрики по колонке")
+    args = parser.parse_args()
+
+    if numpy is None:
+        print("❌ Для таблицы результатов нужен пакет numpy (pip install numpy)")
+        return
+
+    start = time.time()
+    table = load_results_table(args.dir, workers=args.workers)
+    print(f"✅ Загружено результатов: {len(table)} за {time.time() - start:.1f} сек")
+
+    if args.since:
+        table = table.since(args.since)
+
+    print("=" * 70)
+    print_table_summary(table)
+
+    if args.by:
+        for name, group in table.group_by(args.by).items():
+            print_table_summary(group, f"{args.by}: {name or '-'}")
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Раздельная работа с Excel: входной файл только читается,
+результаты пишутся в отдельную книгу
+"""
+from openpyxl import load_workbook, Workbook
+import os
+from config import *
+from excel_handler import ExcelHandler
+from status_journal import StatusJournal
+
+class SplitExcelHandler(ExcelHandler):
+    """
+    Класс для работы с Excel в раздельном режиме
+
+    - requests.xlsx открывается только в режиме read_only и читается построчно
+    - Результаты копятся в журнале статусов (append-only, fsync на запись)
+    - Итоговая книга собирается в режиме write_only при завершении
+
+    В памяти во время работы - только индекс статусов и смещения ответов в журнале,
+    тексты ответов и вся книга целиком не загружаются.
+    """
+
+    def __init__(self, filename=EXCEL_FILE, output_file=EXCEL_OUTPUT_FILE):
+        super().__init__(filename, write_behind=False, journal=False, save_engine='openpyxl')
+        self.output_file = output_file
+        self.results_file = output_file
+        self.journal = StatusJournal(f"{output_file}.journal")
+        self.results = {}
+        self._headers = ()
+
+    def is_loaded(self):
+        """Прочитан ли входной файл"""
+        return self.index is not None
+
+    def load(self):
+        """Читает входной файл и журнал результатов"""
+        if not os.path.exists(self.filename):
+            print(f"❌ Файл {self.filename} не найден!")
+            return False
+
+        try:
+            self._headers = self._read_headers()
+            self.results = self.journal.load_results()
+            self._build_index()
+
+            # Статусы из журнала важнее статусов во входном файле
+            for row, result in self.results.items():
+                self.index.set_status(row, result['status'])
+        except Exception as e:
+            print(f"❌ Ошибка при загрузке Excel: {e}")
+            return False
+
+        if self.results:
+            print(f"♻️  Результатов в журнале: {len(self.results)} строк")
+
+        self.journal.open()
+        return True
+
+    def _read_headers(self):
+        """Читает строку заголовков входного файла"""
+        wb = load_workbook(self.filename, read_only=True)
+        try:
+            ws = wb[SHEET_NAME] if SHEET_NAME in wb.sheetnames else wb.active
+            for values in ws.iter_rows(min_row=1, max_row=1, values_only=True):
+                return values
+            return ()
+        finally:
+            wb.close()
+
+    def _get_header(self, col):
+        """Возвращает заголовок колонки"""
+        return self._headers[col - 1] if len(self._headers) >= col else None
+
+    def iter_pending_requests(self):
+        """Лениво перебирает невыполненные запросы (генератор)"""
+        for row, values in self._iter_rows():
+            if not self.index.is_pending(row):
+                continue
+
+            chat_mode = self._get_value(values, COL_CHAT_MODE)
+            yield {
+                'row': row,
+                'request': str(self._get_value(values, COL_REQUEST)),
+                'project': self._get_value(values, COL_PROJECT),
+                'model': self._get_value(values, COL_MODEL),
+                'chat_mode': chat_mode if chat_mode else CHAT_MODE_NEW
+            }
+
+    def update_status(self, row, status, response="", error_message=""):
+        """Записывает изменение статуса в журнал результатов"""
+        response = self.response_store.make_cell_value(response)
+        record = self.journal.append(row, status, response, error_message)
+        self.journal.merge_record(self.results, record)
+        self.index.set_status(row, status)
+
+    def flush(self):
+        """Журнал пишется на диск сразу - сохранять нечего"""
+        return True
+
+    def export(self):
+        """
+        Собирает итоговую книгу: входные строки + результаты из журнала
+
+        Обе книги обрабатываются потоково (read_only → write_only),
+        в памяти одновременно находится одна строка.
+        """
+        name, ext = os.path.splitext(self.output_file)
+        tmp_filename = f"{name}.tmp{ext}"
+
+        try:
+            in_wb = load_workbook(self.filename, read_only=True)
+            out_wb = Workbook(write_only=True)
+            try:
+                in_ws = in_wb[SHEET_NAME] if SHEET_NAME in in_wb.sheetnames else in_wb.active
+                out_ws = out_wb.create_sheet(SHEET_NAME)
+
+                for row, values in enumerate(in_ws.iter_rows(values_only=True), 1):
+                    result = self.results.get(row)
+                    if result:
+                        values = self._apply_result(values, result)
+                    out_ws.append(values)
+
+                out_wb.save(tmp_filename)
+            finally:
+                in_wb.close()
+
+            os.replace(tmp_filename, self.output_file)
+            return True
+
+        except Exception as e:
+            print(f"❌ Ошибка при сохранении Excel: {e}")
+            if os.path.exists(tmp_filename):
+                try:
+                    os.remove(tmp_filename)
+                except OSError:
+                    pass
+            return False
+
+    def _apply_result(self, values, result):
+        """Подставляет результат из журнала в значения строки"""
+        values = list(values)
+        if len(values) < COL_CHAT_MODE:
+            values.extend([None] * (COL_CHAT_MODE - len(values)))
+
+        values[COL_STATUS - 1] = result['status']
+
+        if result.get('offset') is not None:
+            values[COL_RESPONSE - 1] = self.journal.read_response(result)
+
+        if result.get('error'):
+            values[COL_ERROR - 1] = result['error']
+
+        if result.get('date'):
+            values[COL_DATE - 1] = result['date']
+
+        return values
+
+    def close(self):
+        """Собирает итоговую книгу и закрывает журнал"""
+        if not self.is_loaded():
+            return True
+
+        result = self.export()
+        if result:
+            print(f"💾 Результаты сохранены: {self.output_file}")
+        self.journal.close()
+        return result
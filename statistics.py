@@ -12,6 +12,10 @@ class Statistics:
         self.start_time = None
         self.end_time = None
         self.requests_data = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.stream_data = []  # Время до первого токена и скорость по ответам
+        self.persistence = None  # BackgroundWriter, если запись идет в фоне
         
     def start(self):
         """Начинает отсчет времени"""
@@ -32,6 +36,50 @@ class Statistics:
             'timestamp': datetime.now()
         })
     
+    def add_stream_metrics(self, model, ttft, tokens_per_sec=None):
+        """
+        Добавляет метрики потокового вывода ответа (ResponseStream.get_metrics)
+        
+        ttft: секунд до первого токена
+        tokens_per_sec: приблизительная скорость генерации (None если неизвестна)
+        """
+        self.stream_data.append({
+            'model': model or "default",
+            'ttft': ttft,
+            'tokens_per_sec': tokens_per_sec
+        })
+    
+    def get_stream_metrics_by_model(self):
+        """{модель: {'count', 'ttft', 'tokens_per_sec'}} - средние по ответам"""
+        by_model = {}
+        for item in self.stream_data:
+            by_model.setdefault(item['model'], []).append(item)
+        
+        result = {}
+        for model, items in by_model.items():
+            speeds = [i['tokens_per_sec'] for i in items if i['tokens_per_sec']]
+            result[model] = {
+                'count': len(items),
+                'ttft': sum(i['ttft'] for i in items) / len(items),
+                'tokens_per_sec': sum(speeds) / len(speeds) if speeds else 0
+            }
+        return result
+    
+    def add_cache_hit(self, count=1):
+        """Учитывает ответ, взятый из кэша (или размноженный на дубликаты запроса)"""
+        self.cache_hits += count
+    
+    def add_cache_miss(self):
+        """Учитывает запрос, которого не было в кэше"""
+        self.cache_misses += 1
+    
+    def get_cache_hit_rate(self):
+        """Возвращает процент попаданий в кэш"""
+        total = self.cache_hits + self.cache_misses
+        if total == 0:
+            return 0
+        return (self.cache_hits / total) * 100
+    
     def get_total_duration(self):
         """Возвращает общее время работы"""
         if self.start_time and self.end_time:
@@ -127,6 +175,29 @@ class Statistics:
         print(f"   • Попыток на запрос: {self.get_average_attempts():.1f}")
         print(f"   • Запросов в минуту: {self.get_requests_per_minute():.1f}")
         
+        # Кэш ответов
+        if self.cache_hits or self.cache_misses:
+            print(f"\n💾 Кэш ответов:")
+            print(f"   • Попаданий: {self.cache_hits} ({self.get_cache_hit_rate():.1f}%)")
+            print(f"   • Промахов: {self.cache_misses}")
+        
+        # Потоковый вывод по моделям
+        if self.stream_data:
+            print(f"\n📶 Потоковый вывод:")
+            for model, metrics in sorted(self.get_stream_metrics_by_model().items()):
+                print(f"   • {model}: первый токен {metrics['ttft']:.1f} сек, "
+                      f"~{metrics['tokens_per_sec']:.0f} ток/с (ответов: {metrics['count']})")
+        
+        # Фоновая запись
+        if self.persistence:
+            metrics = self.persistence.get_metrics()
+            print(f"\n💾 Фоновая запись:")
+            print(f"   • Записано: {metrics['completed']} (ошибок: {metrics['failed']})")
+            print(f"   • Задержка записи: средняя {metrics['avg_latency']:.2f} сек, "
+                  f"p95 {metrics['p95_latency']:.2f} сек, макс {metrics['max_latency']:.2f} сек")
+            print(f"   • Очередь: макс {metrics['max_depth']}/{metrics['queue_size']}, "
+                  f"ожидание при заполнении {metrics['blocked_time']:.1f} сек")
+        
         # Разбивка ошибок
         error_breakdown = self.get_error_breakdown()
         if error_breakdown:
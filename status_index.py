@@ -0,0 +1,126 @@
+"""
+Компактный индекс статусов строк Excel
+Строится один раз при загрузке и обновляется вместе со статусами,
+чтобы не перечитывать весь лист ради списка запросов и статистики
+"""
+from array import array
+from config import *
+
+class StatusIndex:
+    """
+    Индекс строка → (статус, проект, модель, режим чата)
+
+    Значения хранятся в массивах array по одному элементу на строку,
+    строки (статусы, проекты, модели) - кодами из общей таблицы значений.
+    Для миллиона строк это единицы мегабайт.
+    """
+
+    def __init__(self, first_row=2):
+        self.first_row = first_row
+
+        # Таблица значений: код → строка (код 0 = пусто)
+        self._values = [None]
+        self._codes = {None: 0}
+
+        self._statuses = array('I')
+        self._projects = array('I')
+        self._models = array('I')
+        self._chat_modes = array('I')
+        self._has_request = bytearray()
+
+        self._pending = set()
+        self._counts = {'success': 0, 'errors': 0, 'pending': 0}
+
+    def _intern(self, value):
+        """Возвращает код значения, добавляя его в таблицу при необходимости"""
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._values)
+            self._values.append(value)
+            self._codes[value] = code
+        return code
+
+    def _category(self, status):
+        """Категория статуса для статистики"""
+        if status == STATUS_SUCCESS:
+            return 'success'
+        if status in ERROR_STATUSES:
+            return 'errors'
+        return 'pending'
+
+    def _is_pending(self, idx):
+        """Нужно ли (пере)выполнить запрос в строке"""
+        if not self._has_request[idx]:
+            return False
+        status = self._values[self._statuses[idx]]
+        return not status or status in RETRY_STATUSES
+
+    def add_row(self, status, has_request, project=None, model=None, chat_mode=None):
+        """Добавляет следующую строку листа"""
+        idx = len(self._statuses)
+
+        self._statuses.append(self._intern(status))
+        self._projects.append(self._intern(project))
+        self._models.append(self._intern(model))
+        self._chat_modes.append(self._intern(chat_mode))
+        self._has_request.append(1 if has_request else 0)
+
+        self._counts[self._category(status)] += 1
+        if self._is_pending(idx):
+            self._pending.add(idx + self.first_row)
+
+    def set_status(self, row, status):
+        """Обновляет статус строки"""
+        idx = row - self.first_row
+        if idx < 0 or idx >= len(self._statuses):
+            return
+
+        old_status = self._values[self._statuses[idx]]
+        self._counts[self._category(old_status)] -= 1
+        self._counts[self._category(status)] += 1
+
+        self._statuses[idx] = self._intern(status)
+        if self._is_pending(idx):
+            self._pending.add(row)
+        else:
+            self._pending.discard(row)
+
+    def get(self, row):
+        """Возвращает параметры строки"""
+        idx = row - self.first_row
+        return {
+            'status': self._values[self._statuses[idx]],
+            'project': self._values[self._projects[idx]],
+            'model': self._values[self._models[idx]],
+            'chat_mode': self._values[self._chat_modes[idx]]
+        }
+
+    def is_pending(self, row):
+        """Нужно ли выполнять запрос в строке"""
+        return row in self._pending
+
+    def pending_rows(self):
+        """Номера строк с невыполненными запросами (по возрастанию)"""
+        return sorted(self._pending)
+
+    def count_empty_rows(self):
+        """Количество строк без текста запроса"""
+        return self._has_request.count(0)
+
+    def empty_rows(self, limit=None):
+        """Номера строк без текста запроса (первые limit штук)"""
+        rows = []
+        idx = self._has_request.find(0)
+        while idx != -1 and (limit is None or len(rows) < limit):
+            rows.append(idx + self.first_row)
+            idx = self._has_request.find(0, idx + 1)
+        return rows
+
+    def get_statistics(self):
+        """Возвращает статистику по запросам"""
+        return {
+            'total': len(self._statuses),
+            'success': self._counts['success'],
+            'errors': self._counts['errors'],
+            'pending': self._counts['pending']
+        }
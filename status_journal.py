@@ -0,0 +1,148 @@
+"""
+Журнал изменений статусов (append-only)
+Каждое изменение статуса дописывается в конец журнала и сразу
+сбрасывается на диск, поэтому сбой между сохранениями Excel не теряет прогресс
+"""
+import json
+import os
+from datetime import datetime
+from config import *
+
+class StatusJournal:
+    """
+    Append-only журнал статусов с проигрыванием после сбоя
+
+    Файлы:
+    - {filename}       - записи (одна JSON строка на изменение)
+    - {filename}.data  - тексты ответов (запись хранит смещение и длину)
+
+    Запись: {"row", "status", "offset", "length", "error", "ts"}
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.data_filename = f"{filename}.data"
+        self._file = None
+        self._data_file = None
+
+    def open(self):
+        """Открывает журнал на дозапись"""
+        if self._file is None:
+            self._file = open(self.filename, 'ab')
+            self._data_file = open(self.data_filename, 'ab')
+
+    def close(self):
+        """Закрывает файлы журнала"""
+        for f in (self._file, self._data_file):
+            if f:
+                f.close()
+        self._file = None
+        self._data_file = None
+
+    def exists(self):
+        """Есть ли в журнале непроигранные записи"""
+        return os.path.exists(self.filename) and os.path.getsize(self.filename) > 0
+
+    def _write_durable(self, f, data):
+        """Дописывает данные и дожидается их записи на диск"""
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+    def append(self, row, status, response="", error_message=""):
+        """
+        Добавляет запись об изменении статуса
+
+        Сначала на диск попадает текст ответа, затем сама запись -
+        так запись никогда не ссылается на недописанные данные.
+        """
+        self.open()
+
+        offset, length = None, 0
+        if response:
+            data = response.encode('utf-8')
+            offset = self._data_file.tell()
+            length = len(data)
+            self._write_durable(self._data_file, data)
+
+        record = {
+            'row': row,
+            'status': status,
+            'offset': offset,
+            'length': length,
+            'error': error_message or None,
+            'ts': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self._write_durable(self._file, line.encode('utf-8'))
+
+        return record
+
+    def read_response(self, record):
+        """Читает текст ответа, на который ссылается запись"""
+        if record.get('offset') is None:
+            return ""
+
+        with open(self.data_filename, 'rb') as f:
+            f.seek(record['offset'])
+            return f.read(record['length']).decode('utf-8')
+
+    def replay(self):
+        """
+        Перебирает записи журнала по порядку (генератор)
+
+        Оборванная последняя строка (сбой во время записи) пропускается.
+        """
+        if not os.path.exists(self.filename):
+            return
+
+        with open(self.filename, 'rb') as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def load_results(self):
+        """
+        Собирает последнее состояние каждой строки из журнала
+
+        Возвращает: {row: {'status', 'offset', 'length', 'error', 'date'}}
+        """
+        results = {}
+        for record in self.replay():
+            self.merge_record(results, record)
+        return results
+
+    @staticmethod
+    def merge_record(results, record):
+        """Применяет запись журнала к состоянию строки"""
+        result = results.setdefault(record['row'], {})
+        result['status'] = record['status']
+
+        # Как и в Excel: ответ и ошибка меняются только если переданы
+        if record.get('offset') is not None:
+            result['offset'] = record['offset']
+            result['length'] = record['length']
+
+        if record.get('error'):
+            result['error'] = record['error']
+
+        if record['status'] == STATUS_SUCCESS:
+            result['date'] = record['ts']
+
+        return result
+
+    def compact(self):
+        """
+        Очищает журнал
+
+        Вызывается после успешного сохранения книги: все записи
+        уже отражены в Excel и больше не нужны для восстановления.
+        """
+        self.close()
+        for filename in (self.filename, self.data_filename):
+            open(filename, 'wb').close()
+        self.open()
@@ -0,0 +1,300 @@
+"""
+Тесты XlsxPatcher: точечная запись строк в XML листа
+Книги собираются вручную, чтобы проверить разметку, которую пишет не openpyxl
+"""
+import os
+import sys
+import zipfile
+
+import pytest
+from openpyxl import load_workbook
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from xlsx_patcher import XlsxPatcher, column_index, column_letter
+
+SHEET_PART = 'xl/worksheets/sheet1.xml'
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" '
+    'Target="sharedStrings.xml"/>'
+    '<Relationship Id="rId3" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+SHARED_STRINGS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="3" uniqueCount="3">'
+    '<si><t>Запрос</t></si><si><t>старый ответ</t></si><si><t>вопрос</t></si>'
+    '</sst>'
+)
+
+STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/></font><font><b/><sz val="11"/></font></fonts>'
+    '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+    '<borders count="1"><border/></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+def make_sheet(rows, dimension="A1:C4"):
+    """XML листа с заданными строками (как есть, без сортировки)"""
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        f'<dimension ref="{dimension}"/>'
+        f'<sheetData>{"".join(rows)}</sheetData>'
+        '</worksheet>'
+    )
+
+
+def make_workbook(path, sheet_xml):
+    """Собирает минимальную книгу xlsx"""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zout:
+        zout.writestr('[Content_Types].xml', CONTENT_TYPES)
+        zout.writestr('_rels/.rels', ROOT_RELS)
+        zout.writestr('xl/workbook.xml', WORKBOOK)
+        zout.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        zout.writestr('xl/sharedStrings.xml', SHARED_STRINGS)
+        zout.writestr('xl/styles.xml', STYLES)
+        zout.writestr(SHEET_PART, sheet_xml)
+    return str(path)
+
+
+def read_sheet_xml(path):
+    with zipfile.ZipFile(path) as zin:
+        return zin.read(SHEET_PART).decode('utf-8')
+
+
+def read_values(path):
+    """Значения листа через openpyxl: {(row, col): value}"""
+    wb = load_workbook(path)
+    ws = wb['Sheet1']
+    values = {(cell.row, cell.column): cell.value
+              for row in ws.iter_rows() for cell in row if cell.value is not None}
+    wb.close()
+    return values
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    rows = [
+        '<row r="1" spans="1:3"><c r="A1" t="s" s="1"><v>0</v></c></row>',
+        '<row r="2" spans="1:3"><c r="A2" t="s"><v>2</v></c><c r="B2" t="s" s="1"><v>1</v></c></row>',
+        '<row r="3"/>',
+        '<row r="4"><c r="A4"><v>42</v></c></row>',
+    ]
+    return make_workbook(tmp_path / "book.xlsx", make_sheet(rows))
+
+
+def test_column_letters_round_trip():
+    for col in (1, 26, 27, 28, 52, 703):
+        assert column_index(column_letter(col)) == col
+    assert column_letter(28) == "AB"
+
+
+def test_shared_string_replaced_by_inline_string_keeps_style(workbook):
+    assert XlsxPatcher(workbook).apply({2: {2: "новый ответ"}})
+
+    xml = read_sheet_xml(workbook)
+    assert '<c r="B2" s="1" t="inlineStr"><is><t xml:space="preserve">новый ответ</t></is></c>' in xml
+    # Остальные ячейки строки не тронуты, таблица строк не меняется
+    assert '<c r="A2" t="s"><v>2</v></c>' in xml
+    with zipfile.ZipFile(workbook) as zin:
+        assert zin.read('xl/sharedStrings.xml').decode('utf-8') == SHARED_STRINGS
+
+    values = read_values(workbook)
+    assert values[(2, 1)] == "вопрос"
+    assert values[(2, 2)] == "новый ответ"
+
+
+def test_self_closing_row(workbook):
+    assert XlsxPatcher(workbook).apply({3: {1: "запрос", 3: "Выполнен"}})
+
+    xml = read_sheet_xml(workbook)
+    assert '<row r="3"/>' not in xml
+    values = read_values(workbook)
+    assert values[(3, 1)] == "запрос"
+    assert values[(3, 3)] == "Выполнен"
+
+
+def test_missing_cells_are_added_in_column_order(workbook):
+    assert XlsxPatcher(workbook).apply({4: {3: "Выполнен", 2: "ответ"}})
+
+    xml = read_sheet_xml(workbook)
+    row = xml[xml.index('<row r="4"'):]
+    row = row[:row.index('</row>')]
+    assert row.index('r="A4"') < row.index('r="B4"') < row.index('r="C4"')
+
+    values = read_values(workbook)
+    assert values[(4, 1)] == 42
+    assert values[(4, 2)] == "ответ"
+    assert values[(4, 3)] == "Выполнен"
+
+
+def test_cleared_cell_keeps_style_and_spans_are_dropped(workbook):
+    assert XlsxPatcher(workbook).apply({1: {1: None}, 2: {1: ""}})
+
+    xml = read_sheet_xml(workbook)
+    assert '<c r="A1" s="1"/>' in xml
+    assert 'r="A2"' not in xml
+    assert 'spans=' not in xml
+    values = read_values(workbook)
+    assert (1, 1) not in values
+    assert (2, 1) not in values
+
+
+def test_out_of_order_rows(tmp_path):
+    rows = [
+        '<row r="3"><c r="A3"><v>3</v></c></row>',
+        '<row r="1"><c r="A1"><v>1</v></c></row>',
+        '<row r="2"><c r="A2"><v>2</v></c></row>',
+    ]
+    path = make_workbook(tmp_path / "unordered.xlsx", make_sheet(rows, "A1:A3"))
+
+    assert XlsxPatcher(path).apply({1: {2: "один"}, 3: {2: "три"}})
+
+    xml = read_sheet_xml(path)
+    # Порядок строк в XML сохраняется, правятся только нужные
+    assert xml.index('<row r="3"') < xml.index('<row r="1"') < xml.index('<row r="2"')
+    assert '<row r="2"><c r="A2"><v>2</v></c></row>' in xml
+
+    values = read_values(path)
+    assert values[(1, 2)] == "один"
+    assert values[(3, 2)] == "три"
+    assert values[(2, 1)] == 2
+
+
+def test_dimension_widened_for_new_columns(workbook):
+    assert XlsxPatcher(workbook).apply({2: {8: "new"}})
+
+    assert '<dimension ref="A1:H4"/>' in read_sheet_xml(workbook)
+    assert read_values(workbook)[(2, 8)] == "new"
+
+
+def test_dimension_single_cell_ref(tmp_path):
+    rows = ['<row r="1"><c r="A1"><v>1</v></c></row>', '<row r="2"/>']
+    path = make_workbook(tmp_path / "single.xlsx", make_sheet(rows, "A1"))
+
+    assert XlsxPatcher(path).apply({2: {3: "x"}})
+
+    assert '<dimension ref="A1:C2"/>' in read_sheet_xml(path)
+
+
+def test_dimension_unchanged_inside_range(workbook):
+    assert XlsxPatcher(workbook).apply({2: {3: "Выполнен"}, 4: {5: None}})
+
+    assert '<dimension ref="A1:C4"/>' in read_sheet_xml(workbook)
+
+
+def test_escaping_and_illegal_characters(workbook):
+    assert XlsxPatcher(workbook).apply({2: {2: 'a < b & "c"\x07'}})
+
+    assert read_values(workbook)[(2, 2)] == 'a < b & "c"'
+
+
+def test_missing_row_leaves_file_untouched(workbook):
+    before = open(workbook, 'rb').read()
+
+    assert XlsxPatcher(workbook).apply({10: {2: "ответ"}}) is False
+
+    assert open(workbook, 'rb').read() == before
+    assert not os.path.exists(workbook.replace('.xlsx', '.tmp.xlsx'))
+
+
+def test_row_with_other_attribute_order(tmp_path):
+    rows = [
+        '<row spans="1:2" r="1"><c r="A1"><v>1</v></c></row>',
+        '<row ht="20" customHeight="1" r="2"/>',
+    ]
+    path = make_workbook(tmp_path / "attrs.xlsx", make_sheet(rows, "A1:B2"))
+
+    assert XlsxPatcher(path).apply({1: {2: "один"}, 2: {1: "два"}})
+
+    xml = read_sheet_xml(path)
+    assert 'ht="20"' in xml
+    values = read_values(path)
+    assert values[(1, 1)] == 1
+    assert values[(1, 2)] == "один"
+    assert values[(2, 1)] == "два"
+
+
+def test_row_number_prefix_is_not_confused(tmp_path):
+    rows = ['<row r="1"><c r="A1"><v>1</v></c></row>', '<row r="12"><c r="A12"><v>12</v></c></row>']
+    path = make_workbook(tmp_path / "prefix.xlsx", make_sheet(rows, "A1:A12"))
+
+    assert XlsxPatcher(path).apply({1: {2: "x"}})
+
+    values = read_values(path)
+    assert values[(1, 2)] == "x"
+    assert (12, 2) not in values
+    assert values[(12, 1)] == 12
+
+
+def test_unchanged_parts_are_copied_without_recompression(tmp_path):
+    path = tmp_path / "stored.xlsx"
+    make_workbook(path, make_sheet(['<row r="1"/>'], "A1"))
+    # Перепаковываем с несжатой таблицей строк: пересжатие сменило бы ее compress_type
+    with zipfile.ZipFile(path) as zin:
+        parts = [(info, zin.read(info)) for info in zin.infolist()]
+    with zipfile.ZipFile(path, 'w') as zout:
+        for info, data in parts:
+            compression = zipfile.ZIP_STORED if info.filename == 'xl/sharedStrings.xml' else zipfile.ZIP_DEFLATED
+            zout.writestr(info.filename, data, compress_type=compression)
+
+    assert XlsxPatcher(str(path)).apply({1: {1: "запрос"}})
+
+    with zipfile.ZipFile(path) as zin:
+        assert zin.testzip() is None
+        shared = zin.getinfo('xl/sharedStrings.xml')
+        assert shared.compress_type == zipfile.ZIP_STORED
+        assert zin.read(shared).decode('utf-8') == SHARED_STRINGS
+        assert [info.filename for info in zin.infolist()] == [info.filename for info, _ in parts]
+    assert read_values(str(path))[(1, 1)] == "запрос"
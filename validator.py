@@ -1,9 +1,9 @@
 """
 Валидация Excel файла и данных
 """
-from openpyxl import load_workbook
 import os
 from config import *
+from excel_handler import ExcelHandler
 
 class Validator:
     """Класс для валидации данных"""
@@ -19,63 +19,39 @@ class Validator:
             return False
         return True
     
-    def validate_excel_structure(self, filename):
-        """Проверяет структуру Excel файла"""
-        if not self.validate_file_exists(filename):
-            return False
+    def validate_excel_structure(self, filename, excel_handler=None):
+        """
+        Проверяет структуру Excel файла
+        
+        excel_handler: ExcelHandler, который будет работать с файлом дальше.
+        Если передан - книга загружается им один раз и больше не перечитывается.
+        """
+        if excel_handler is None:
+            excel_handler = ExcelHandler(filename, journal=False)
+        
+        return self.validate_request_source(excel_handler)
+    
+    def validate_request_source(self, source):
+        """
+        Проверяет файл запросов через источник (Excel, CSV или JSONL)
         
+        Источник загружается здесь один раз и дальше используется как есть.
+        """
         try:
-            wb = load_workbook(filename)
-            ws = wb[SHEET_NAME] if SHEET_NAME in wb.sheetnames else wb.active
-            
-            # Проверяем минимальное количество строк
-            if ws.max_row < 2:
-                self.errors.append("Excel файл пустой (нет данных кроме заголовка)")
-                return False
-            
-            # Проверяем заголовки
-            expected_headers = {
-                COL_REQUEST: "Запрос",
-                COL_RESPONSE: "Ответ", 
-                COL_STATUS: "Статус",
-                COL_DATE: "Дата выполнения",
-                COL_ERROR: "Ошибка"
-            }
-            
-            for col, expected_name in expected_headers.items():
-                actual_value = ws.cell(1, col).value
-                if actual_value != expected_name:
-                    self.warnings.append(
-                        f"Колонка {col}: ожидался заголовок '{expected_name}', "
-                        f"найден '{actual_value}'"
-                    )
-            
-            # Проверяем что есть хотя бы один запрос
-            has_requests = False
-            empty_rows = []
-            
-            for row in range(2, ws.max_row + 1):
-                request = ws.cell(row, COL_REQUEST).value
-                if request and str(request).strip():
-                    has_requests = True
+            if not source.is_loaded() and not source.load():
+                if os.path.exists(source.filename):
+                    self.errors.append(f"Не удалось прочитать файл {source.filename}")
                 else:
-                    empty_rows.append(row)
-            
-            if not has_requests:
-                self.errors.append("Нет ни одного запроса для обработки")
+                    self.errors.append(f"Файл {source.filename} не найден")
                 return False
             
-            if empty_rows:
-                self.warnings.append(
-                    f"Найдены пустые строки: {', '.join(map(str, empty_rows[:5]))}"
-                    f"{'...' if len(empty_rows) > 5 else ''}"
-                )
-            
-            wb.close()
-            return True
+            errors, warnings = source.check_structure()
+            self.errors.extend(errors)
+            self.warnings.extend(warnings)
+            return not errors
             
         except Exception as e:
-            self.errors.append(f"Ошибка при чтении Excel: {e}")
+            self.errors.append(f"Ошибка при чтении {source.filename}: {e}")
             return False
     
     def validate_browser_path(self, path):
@@ -85,19 +61,26 @@ class Validator:
             return False
         return True
     
-    def validate_all(self):
-        """Выполняет все проверки"""
+    def validate_all(self, source=None):
+        """
+        Выполняет все проверки
+        
+        source: источник запросов (ExcelHandler и т.п.) для однократной загрузки файла
+        """
         print("\n🔍 Валидация конфигурации...")
         print("-" * 70)
         
         valid = True
         
         # Проверяем Excel
-        print("📄 Проверяю Excel файл...")
-        if not self.validate_excel_structure(EXCEL_FILE):
+        if source is None:
+            source = ExcelHandler(EXCEL_FILE, journal=False)
+        
+        print(f"📄 Проверяю файл запросов {source.filename}...")
+        if not self.validate_request_source(source):
             valid = False
         else:
-            print("   ✅ Excel файл корректен")
+            print("   ✅ Файл запросов корректен")
         
         # Проверяем браузер
         print("🌐 Проверяю путь к браузеру...")
@@ -0,0 +1,282 @@
+"""
+Точечная запись измененных строк в xlsx без пересборки книги
+openpyxl при сохранении заново сериализует все листы и таблицу строк,
+здесь же перезаписываются только измененные строки листа
+"""
+import copy
+import os
+import re
+import struct
+import zipfile
+import posixpath
+from xml.sax.saxutils import escape, unescape
+from config import *
+
+# Символы, недопустимые в XML (как в openpyxl)
+ILLEGAL_XML_CHARS = re.compile(r'[\000-\010]|[\013-\014]|[\016-\037]')
+
+ROW_PATTERN = re.compile(rb'<row\b[^>]*?\br="(\d+)"[^>]*?(?:/>|>.*?</row>)', re.DOTALL)
+CELL_PATTERN = re.compile(rb'<c\b[^>]*?\br="([A-Z]+)\d+"[^>]*?(?:/>|>.*?</c>)', re.DOTALL)
+STYLE_PATTERN = re.compile(rb'\bs="(\d+)"')
+LOCAL_HEADER = struct.Struct('<4s5H3L2H')  # Локальный заголовок записи zip (30 байт)
+DIMENSION_PATTERN = re.compile(rb'(<dimension\b[^>]*?\bref=")([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?(")')
+
+
+def column_letter(col):
+    """Номер колонки → буквенное обозначение (1 → A, 28 → AB)"""
+    letters = ""
+    while col:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def column_index(letters):
+    """Буквенное обозначение колонки → номер (A → 1, AB → 28)"""
+    col = 0
+    for char in letters:
+        col = col * 26 + (ord(char) - 64)
+    return col
+
+
+class XlsxPatcher:
+    """
+    Записывает значения измененных строк прямо в часть листа внутри xlsx
+
+    - Строки ищутся в XML листа регулярным выражением, остальной XML не разбирается
+    - Новые значения пишутся как inline строки - таблица sharedStrings не меняется
+    - <dimension ref> расширяется, если ячейки добавлены за текущий диапазон
+    - Остальные части архива копируются как есть, без распаковки и пересжатия
+      (лист все равно распаковывается и сжимается целиком - стоимость
+      сохранения растет с его размером, поэтому ExcelHandler с журналом
+      вызывает apply редко, см. EXCEL_PATCH_ASSEMBLE_INTERVAL)
+    - Файл подменяется атомарно (временный файл + os.replace)
+    """
+
+    def __init__(self, filename, sheet_name=SHEET_NAME):
+        self.filename = filename
+        self.sheet_name = sheet_name
+        self._sheet_part = None
+
+    def _find_sheet_part(self, zin):
+        """Находит путь к XML листа внутри архива"""
+        workbook_xml = zin.read('xl/workbook.xml')
+        rels_xml = zin.read('xl/_rels/workbook.xml.rels')
+
+        sheets = re.findall(rb'<sheet\b[^>]*?\bname="([^"]*)"[^>]*?\br:id="([^"]*)"', workbook_xml)
+        if not sheets:
+            return None
+
+        rel_id = sheets[0][1]
+        for name, sheet_rel_id in sheets:
+            if unescape(name.decode('utf-8'), {'&quot;': '"'}) == self.sheet_name:
+                rel_id = sheet_rel_id
+                break
+
+        for rel in re.findall(rb'<Relationship\b[^>]*/>', rels_xml):
+            if re.search(rb'\bId="' + re.escape(rel_id) + rb'"', rel):
+                target = re.search(rb'\bTarget="([^"]*)"', rel).group(1).decode('utf-8')
+                if target.startswith('/'):
+                    return target.lstrip('/')
+                return posixpath.normpath(posixpath.join('xl', target))
+
+        return None
+
+    def _render_cell(self, ref, value, style):
+        """Формирует XML ячейки"""
+        style_attr = f' s="{style}"' if style else ''
+
+        if isinstance(value, bool):
+            return f'<c r="{ref}"{style_attr} t="b"><v>{int(value)}</v></c>'.encode('utf-8')
+
+        if isinstance(value, (int, float)):
+            return f'<c r="{ref}"{style_attr}><v>{value}</v></c>'.encode('utf-8')
+
+        text = ILLEGAL_XML_CHARS.sub('', str(value))
+        return (f'<c r="{ref}"{style_attr} t="inlineStr"><is>'
+                f'<t xml:space="preserve">{escape(text)}</t></is></c>').encode('utf-8')
+
+    def _patch_row(self, row_xml, row, values):
+        """Заменяет значения колонок в XML одной строки"""
+        if row_xml.endswith(b'/>'):
+            open_tag = row_xml[:-2] + b'>'
+            body = b''
+        else:
+            open_end = row_xml.index(b'>') + 1
+            open_tag = row_xml[:open_end]
+            body = row_xml[open_end:-len(b'</row>')]
+
+        # spans - только подсказка для Excel, после правки она может стать неверной
+        open_tag = re.sub(rb'\s+spans="[^"]*"', b'', open_tag)
+
+        cells = {}
+        for match in CELL_PATTERN.finditer(body):
+            cells[column_index(match.group(1).decode('ascii'))] = match.group(0)
+
+        for col, value in values.items():
+            old_cell = cells.get(col, b'')
+            style_match = STYLE_PATTERN.search(old_cell.split(b'>', 1)[0]) if old_cell else None
+            style = style_match.group(1).decode('ascii') if style_match else None
+
+            if value is None or value == "":
+                if style:
+                    cells[col] = f'<c r="{column_letter(col)}{row}" s="{style}"/>'.encode('utf-8')
+                else:
+                    cells.pop(col, None)
+            else:
+                cells[col] = self._render_cell(f"{column_letter(col)}{row}", value, style)
+
+        return open_tag + b''.join(cells[col] for col in sorted(cells)) + b'</row>'
+
+    def _patch_sheet(self, sheet_xml, changes):
+        """Применяет изменения ко всем затронутым строкам за один проход"""
+        spans = self._locate_rows(sheet_xml, changes)
+        if spans is not None:
+            # Быстрый путь: вырезаем только найденные строки, остальной XML не разбирается
+            parts = []
+            position = 0
+            for start, end, row in spans:
+                parts.append(sheet_xml[position:start])
+                parts.append(self._patch_row(sheet_xml[start:end], row, changes[row]))
+                position = end
+            parts.append(sheet_xml[position:])
+            return self._update_dimension(b''.join(parts), changes)
+
+        found = set()
+
+        def replace(match):
+            row = int(match.group(1))
+            if row not in changes:
+                return match.group(0)
+            found.add(row)
+            return self._patch_row(match.group(0), row, changes[row])
+
+        patched = ROW_PATTERN.sub(replace, sheet_xml)
+
+        if found != set(changes):
+            missing = sorted(set(changes) - found)
+            raise ValueError(f"строки не найдены в листе: {missing[:5]}")
+
+        return self._update_dimension(patched, changes)
+
+    def _locate_rows(self, sheet_xml, changes):
+        """
+        Границы изменяемых строк поиском по байтам: [(начало, конец, номер)]
+
+        Ищется тег '<row r="N"' (так пишут Excel и openpyxl); '<' в тексте
+        ячеек экранирован, поэтому ложных совпадений нет. None - если
+        какая-то строка записана иначе (тогда - разбор регулярным выражением).
+        """
+        spans = []
+        for row in changes:
+            start = sheet_xml.find(b'<row r="%d"' % row)
+            if start == -1:
+                return None
+            tag_end = sheet_xml.find(b'>', start)
+            if tag_end == -1:
+                return None
+            if sheet_xml[tag_end - 1:tag_end] == b'/':
+                end = tag_end + 1
+            else:
+                end = sheet_xml.find(b'</row>', tag_end)
+                if end == -1:
+                    return None
+                end += len(b'</row>')
+            spans.append((start, end, row))
+        return sorted(spans)
+
+    def _update_dimension(self, sheet_xml, changes):
+        """Расширяет <dimension ref> листа, если значения записаны за его границу"""
+        filled = [(row, col) for row, values in changes.items()
+                  for col, value in values.items() if value is not None and value != ""]
+        if not filled:
+            return sheet_xml
+
+        def widen(match):
+            first_col, first_row = match.group(2), int(match.group(3))
+            last_col = match.group(4) or first_col
+            last_row = int(match.group(5) or first_row)
+
+            max_col = max(column_index(last_col.decode('ascii')), max(col for _, col in filled))
+            max_row = max(last_row, max(row for row, _ in filled))
+            min_col = min(column_index(first_col.decode('ascii')), min(col for _, col in filled))
+            min_row = min(first_row, min(row for row, _ in filled))
+
+            ref = f"{column_letter(min_col)}{min_row}:{column_letter(max_col)}{max_row}"
+            return match.group(1) + ref.encode('ascii') + match.group(6)
+
+        return DIMENSION_PATTERN.sub(widen, sheet_xml, count=1)
+
+    def _copy_raw(self, zin, zout, info):
+        """
+        Копирует запись архива в сжатом виде (без распаковки и пересжатия)
+
+        zipfile не умеет этого сам: данные переносятся из исходного файла
+        вместе с новым локальным заголовком, запись добавляется
+        в центральный каталог выходного архива.
+        """
+        zin.fp.seek(info.header_offset)
+        header = LOCAL_HEADER.unpack(zin.fp.read(LOCAL_HEADER.size))
+        if header[0] != b'PK\x03\x04':
+            raise ValueError(f"поврежден заголовок записи {info.filename}")
+        name_length, extra_length = header[-2], header[-1]
+        zin.fp.seek(name_length + extra_length, os.SEEK_CUR)
+
+        target = copy.copy(info)
+        # Размеры и CRC известны заранее - дескриптор данных после записи не нужен
+        target.flag_bits &= ~0x08
+        target.header_offset = zout.fp.tell()
+        zout.fp.write(target.FileHeader())
+
+        remaining = info.compress_size
+        while remaining:
+            chunk = zin.fp.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                raise ValueError(f"запись {info.filename} обрезана")
+            zout.fp.write(chunk)
+            remaining -= len(chunk)
+
+        zout.filelist.append(target)
+        zout.NameToInfo[target.filename] = target
+        zout.start_dir = zout.fp.tell()
+        zout._didModify = True
+
+    def apply(self, changes):
+        """
+        Записывает изменения в файл
+
+        changes: {row: {col: value}}
+        Возвращает True при успехе, False если файл не удалось пропатчить
+        (тогда нужно сохранять книгу обычным способом).
+        """
+        if not changes:
+            return True
+
+        name, ext = os.path.splitext(self.filename)
+        tmp_filename = f"{name}.tmp{ext}"
+
+        try:
+            with zipfile.ZipFile(self.filename) as zin:
+                if self._sheet_part is None:
+                    self._sheet_part = self._find_sheet_part(zin)
+                if self._sheet_part is None:
+                    raise ValueError("лист не найден в архиве")
+
+                with zipfile.ZipFile(tmp_filename, 'w', zipfile.ZIP_DEFLATED) as zout:
+                    for info in zin.infolist():
+                        if info.filename == self._sheet_part:
+                            zout.writestr(info, self._patch_sheet(zin.read(info), changes))
+                        else:
+                            self._copy_raw(zin, zout, info)
+
+            os.replace(tmp_filename, self.filename)
+            return True
+
+        except Exception as e:
+            print(f"⚠️ Не удалось записать изменения в {self.filename} напрямую: {e}")
+            if os.path.exists(tmp_filename):
+                try:
+                    os.remove(tmp_filename)
+                except OSError:
+                    pass
+            return False